@@ -0,0 +1,85 @@
+import argparse
+import asyncio
+import random
+import time
+
+import milvus_rag_demo as rag
+from bench_utils import synthetic_corpus, percentile, print_table
+from rag_server import AsyncRAGServer
+
+# 异步微批处理 RAG 的并发负载基准
+
+
+async def client_worker(server, queries, latencies):
+    for query in queries:
+        start = time.perf_counter()
+        await server.rag_system(query)
+        latencies.append(time.perf_counter() - start)
+
+
+async def run_load(queries, concurrency, max_batch_size, max_wait_ms, top_k):
+    """闭环负载：concurrency 个虚拟用户各自连续发送请求"""
+    latencies = []
+    shards = [queries[i::concurrency] for i in range(concurrency)]
+    async with AsyncRAGServer(top_k, max_batch_size, max_wait_ms, warm_up=True) as server:
+        start = time.perf_counter()
+        await asyncio.gather(*(client_worker(server, shard, latencies) for shard in shards))
+        elapsed = time.perf_counter() - start
+        batch_stats = server.batcher.stats()
+    return latencies, elapsed, batch_stats
+
+
+def run_sequential(queries, top_k):
+    """基线：与 rag_system 相同的同步流程，一次处理一个请求"""
+    latencies = []
+    start = time.perf_counter()
+    for query in queries:
+        t = time.perf_counter()
+        docs = rag.retrieve_relevant_docs(query, top_k)
+        rag.generate_answer(query, docs)
+        latencies.append(time.perf_counter() - t)
+    return latencies, time.perf_counter() - start
+
+
+def summarize(name, latencies, elapsed, avg_batch="-"):
+    return [
+        name,
+        f"{len(latencies) / elapsed:.1f}",
+        f"{percentile(latencies, 50) * 1000:.1f}",
+        f"{percentile(latencies, 99) * 1000:.1f}",
+        avg_batch,
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="异步微批处理 RAG 负载基准")
+    parser.add_argument("--num-queries", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 16, 64])
+    parser.add_argument("--max-batch-size", type=int, default=32)
+    parser.add_argument("--max-wait-ms", type=float, default=5.0)
+    parser.add_argument("--top-k", type=int, default=3)
+    args = parser.parse_args()
+
+    # 查询由语料片段构造，随机打乱后每轮使用不同的问题，避免向量缓存干扰
+    rng = random.Random(0)
+    pool = [q[:30] for q in synthetic_corpus(args.num_queries * (len(args.concurrency) + 1), seed=3)]
+    rng.shuffle(pool)
+    rounds = [pool[i * args.num_queries:(i + 1) * args.num_queries] for i in range(len(args.concurrency) + 1)]
+
+    rows = []
+    latencies, elapsed = run_sequential(rounds[0], args.top_k)
+    rows.append(summarize("同步逐条", latencies, elapsed))
+
+    for concurrency, queries in zip(args.concurrency, rounds[1:]):
+        latencies, elapsed, batch_stats = asyncio.run(
+            run_load(queries, concurrency, args.max_batch_size, args.max_wait_ms, args.top_k)
+        )
+        rows.append(summarize(f"异步并发 {concurrency}", latencies, elapsed,
+                              f"{batch_stats['avg_batch_size']:.1f}"))
+
+    print(f"查询数: {args.num_queries}, 最大批大小: {args.max_batch_size}, 最大等待: {args.max_wait_ms}ms")
+    print_table(rows, ["模式", "吞吐(查询/秒)", "p50(ms)", "p99(ms)", "平均批大小"])
+
+
+if __name__ == "__main__":
+    main()
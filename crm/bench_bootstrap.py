@@ -0,0 +1,89 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from bench_utils import percentile, print_table
+
+# 各启动模式的冷启动耗时：后端就绪，以及首次建集合、写入和检索
+# 每次测量都在新的子进程中进行；不可用的模式（未安装 Milvus Lite、没有服务器）会标记出来
+
+COLLECTION_NAME = "bench_bootstrap"
+
+
+def child(mode, uri, timeout):
+    """在子进程中执行，依次记录各阶段完成的时刻"""
+    start = time.perf_counter()
+    from bootstrap import bootstrap
+    imported = time.perf_counter()
+    client, _ = bootstrap(mode, uri, timeout)
+    ready = time.perf_counter()
+
+    if client.has_collection(COLLECTION_NAME):
+        client.drop_collection(COLLECTION_NAME)
+    client.create_collection(collection_name=COLLECTION_NAME, dimension=8)
+    client.insert(collection_name=COLLECTION_NAME, data=[
+        {"id": i, "vector" if mode != "local" else "embedding": [float(i)] * 8} for i in range(10)
+    ])
+    client.search(collection_name=COLLECTION_NAME, data=[[1.0] * 8], limit=3)
+    searched = time.perf_counter()
+    client.drop_collection(COLLECTION_NAME)
+    print(json.dumps({
+        "import": imported - start,
+        "ready": ready - imported,
+        "first_search": searched - ready,
+    }))
+
+
+def run_child(mode, uri, timeout):
+    result = subprocess.run(
+        [sys.executable, __file__, "--child", mode, "--timeout", str(timeout)] + (["--uri", uri] if uri else []),
+        capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        return None
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="启动模式冷启动耗时基准")
+    parser.add_argument("--modes", nargs="+", default=["local", "lite", "server"],
+                        choices=["local", "lite", "server", "docker"])
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--uri", help="server/docker 模式的 Milvus 地址")
+    parser.add_argument("--timeout", type=float, default=30.0, help="等待后端就绪的最长秒数")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.child, args.uri, args.timeout)
+        return
+
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for mode in args.modes:
+            uri = os.path.join(tmp_dir, "bench_lite.db") if mode == "lite" else args.uri
+            samples = []
+            for _ in range(args.runs):
+                sample = run_child(mode, uri, args.timeout)
+                if sample is None:
+                    break
+                samples.append(sample)
+            if len(samples) < args.runs:
+                rows.append([mode, "不可用", "-", "-", "-"])
+                continue
+            totals = [sum(sample.values()) for sample in samples]
+            rows.append([mode] + [
+                f"{percentile([sample[name] for sample in samples], 50) * 1000:.1f}"
+                for name in ("import", "ready", "first_search")
+            ] + [f"{percentile(totals, 50) * 1000:.1f}"])
+
+    print(f"每种模式冷启动 {args.runs} 次，取中位数")
+    print_table(rows, ["模式", "导入(ms)", "后端就绪(ms)", "首次检索(ms)", "合计(ms)"])
+
+
+if __name__ == "__main__":
+    main()
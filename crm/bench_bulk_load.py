@@ -0,0 +1,82 @@
+import argparse
+import json
+import subprocess
+import sys
+import time
+
+from bench_utils import print_table
+
+# 批量导入基准：逐行 dict 插入 vs 列式批量导入（不同并发数）
+# 每种方式在新的子进程中运行，峰值内存互不影响
+
+COLLECTION_NAME = "bench_bulk_load"
+
+
+def child(mode, num_entities, dim, concurrency, batch_mb):
+    """在子进程中执行一次导入，输出 JSON 统计"""
+    from bulk_loader import bulk_load, create_columnar_collection, peak_rss_mb
+    from c import generate_entities, generate_vectors, iter_synthetic_batches
+    from vector_backend import create_client
+
+    client = create_client()
+    create_columnar_collection(client, COLLECTION_NAME, dim)
+    max_batch_bytes = batch_mb * 2 ** 20
+    if mode == "rows":
+        # 原来的写法：每行构造 dict，向量 tolist 后插入
+        start = time.perf_counter()
+        batch_rows = 10000
+        for offset in range(0, num_entities, batch_rows):
+            size = min(batch_rows, num_entities - offset)
+            entities = generate_entities(size, dim, generate_vectors(size, dim), start_id=offset)
+            client.insert(collection_name=COLLECTION_NAME, data=entities)
+        elapsed = time.perf_counter() - start
+        stats = {"rows": num_entities, "rows_per_sec": num_entities / elapsed, "peak_rss_mb": peak_rss_mb()}
+    else:
+        stats = bulk_load(
+            client,
+            COLLECTION_NAME,
+            batches=iter_synthetic_batches(num_entities, dim, max_batch_bytes),
+            concurrency=concurrency,
+            max_batch_bytes=max_batch_bytes
+        )
+    client.drop_collection(COLLECTION_NAME)
+    print(json.dumps(stats))
+
+
+def run_child(mode, args, concurrency):
+    output = subprocess.run(
+        [sys.executable, __file__, "--child", mode,
+         "--num-entities", str(args.num_entities), "--dim", str(args.dim),
+         "--concurrency", str(concurrency), "--batch-mb", str(args.batch_mb)],
+        capture_output=True, text=True, check=True
+    ).stdout.strip().splitlines()[-1]
+    return json.loads(output)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="批量导入基准")
+    parser.add_argument("--num-entities", type=int, default=500000)
+    parser.add_argument("--dim", type=int, default=128)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--batch-mb", type=int, default=32)
+    parser.add_argument("--child", choices=["rows", "columns"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.child, args.num_entities, args.dim, args.concurrency[0], args.batch_mb)
+        return
+
+    runs = [("逐行 dict", run_child("rows", args, 1), 1)]
+    for concurrency in args.concurrency:
+        runs.append(("列式批量", run_child("columns", args, concurrency), concurrency))
+
+    rows = [
+        [label, concurrency, f"{stats['rows_per_sec']:.0f}", f"{stats['peak_rss_mb']:.0f}"]
+        for label, stats, concurrency in runs
+    ]
+    print(f"行数: {args.num_entities}, 维度: {args.dim}, 单批上限: {args.batch_mb} MB")
+    print_table(rows, ["方式", "并发", "行/秒", "峰值内存(MB)"])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+import argparse
+import os
+
+from sentence_transformers import SentenceTransformer
+
+from bench_utils import synthetic_corpus, measure, print_table
+from embedding import MODEL_NAME, encode_batch, build_entities, EmbeddingPool
+
+# 向量化吞吐基准：逐条编码 vs 批量编码 vs 多进程编码
+
+
+def per_chunk_loop(model, texts):
+    """原有写法：每个文档块单独调用 encode 并立即 tolist"""
+    return [
+        {"id": i, "text": text, "embedding": model.encode(text).tolist()}
+        for i, text in enumerate(texts)
+    ]
+
+
+def batched(model, texts, batch_size):
+    vectors = encode_batch(model, texts, batch_size)
+    return build_entities(range(len(texts)), texts, vectors)
+
+
+def pooled(pool, texts):
+    vectors = pool.encode(texts)
+    return build_entities(range(len(texts)), texts, vectors)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="向量化吞吐基准")
+    parser.add_argument("--num-docs", type=int, default=2000)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[16, 64, 128])
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    texts = synthetic_corpus(args.num_docs)
+    model = SentenceTransformer(MODEL_NAME)
+    # 预热，避免首次调用的初始化开销计入结果
+    model.encode(texts[:8])
+
+    rows = []
+    _, elapsed = measure(per_chunk_loop, model, texts)
+    baseline = len(texts) / elapsed
+    rows.append(["逐条编码", "-", f"{baseline:.1f}", "1.00x"])
+
+    for batch_size in args.batch_sizes:
+        _, elapsed = measure(batched, model, texts, batch_size)
+        rate = len(texts) / elapsed
+        rows.append(["批量编码", batch_size, f"{rate:.1f}", f"{rate / baseline:.2f}x"])
+
+    if args.workers > 1:
+        batch_size = max(args.batch_sizes)
+        with EmbeddingPool(MODEL_NAME, args.workers, batch_size) as pool:
+            # 预热每个工作进程的模型
+            pool.encode(texts[:args.workers * batch_size])
+            _, elapsed = measure(pooled, pool, texts)
+        rate = len(texts) / elapsed
+        rows.append([f"多进程编码({args.workers}进程)", batch_size, f"{rate:.1f}", f"{rate / baseline:.2f}x"])
+
+    print(f"文档数: {len(texts)}")
+    print_table(rows, ["方式", "批大小", "文档/秒", "加速比"])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+import argparse
+import time
+
+import numpy as np
+
+from bench_utils import percentile, print_table
+from bulk_loader import bulk_load, create_columnar_collection, create_scalar_indexes, iter_column_batches
+from c import SCALAR_INDEXES, generate_columns
+from vector_backend import create_client
+
+# 过滤搜索基准：不同选择率的过滤条件下，
+# 无标量索引 / 有标量索引 / 标量索引 + 住户 id 分区键 三种配置的搜索延迟
+
+COLLECTION_NAME = "bench_filtered_search"
+
+CONFIGS = [
+    ("无索引", False, None),
+    ("标量索引", True, None),
+    ("标量索引+分区键", True, "household_id"),
+]
+
+FILTERS = [
+    'household_id == 42 and device_type == "light"',
+    "household_id == 42",
+    "household_id in [1, 2, 3, 4, 5, 6, 7, 8, 9, 10]",
+    "score < 1",
+    'device_type == "light"',
+    "score < 50",
+    "score < 90",
+]
+
+
+def selectivity(columns, expr):
+    """在生成的列数据上直接计算过滤条件的选择率"""
+    from vector_backend import eval_filter_columns, parse_filter
+    return float(np.mean(eval_filter_columns(parse_filter(expr), columns)))
+
+
+def setup(client, columns, dim, scalar_index, partition_key):
+    create_columnar_collection(client, COLLECTION_NAME, dim, partition_key=partition_key)
+    bulk_load(client, COLLECTION_NAME, batches=iter_column_batches(columns))
+    index_params = client.prepare_index_params()
+    index_params.add_index(field_name="embedding", index_type="FLAT", metric_type="L2")
+    client.create_index(COLLECTION_NAME, index_params)
+    if scalar_index:
+        create_scalar_indexes(client, COLLECTION_NAME, SCALAR_INDEXES)
+    client.load_collection(COLLECTION_NAME)
+
+
+def measure_latency(client, queries, expr, top_k):
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        client.search(
+            collection_name=COLLECTION_NAME,
+            data=[query],
+            limit=top_k,
+            filter=expr,
+            output_fields=["household_id", "device_type", "score"]
+        )
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description="过滤搜索选择率基准")
+    parser.add_argument("--num-entities", type=int, default=100000)
+    parser.add_argument("--dim", type=int, default=128)
+    parser.add_argument("--num-queries", type=int, default=20)
+    parser.add_argument("--top-k", type=int, default=10)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    columns = generate_columns(args.num_entities, args.dim, rng=rng)
+    queries = rng.random((args.num_queries, args.dim), dtype=np.float32).tolist()
+
+    latencies = {}
+    client = create_client()
+    for label, scalar_index, partition_key in CONFIGS:
+        setup(client, columns, args.dim, scalar_index, partition_key)
+        for expr in FILTERS:
+            measure_latency(client, queries[:2], expr, args.top_k)  # 预热
+            latencies[label, expr] = measure_latency(client, queries, expr, args.top_k)
+        client.drop_collection(COLLECTION_NAME)
+
+    rows = []
+    for expr in FILTERS:
+        row = [expr, f"{selectivity(columns, expr):.3%}"]
+        for label, _, _ in CONFIGS:
+            values = latencies[label, expr]
+            row.append(f"{percentile(values, 50) * 1000:.2f} / {percentile(values, 99) * 1000:.2f}")
+        rows.append(row)
+    print(f"行数: {args.num_entities}, 维度: {args.dim}, 查询数: {args.num_queries}, top_k: {args.top_k}")
+    print("延迟为 p50 / p99 (ms)")
+    print_table(rows, ["过滤条件", "选择率"] + [label for label, _, _ in CONFIGS])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+import argparse
+import os
+import time
+
+import numpy as np
+from sentence_transformers import SentenceTransformer
+
+from bench_utils import synthetic_corpus, percentile, print_table
+from embedding import MODEL_NAME, encode_batch
+from onnx_embedding import ONNX_MODEL_DIR, OnnxEmbedder, export_onnx
+
+# ONNX / int8 量化推理基准：单条延迟、批量吞吐，以及与 PyTorch 参考模型的余弦一致性
+
+
+def cosine_rows(a, b):
+    a = a / np.linalg.norm(a, axis=1, keepdims=True)
+    b = b / np.linalg.norm(b, axis=1, keepdims=True)
+    return np.einsum("ij,ij->i", a, b)
+
+
+def bench_model(model, texts, queries, batch_size):
+    model.encode(texts[:batch_size], batch_size=batch_size)  # 预热
+
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        model.encode(query)
+        latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    vectors = encode_batch(model, texts, batch_size)
+    throughput = len(texts) / (time.perf_counter() - start)
+    return vectors, latencies, throughput
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ONNX 量化向量模型基准")
+    parser.add_argument("--model-dir", default=ONNX_MODEL_DIR)
+    parser.add_argument("--num-docs", type=int, default=1000)
+    parser.add_argument("--num-queries", type=int, default=200)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--threads", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    if not os.path.exists(os.path.join(args.model_dir, "model.onnx")):
+        export_onnx(args.model_dir)
+
+    texts = synthetic_corpus(args.num_docs)
+    queries = [q[:30] for q in synthetic_corpus(args.num_queries, seed=1)]
+
+    backends = [
+        ("PyTorch", SentenceTransformer(MODEL_NAME, device="cpu")),
+        ("ONNX fp32", OnnxEmbedder(args.model_dir, quantized=False, intra_op_threads=args.threads)),
+        ("ONNX int8", OnnxEmbedder(args.model_dir, quantized=True, intra_op_threads=args.threads)),
+    ]
+
+    rows = []
+    reference = None
+    for name, model in backends:
+        vectors, latencies, throughput = bench_model(model, texts, queries, args.batch_size)
+        if reference is None:
+            reference = vectors
+            agreement = "-"
+            worst = "-"
+        else:
+            cosines = cosine_rows(reference, vectors)
+            agreement = f"{cosines.mean():.4f}"
+            worst = f"{cosines.min():.4f}"
+        rows.append([
+            name,
+            f"{percentile(latencies, 50) * 1000:.2f}",
+            f"{percentile(latencies, 99) * 1000:.2f}",
+            f"{throughput:.1f}",
+            agreement,
+            worst,
+        ])
+
+    print(f"文档数: {args.num_docs}, 单条查询数: {args.num_queries}, 批大小: {args.batch_size}, 线程数: {args.threads}")
+    print_table(rows, ["后端", "单条p50(ms)", "单条p99(ms)", "吞吐(文档/秒)", "平均余弦一致性", "最低余弦一致性"])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+import argparse
+import os
+import tempfile
+import time
+
+from bench_utils import print_table
+from mqtt_outbox import RingBufferOutbox
+
+# 发件箱基准：断线期间写入发件箱的速度，以及重新连接后按批次读取重放的速度
+# 重放只统计发件箱本身的读取和提交，不包含网络发送
+
+
+def bench(path, num_messages, payload_bytes, sync_every, replay_batch):
+    payload = os.urandom(payload_bytes)
+    outbox = RingBufferOutbox(path, capacity_bytes=(payload_bytes + 64) * num_messages * 2, sync_every=sync_every)
+
+    start = time.perf_counter()
+    for i in range(num_messages):
+        outbox.append(f"home/dev{i % 1000}/telemetry", payload)
+    outbox.flush()
+    append_seconds = time.perf_counter() - start
+    depth_bytes = outbox.depth_bytes
+
+    start = time.perf_counter()
+    replayed = 0
+    while len(outbox):
+        records = outbox.peek(replay_batch)
+        outbox.commit(records[-1][1], len(records))
+        replayed += len(records)
+    replay_seconds = time.perf_counter() - start
+    outbox.close()
+    os.remove(path)
+    assert replayed == num_messages
+    return append_seconds, replay_seconds, depth_bytes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="MQTT 发件箱写入和重放基准")
+    parser.add_argument("--messages", type=int, default=100000)
+    parser.add_argument("--payload-bytes", type=int, nargs="+", default=[16, 256, 4096])
+    parser.add_argument("--sync-every", type=int, nargs="+", default=[1, 256])
+    parser.add_argument("--replay-batch", type=int, default=500)
+    args = parser.parse_args()
+
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "bench_outbox.bin")
+        for payload_bytes in args.payload_bytes:
+            for sync_every in args.sync_every:
+                # 每条都落盘时只测一部分消息
+                num_messages = args.messages if sync_every > 1 else max(1, args.messages // 20)
+                append_seconds, replay_seconds, depth_bytes = bench(
+                    path, num_messages, payload_bytes, sync_every, args.replay_batch
+                )
+                rows.append([
+                    payload_bytes, sync_every, num_messages,
+                    f"{num_messages / append_seconds:.0f}",
+                    f"{depth_bytes / append_seconds / 2 ** 20:.1f}",
+                    f"{num_messages / replay_seconds:.0f}",
+                ])
+    print(f"重放批次: {args.replay_batch} 条")
+    print_table(rows, ["负载字节", "落盘间隔(条)", "消息数", "写入条/秒", "写入MB/秒", "重放条/秒"])
+
+
+if __name__ == "__main__":
+    main()
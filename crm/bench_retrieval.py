@@ -0,0 +1,46 @@
+import argparse
+
+import milvus_rag_demo as rag
+from bench_utils import synthetic_corpus, measure, print_table
+
+# 检索吞吐基准：逐条 retrieve_relevant_docs vs 批量 retrieve_many
+
+
+def per_query_loop(queries, top_k):
+    return [rag.retrieve_relevant_docs(query, top_k) for query in queries]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="批量检索吞吐基准")
+    parser.add_argument("--num-docs", type=int, default=5000)
+    parser.add_argument("--num-queries", type=int, default=500)
+    parser.add_argument("--top-k", type=int, default=3)
+    parser.add_argument("--skip-load", action="store_true", help="复用已有集合，不重新导入语料")
+    args = parser.parse_args()
+
+    if not args.skip_load:
+        rag.setup_collection()
+        rag.store_documents(synthetic_corpus(args.num_docs))
+        rag.create_index()
+
+    # 两种方式使用不同的问题集，避免向量缓存让后执行的一方占便宜
+    loop_queries = [q[:30] for q in synthetic_corpus(args.num_queries, seed=1)]
+    batch_queries = [q[:30] for q in synthetic_corpus(args.num_queries, seed=2)]
+    rag.retrieve_many(["预热查询"], args.top_k)
+
+    rows = []
+    loop_results, elapsed = measure(per_query_loop, loop_queries, args.top_k)
+    baseline = len(loop_queries) / elapsed
+    rows.append(["逐条检索", f"{baseline:.1f}", f"{elapsed / len(loop_queries) * 1000:.2f}", "1.00x"])
+
+    batch_results, elapsed = measure(rag.retrieve_many, batch_queries, args.top_k)
+    rate = len(batch_queries) / elapsed
+    rows.append(["批量检索", f"{rate:.1f}", f"{elapsed / len(batch_queries) * 1000:.2f}", f"{rate / baseline:.2f}x"])
+
+    assert len(batch_results) == len(batch_queries)
+    print(f"文档数: {args.num_docs}, 查询数: {args.num_queries}, top_k: {args.top_k}")
+    print_table(rows, ["方式", "查询/秒", "平均毫秒/查询", "加速比"])
+
+
+if __name__ == "__main__":
+    main()
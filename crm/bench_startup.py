@@ -0,0 +1,61 @@
+import argparse
+import json
+import subprocess
+import sys
+import time
+
+from bench_utils import percentile, print_table
+
+# 启动耗时基准：导入模块、首次向量化、首次检索
+# 每次测量都在新的子进程中进行，得到的是冷启动耗时
+
+
+def child():
+    """在子进程中执行，依次记录各阶段完成的时刻"""
+    start = time.perf_counter()
+    import milvus_rag_demo as rag
+    imported = time.perf_counter()
+    rag.text_to_vector("智能家居系统有哪些主要功能？")
+    embedded = time.perf_counter()
+    searched = embedded
+    if rag.get_client().has_collection(rag.COLLECTION_NAME):
+        rag.get_client().load_collection(rag.COLLECTION_NAME)
+        rag.retrieve_relevant_docs("智能家居系统有哪些主要功能？")
+        searched = time.perf_counter()
+    print(json.dumps({
+        "import": imported - start,
+        "first_embedding": embedded - imported,
+        "first_search": searched - embedded,
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="启动耗时基准")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child()
+        return
+
+    samples = {"import": [], "first_embedding": [], "first_search": []}
+    for _ in range(args.runs):
+        output = subprocess.run(
+            [sys.executable, __file__, "--child"],
+            capture_output=True, text=True, check=True
+        ).stdout.strip().splitlines()[-1]
+        for name, value in json.loads(output).items():
+            samples[name].append(value)
+
+    labels = {"import": "导入 milvus_rag_demo", "first_embedding": "首次向量化", "first_search": "首次检索"}
+    rows = [
+        [labels[name], f"{percentile(values, 50) * 1000:.1f}", f"{max(values) * 1000:.1f}"]
+        for name, values in samples.items()
+    ]
+    print(f"冷启动次数: {args.runs}（集合不存在时首次检索记为 0）")
+    print_table(rows, ["阶段", "中位数(ms)", "最大值(ms)"])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,292 @@
+import argparse
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from bench_utils import percentile, print_table, synthetic_corpus
+
+# 离线端到端基准套件，不依赖外部服务：
+#   向量模型使用确定性的伪向量（EMBEDDING_BACKEND=hash），检索后端使用进程内检索或 Milvus Lite，
+#   MQTT 往返使用本地代理（如 mosquitto，默认 localhost:1883，连不上时跳过）
+# 覆盖 store_documents 吞吐、retrieve_relevant_docs 延迟（含缓存命中）、extract_intent/execute_command 吞吐和 MQTT 往返延迟
+#
+#   python bench_suite.py run --output base.json
+#   python bench_suite.py run --output new.json
+#   python bench_suite.py compare base.json new.json --threshold 0.1
+# compare 对比两次结果，变差超过阈值的指标标记为回退，存在回退时退出码为 1
+
+COMMAND_TEMPLATES = ["打开{device}", "关闭{device}", "{device}状态怎么样", "把{device}调到{value}度",
+                     "请帮我关掉{device}", "{device}是否开启"]
+
+
+def result(name, value, unit, higher_is_better):
+    return {"name": name, "value": value, "unit": unit, "higher_is_better": higher_is_better}
+
+
+def configure_backend(backend, tmp_dir):
+    """必须在导入 milvus_rag_demo 之前调用，各模块在导入时读取这些环境变量"""
+    os.environ["EMBEDDING_BACKEND"] = "hash"
+    os.environ["EMBEDDING_CACHE_DIR"] = ""
+    if backend == "lite":
+        os.environ["VECTOR_BACKEND"] = "milvus"
+        os.environ["MILVUS_URI"] = os.path.join(tmp_dir, "bench_suite.db")
+    else:
+        os.environ["VECTOR_BACKEND"] = "local"
+        os.environ["LOCAL_VECTOR_PATH"] = ""
+
+
+def bench_rag(num_docs, num_queries, top_k):
+    """导入一份合成语料，再逐条检索，返回吞吐和延迟指标"""
+    import milvus_rag_demo as rag
+
+    # 每种规模使用不同的种子，避免不同规模之间共享文档
+    corpus = synthetic_corpus(num_docs, seed=num_docs)
+    queries = [q[:30] for q in synthetic_corpus(num_queries, seed=num_docs + 1)]
+
+    rag.setup_collection()
+    start = time.perf_counter()
+    rag.store_documents(corpus)
+    store_elapsed = time.perf_counter() - start
+    rag.create_index()
+
+    rag.retrieve_relevant_docs("预热查询", top_k)
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        rag.retrieve_relevant_docs(query, top_k)
+        latencies.append(time.perf_counter() - start)
+    # 重复同一批问题，走检索结果缓存
+    cached_latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        rag.retrieve_relevant_docs(query, top_k)
+        cached_latencies.append(time.perf_counter() - start)
+
+    prefix = f"rag[{num_docs}]"
+    return [
+        result(f"{prefix}.store_documents", num_docs / store_elapsed, "docs/s", True),
+        result(f"{prefix}.retrieve_p50", percentile(latencies, 50) * 1000, "ms", False),
+        result(f"{prefix}.retrieve_p99", percentile(latencies, 99) * 1000, "ms", False),
+        result(f"{prefix}.retrieve_qps", len(latencies) / sum(latencies), "queries/s", True),
+        result(f"{prefix}.retrieve_cached_p50", percentile(cached_latencies, 50) * 1000, "ms", False),
+    ]
+
+
+def synthetic_commands(num_commands, seed=0):
+    import random
+    from text import devices
+
+    rng = random.Random(seed)
+    names = list(devices)
+    return [
+        rng.choice(COMMAND_TEMPLATES).format(device=rng.choice(names), value=rng.randint(16, 30))
+        for _ in range(num_commands)
+    ]
+
+
+def bench_commands(num_commands):
+    """意图识别加命令执行的吞吐"""
+    from text import execute_command, extract_intent
+
+    commands = synthetic_commands(num_commands)
+    start = time.perf_counter()
+    for command in commands:
+        parsed = extract_intent(command)
+        execute_command(parsed["intent"], parsed["entities"])
+    elapsed = time.perf_counter() - start
+    return [
+        result("commands.throughput", num_commands / elapsed, "commands/s", True),
+        result("commands.mean_us", elapsed / num_commands * 1e6, "us", False),
+    ]
+
+
+def broker_reachable(host, port, timeout=1.0):
+    try:
+        with socket.create_connection((host, port), timeout=timeout):
+            return True
+    except OSError:
+        return False
+
+
+def mqtt_responder():
+    """在子进程中运行 mqtt_client 的命令处理逻辑，收到命令后回复状态"""
+    import mqtt_client
+
+    client = mqtt_client.create_mqtt_client()
+    if client is None:
+        sys.exit(1)
+    client.loop_forever()
+
+
+def bench_mqtt(host, port, num_messages, timeout=5.0):
+    """发送命令并等待设备回复状态，逐条测量往返延迟；代理不可用时返回空列表"""
+    if not broker_reachable(host, port):
+        print(f"MQTT 代理 {host}:{port} 不可用，跳过往返测试")
+        return []
+    import paho.mqtt.client as mqtt
+
+    env = dict(os.environ, MQTT_BROKER=host, MQTT_PORT=str(port))
+    responder = subprocess.Popen([sys.executable, __file__, "mqtt-responder"], env=env,
+                                 stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    device_id = f"bench-{os.getpid()}"
+    replied = threading.Event()
+    client = mqtt.Client()
+    client.on_message = lambda c, userdata, msg: replied.set()
+    try:
+        client.connect(host, port, 60)
+        client.subscribe(f"home/devices/{device_id}/status", qos=0)
+        client.loop_start()
+
+        def round_trip(action):
+            replied.clear()
+            start = time.perf_counter()
+            client.publish(f"home/devices/{device_id}/command", json.dumps({"action": action}))
+            if not replied.wait(timeout):
+                return None
+            return time.perf_counter() - start
+
+        # 等待应答进程连接并完成订阅
+        deadline = time.perf_counter() + 10
+        while round_trip("on") is None:
+            if time.perf_counter() > deadline:
+                print("应答进程没有回复，跳过往返测试")
+                return []
+
+        latencies = []
+        for i in range(num_messages):
+            latency = round_trip("on" if i % 2 else "off")
+            if latency is None:
+                raise TimeoutError(f"第 {i} 条命令在 {timeout} 秒内没有收到状态回复")
+            latencies.append(latency)
+    finally:
+        client.loop_stop()
+        client.disconnect()
+        responder.terminate()
+        responder.wait()
+
+    return [
+        result("mqtt.round_trip_p50", percentile(latencies, 50) * 1000, "ms", False),
+        result("mqtt.round_trip_p99", percentile(latencies, 99) * 1000, "ms", False),
+    ]
+
+
+def run_once(args):
+    results = []
+    for num_docs in args.num_docs:
+        results.extend(bench_rag(num_docs, args.num_queries, args.top_k))
+    results.extend(bench_commands(args.num_commands))
+    if not args.skip_mqtt:
+        results.extend(bench_mqtt(args.mqtt_host, args.mqtt_port, args.num_messages))
+    return results
+
+
+def merge_repeats(rounds):
+    """每个指标取多轮的中位数，降低单次抖动对对比结果的影响"""
+    merged = []
+    for entry in rounds[0]:
+        samples = [r["value"] for results in rounds for r in results if r["name"] == entry["name"]]
+        merged.append(dict(entry, value=percentile(samples, 50), samples=samples))
+    return merged
+
+
+def run(args):
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        configure_backend(args.backend, tmp_dir)
+        results = merge_repeats([run_once(args) for _ in range(args.repeat)])
+
+    report = {
+        "meta": {
+            "backend": args.backend,
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "cpus": os.cpu_count(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "num_docs": args.num_docs,
+            "num_queries": args.num_queries,
+            "num_commands": args.num_commands,
+            "num_messages": args.num_messages,
+            "repeat": args.repeat,
+        },
+        "results": results,
+    }
+    rows = [[r["name"], f"{r['value']:.2f}", r["unit"]] for r in results]
+    print_table(rows, ["指标", "数值", "单位"])
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"结果已写入 {args.output}")
+
+
+def compare(base, new, threshold):
+    """返回 (表格行, 回退的指标名列表)，变化率按“越大越好”统一方向"""
+    base_results = {r["name"]: r for r in base["results"]}
+    rows = []
+    regressions = []
+    for r in new["results"]:
+        old = base_results.get(r["name"])
+        if old is None or not old["value"]:
+            rows.append([r["name"], "-", f"{r['value']:.2f}", "-", "新增"])
+            continue
+        change = (r["value"] - old["value"]) / old["value"]
+        improvement = change if r["higher_is_better"] else -change
+        if improvement < -threshold:
+            status = "回退"
+            regressions.append(r["name"])
+        elif improvement > threshold:
+            status = "提升"
+        else:
+            status = "持平"
+        rows.append([r["name"], f"{old['value']:.2f}", f"{r['value']:.2f}", f"{change:+.1%}", status])
+    return rows, regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="离线端到端基准套件")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subparsers.add_parser("run", help="运行基准并输出 JSON 结果")
+    run_parser.add_argument("--backend", choices=["local", "lite"], default="local")
+    run_parser.add_argument("--num-docs", type=int, nargs="+", default=[1000, 10000])
+    run_parser.add_argument("--num-queries", type=int, default=200)
+    run_parser.add_argument("--top-k", type=int, default=3)
+    run_parser.add_argument("--num-commands", type=int, default=100000)
+    run_parser.add_argument("--num-messages", type=int, default=500)
+    run_parser.add_argument("--mqtt-host", default="localhost")
+    run_parser.add_argument("--mqtt-port", type=int, default=1883)
+    run_parser.add_argument("--skip-mqtt", action="store_true")
+    run_parser.add_argument("--repeat", type=int, default=3, help="整套基准重复次数，各指标取中位数")
+    run_parser.add_argument("--output", help="结果 JSON 文件")
+
+    compare_parser = subparsers.add_parser("compare", help="对比两次运行结果")
+    compare_parser.add_argument("base")
+    compare_parser.add_argument("new")
+    compare_parser.add_argument("--threshold", type=float, default=0.1, help="判定为回退的相对变化，默认 10%%")
+
+    subparsers.add_parser("mqtt-responder", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.command == "mqtt-responder":
+        mqtt_responder()
+    elif args.command == "run":
+        run(args)
+    else:
+        with open(args.base, encoding="utf-8") as f:
+            base = json.load(f)
+        with open(args.new, encoding="utf-8") as f:
+            new = json.load(f)
+        rows, regressions = compare(base, new, args.threshold)
+        print(f"基准: {args.base} ({base['meta']['timestamp']}), 对比: {args.new} ({new['meta']['timestamp']})")
+        print_table(rows, ["指标", "基准", "当前", "变化", "结论"])
+        if regressions:
+            print(f"{len(regressions)} 项指标回退超过 {args.threshold:.0%}: {', '.join(regressions)}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+import argparse
+import random
+import time
+
+from bench_utils import print_table
+from telemetry import TelemetryBatcher, decode_batch, encode_batch, publish_packet_bytes
+
+# 遥测发布基准：原来每个读数一条文本消息 vs 多个读数合并为一条二进制批次
+# 默认不连接代理，只统计发布调用的开销和报文大小；--broker 指定时通过 paho 实际发送到代理
+# 基准前先用随机批次校验编解码往返（--verify-batches 0 跳过）
+
+METRICS = [("temperature", 20, 30), ("humidity", 40, 70)]
+SENSOR_NAMES = ["temperature", "humidity", "温度", "湿度", "客厅/空调", "Größe", "🌡"]
+
+
+class CaptureClient:
+    """记录发布的报文，代替 MQTT 客户端统计消息数和字节数"""
+
+    def __init__(self):
+        self.messages = []
+
+    def publish(self, topic, payload, qos=0):
+        self.messages.append((topic, payload))
+
+
+class BrokerClient:
+    """转发到真实代理，同时记录报文用于统计"""
+
+    def __init__(self, host, port):
+        import paho.mqtt.client as mqtt
+
+        self.messages = []
+        self.client = mqtt.Client()
+        self.client.connect(host, port, 60)
+        self.client.loop_start()
+
+    def publish(self, topic, payload, qos=0):
+        self.messages.append((topic, payload))
+        return self.client.publish(topic, payload, qos=qos)
+
+    def close(self):
+        self.client.loop_stop()
+        self.client.disconnect()
+
+
+def synthetic_readings(num_homes, duration, period, seed=0):
+    """按时间顺序生成 (住户, 传感器名, 时间戳, 数值)，每个住户每 period 秒每种传感器一条"""
+    rng = random.Random(seed)
+    start = time.time()
+    readings = []
+    for step in range(int(duration // period)):
+        for home in range(num_homes):
+            timestamp = start + step * period + rng.random() * 0.5
+            for metric, low, high in METRICS:
+                readings.append((home, metric, timestamp, round(rng.uniform(low, high), 1)))
+    return readings
+
+
+def publish_text(client, readings):
+    for home, metric, _, value in readings:
+        client.publish(f"home/home{home}/{metric}", str(value))
+
+
+def publish_batched(client, readings, batch_readings):
+    batchers = {}
+    for home, metric, timestamp, value in readings:
+        batcher = batchers.get(home)
+        if batcher is None:
+            batcher = batchers[home] = TelemetryBatcher(client, f"home/home{home}/telemetry",
+                                                        max_readings=batch_readings)
+        batcher.add(metric, value, timestamp)
+    for batcher in batchers.values():
+        batcher.flush()
+
+
+def random_batch(rng):
+    """随机批次：时间戳可以倒退（时间差为负），数值可正可负，传感器名包含非 ASCII 字符"""
+    decimals = rng.randint(0, 3)
+    start = rng.uniform(0, 2e9)
+    readings = [
+        (rng.choice(SENSOR_NAMES), start + rng.uniform(-3600, 3600), rng.uniform(-1e6, 1e6))
+        for _ in range(rng.randint(1, 50))
+    ]
+    return readings, decimals
+
+
+def verify_roundtrip(num_batches, seed=0):
+    """编码后解码应还原到编码精度（时间戳毫秒，数值按小数位数取整）；任意截断的负载都应抛出 ValueError"""
+    rng = random.Random(seed)
+    for _ in range(num_batches):
+        readings, decimals = random_batch(rng)
+        scale = 10 ** decimals
+        payload = encode_batch(readings, decimals)
+        expected = [(sensor, round(timestamp * 1000) / 1000, round(value * scale) / scale)
+                    for sensor, timestamp, value in readings]
+        if decode_batch(payload) != expected:
+            raise AssertionError(f"编解码往返结果不一致: {readings[:3]}...")
+        for length in range(len(payload)):
+            try:
+                decode_batch(payload[:length])
+            except ValueError:
+                continue
+            raise AssertionError(f"截断到 {length}/{len(payload)} 字节的负载没有报错")
+    print(f"编解码往返校验通过: {num_batches} 个随机批次（含截断负载）")
+
+
+def summarize(label, messages, num_readings, elapsed, decode_seconds=None):
+    payload_bytes = sum(len(payload) for _, payload in messages)
+    wire_bytes = sum(publish_packet_bytes(topic, payload) for topic, payload in messages)
+    return [
+        label,
+        len(messages),
+        f"{len(messages) / elapsed:.0f}",
+        f"{num_readings / elapsed:.0f}",
+        f"{payload_bytes / num_readings:.1f}",
+        f"{wire_bytes / num_readings:.1f}",
+        f"{num_readings / decode_seconds:.0f}" if decode_seconds else "-",
+    ]
+
+
+def run(publish_fn, make_client, *args):
+    client = make_client()
+    start = time.perf_counter()
+    publish_fn(client, *args)
+    elapsed = time.perf_counter() - start
+    if hasattr(client, "close"):
+        client.close()
+    return client.messages, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="遥测批量编码基准")
+    parser.add_argument("--homes", type=int, default=1000)
+    parser.add_argument("--duration", type=float, default=300.0, help="模拟的时长（秒）")
+    parser.add_argument("--period", type=float, default=5.0, help="每个传感器的采样周期（秒）")
+    parser.add_argument("--batch-readings", type=int, nargs="+", default=[12, 120, 500])
+    parser.add_argument("--broker", help="MQTT 代理地址，格式 host 或 host:port")
+    parser.add_argument("--verify-batches", type=int, default=200, help="基准前校验编解码的随机批次数")
+    args = parser.parse_args()
+
+    if args.verify_batches:
+        verify_roundtrip(args.verify_batches)
+
+    if args.broker:
+        host, _, port = args.broker.partition(":")
+        make_client = lambda: BrokerClient(host, int(port or 1883))
+    else:
+        make_client = CaptureClient
+
+    readings = synthetic_readings(args.homes, args.duration, args.period)
+    rows = []
+    messages, elapsed = run(publish_text, make_client, readings)
+    start = time.perf_counter()
+    for _, payload in messages:
+        float(payload)
+    rows.append(summarize("文本/每读数一条", messages, len(readings), elapsed, time.perf_counter() - start))
+
+    for batch_readings in args.batch_readings:
+        messages, elapsed = run(publish_batched, make_client, readings, batch_readings)
+        start = time.perf_counter()
+        decoded = sum(len(decode_batch(payload)) for _, payload in messages)
+        decode_seconds = time.perf_counter() - start
+        assert decoded == len(readings)
+        rows.append(summarize(f"二进制批次/{batch_readings}条", messages, len(readings), elapsed, decode_seconds))
+
+    target = f"代理 {args.broker}" if args.broker else "不连接代理"
+    print(f"住户: {args.homes}, 读数: {len(readings)}, {target}")
+    print_table(rows, ["格式", "消息数", "消息/秒", "读数/秒", "负载字节/读数", "线路字节/读数", "解码读数/秒"])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+import argparse
+import random
+import time
+
+from bench_utils import print_table
+from topic_router import OrderedDispatcher, TopicRouter, split_topic
+
+# 主题路由基准：
+#   1. 逐个过滤器比较（订阅数越多越慢） vs 前缀树匹配
+#   2. 处理函数耗时 --handler-ms 时，在网络线程上直接处理 vs 入队到工作线程池，
+#      比较网络线程收完全部消息所需的时间
+
+
+def linear_match(filters, topic):
+    """逐个比较过滤器，作为对照"""
+    levels = split_topic(topic)
+    matches = []
+    for pattern, handler in filters:
+        pattern_levels = split_topic(pattern)
+        for i, level in enumerate(pattern_levels):
+            if level == "#":
+                matches.append(handler)
+                break
+            if i >= len(levels) or (level != "+" and level != levels[i]):
+                break
+        else:
+            if len(pattern_levels) == len(levels):
+                matches.append(handler)
+    return matches
+
+
+def build_filters(num_devices):
+    filters = [(f"home/devices/dev{i}/command", i) for i in range(num_devices)]
+    filters += [("home/+/telemetry", "telemetry"), ("home/devices/+/status", "status"), ("$SYS/#", "sys")]
+    return filters
+
+
+def bench_match(num_devices, num_topics):
+    filters = build_filters(num_devices)
+    router = TopicRouter()
+    for pattern, handler in filters:
+        router.add(pattern, handler)
+    rng = random.Random(0)
+    topics = [f"home/devices/dev{rng.randrange(num_devices)}/command" for _ in range(num_topics)]
+
+    start = time.perf_counter()
+    for topic in topics:
+        router.match(topic)
+    trie_elapsed = time.perf_counter() - start
+
+    # 逐个比较太慢，只取一部分主题测量后折算
+    sample = topics[:max(1, num_topics // 100)]
+    start = time.perf_counter()
+    for topic in sample:
+        linear_match(filters, topic)
+    linear_elapsed = (time.perf_counter() - start) * len(topics) / len(sample)
+    return linear_elapsed / num_topics, trie_elapsed / num_topics
+
+
+def bench_intake(num_messages, handler_ms, num_devices, workers):
+    def handler(device_id):
+        time.sleep(handler_ms / 1000)
+
+    start = time.perf_counter()
+    for i in range(num_messages):
+        handler(i % num_devices)
+    inline_elapsed = time.perf_counter() - start
+
+    dispatcher = OrderedDispatcher(workers, max_queue=num_messages)
+    start = time.perf_counter()
+    for i in range(num_messages):
+        dispatcher.submit(i % num_devices, handler, i % num_devices)
+    intake_elapsed = time.perf_counter() - start
+    dispatcher.close(timeout=None)
+    total_elapsed = time.perf_counter() - start
+    return inline_elapsed, intake_elapsed, total_elapsed, dispatcher.report()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="主题路由和消息分发基准")
+    parser.add_argument("--devices", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--topics", type=int, default=100000)
+    parser.add_argument("--messages", type=int, default=500)
+    parser.add_argument("--handler-ms", type=float, default=2.0)
+    parser.add_argument("--workers", type=int, default=8)
+    args = parser.parse_args()
+
+    rows = []
+    for num_devices in args.devices:
+        linear, trie = bench_match(num_devices, args.topics)
+        rows.append([num_devices + 3, f"{linear * 1e6:.2f}", f"{trie * 1e6:.2f}", f"{linear / trie:.1f}x"])
+    print(f"主题匹配，{args.topics} 个主题")
+    print_table(rows, ["订阅数", "逐个比较(us/主题)", "前缀树(us/主题)", "加速比"])
+
+    inline, intake, total, report = bench_intake(args.messages, args.handler_ms, 100, args.workers)
+    print(f"\n消息接收，{args.messages} 条消息，处理函数耗时 {args.handler_ms}ms")
+    print_table([
+        ["网络线程上直接处理", f"{inline * 1000:.1f}", f"{inline * 1000:.1f}"],
+        [f"工作线程池({args.workers})", f"{intake * 1000:.1f}", f"{total * 1000:.1f}"],
+    ], ["方式", "网络线程占用(ms)", "全部处理完成(ms)"])
+    print(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+import random
+import time
+
+# 基准测试公共工具：合成语料、计时和统计
+
+SUBJECTS = ["智能照明", "智能门锁", "智能音箱", "智能恒温器", "扫地机器人",
+            "监控摄像头", "窗帘电机", "空气净化器", "智能插座", "门窗传感器"]
+ACTIONS = ["可以通过手机应用远程控制", "支持语音助手联动", "能够根据场景自动调整",
+           "会在检测到异常时通知用户", "可以学习用户的使用习惯", "支持定时和自动化规则"]
+DETAILS = ["有效节省能源消耗", "提高家庭安全性", "让居住环境更加舒适",
+           "兼容Zigbee和Wi-Fi协议", "支持Matter协议实现跨品牌互通", "数据在本地处理以保护隐私"]
+
+
+def synthetic_corpus(num_docs, seed=0):
+    """生成智能家居领域的合成段落，每段内容互不相同"""
+    rng = random.Random(seed)
+    docs = []
+    for i in range(num_docs):
+        sentences = [
+            f"{rng.choice(SUBJECTS)}{rng.choice(ACTIONS)}，{rng.choice(DETAILS)}。"
+            for _ in range(rng.randint(2, 4))
+        ]
+        sentences.append(f"型号 {i:06d} 的额定功率为 {rng.randint(5, 200)} 瓦。")
+        docs.append("".join(sentences))
+    return docs
+
+
+def measure(fn, *args, **kwargs):
+    """执行一次并返回 (结果, 耗时秒数)"""
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def percentile(values, p):
+    """线性插值计算百分位数，p 取 0-100"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    k = (len(ordered) - 1) * p / 100.0
+    low = int(k)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (k - low)
+
+
+def print_table(rows, headers):
+    """以对齐的表格打印基准结果"""
+    widths = [max([len(str(h))] + [len(str(r[i])) for r in rows]) for i, h in enumerate(headers)]
+    print("  ".join(str(h).ljust(w) for h, w in zip(headers, widths)))
+    for row in rows:
+        print("  ".join(str(c).ljust(w) for c, w in zip(row, widths)))
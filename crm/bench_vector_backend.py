@@ -0,0 +1,94 @@
+import argparse
+import os
+import time
+
+import numpy as np
+
+from bench_utils import percentile, print_table
+from vector_backend import LocalVectorClient
+
+# 检索后端延迟基准：进程内 NumPy 暴力检索 vs Milvus（Milvus Lite 本地文件或服务器）
+
+COLLECTION_NAME = "bench_vector_backend"
+
+
+def make_client(backend, milvus_uri):
+    if backend == "local":
+        return LocalVectorClient()
+    from pymilvus import MilvusClient
+    return MilvusClient(uri=milvus_uri)
+
+
+def load(client, vectors, batch_size=5000):
+    if client.has_collection(COLLECTION_NAME):
+        client.drop_collection(COLLECTION_NAME)
+    client.create_collection(
+        collection_name=COLLECTION_NAME,
+        dimension=vectors.shape[1],
+        primary_field_name="id",
+        vector_field_name="embedding",
+        metric_type="COSINE"
+    )
+    for start in range(0, len(vectors), batch_size):
+        batch = vectors[start:start + batch_size]
+        client.insert(
+            collection_name=COLLECTION_NAME,
+            data=[
+                {"id": start + i, "embedding": row, "text": f"文档 {start + i}"}
+                for i, row in enumerate(batch.tolist())
+            ]
+        )
+    client.load_collection(COLLECTION_NAME)
+
+
+def measure_latency(client, queries, top_k):
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        client.search(
+            collection_name=COLLECTION_NAME,
+            data=[query],
+            limit=top_k,
+            output_fields=["text"]
+        )
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description="检索后端延迟基准")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 5000, 20000])
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--num-queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--backends", nargs="+", default=["local", "milvus"])
+    parser.add_argument("--milvus-uri", default=os.environ.get("MILVUS_URI", "bench_milvus_lite.db"),
+                        help="Milvus 地址；以 .db 结尾时使用 Milvus Lite 本地文件")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    queries = rng.standard_normal((args.num_queries, args.dim), dtype=np.float32).tolist()
+
+    rows = []
+    for size in args.sizes:
+        vectors = rng.standard_normal((size, args.dim), dtype=np.float32)
+        for backend in args.backends:
+            client = make_client(backend, args.milvus_uri)
+            load(client, vectors)
+            measure_latency(client, queries[:10], args.top_k)  # 预热
+            latencies = measure_latency(client, queries, args.top_k)
+            rows.append([
+                size,
+                backend,
+                f"{percentile(latencies, 50) * 1000:.3f}",
+                f"{percentile(latencies, 99) * 1000:.3f}",
+                f"{len(latencies) / sum(latencies):.1f}",
+            ])
+            client.drop_collection(COLLECTION_NAME)
+
+    print(f"维度: {args.dim}, 查询数: {args.num_queries}, top_k: {args.top_k}")
+    print_table(rows, ["文档数", "后端", "p50(ms)", "p99(ms)", "查询/秒"])
+
+
+if __name__ == "__main__":
+    main()
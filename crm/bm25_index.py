@@ -0,0 +1,180 @@
+import math
+import re
+import threading
+from array import array
+
+import numpy as np
+
+# 本地 BM25 倒排索引，与向量检索并行查询后用倒数排名融合（RRF）合并结果
+# 中文按单字 + 相邻双字切分，英文和数字按词切分并转为小写，
+# 能精确命中 "Matter协议"、"Zigbee" 这类专有名词
+# 倒排表使用 array 存储文档序号和词频，可随文档块的写入增量更新；
+# 删除只做标记，已删除的文档超过 compact_ratio 时自动压缩倒排表
+
+TOKEN_PATTERN = re.compile(r"[a-zA-Z0-9]+|[\u4e00-\u9fff\u3400-\u4dbf]+")
+CJK_PATTERN = re.compile(r"[\u4e00-\u9fff\u3400-\u4dbf]")
+
+
+def tokenize(text):
+    """CJK 感知分词：中文产出单字和双字，英文/数字产出小写词"""
+    tokens = []
+    for match in TOKEN_PATTERN.finditer(text):
+        run = match.group()
+        if CJK_PATTERN.match(run):
+            tokens.extend(run)
+            tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+        else:
+            tokens.append(run.lower())
+    return tokens
+
+
+class BM25Index:
+    """增量更新的 BM25 索引，文档以外部主键（如内容哈希 id）标识"""
+
+    def __init__(self, k1=1.5, b=0.75, compact_ratio=0.25):
+        self.k1 = k1
+        self.b = b
+        self.compact_ratio = compact_ratio
+        self.lock = threading.RLock()
+        self.clear()
+
+    def clear(self):
+        with self.lock:
+            self._reset()
+
+    def _reset(self):
+        self.term_ids = {}
+        self.postings_docs = []  # 每个词一个 array('I')，保存内部文档序号
+        self.postings_tfs = []   # 与 postings_docs 对齐的词频 array('H')
+        self.doc_ids = []
+        self.texts = []
+        self.doc_lens = array("I")
+        self.doc_index = {}
+        self.deleted = set()
+        self.total_len = 0
+
+    def __len__(self):
+        return len(self.doc_index)
+
+    def ids(self):
+        return set(self.doc_index)
+
+    def add(self, doc_id, text):
+        with self.lock:
+            if doc_id in self.doc_index:
+                return
+            doc = len(self.doc_ids)
+            counts = {}
+            for token in tokenize(text):
+                counts[token] = counts.get(token, 0) + 1
+            for token, tf in counts.items():
+                term = self.term_ids.get(token)
+                if term is None:
+                    term = self.term_ids[token] = len(self.postings_docs)
+                    self.postings_docs.append(array("I"))
+                    self.postings_tfs.append(array("H"))
+                self.postings_docs[term].append(doc)
+                self.postings_tfs[term].append(min(tf, 0xFFFF))
+            length = sum(counts.values())
+            self.doc_ids.append(doc_id)
+            self.texts.append(text)
+            self.doc_lens.append(length)
+            self.doc_index[doc_id] = doc
+            self.total_len += length
+
+    def add_many(self, doc_ids, texts):
+        for doc_id, text in zip(doc_ids, texts):
+            self.add(doc_id, text)
+
+    def remove_many(self, doc_ids):
+        """标记删除，倒排表中的记录在查询时跳过，标记过多时压缩"""
+        with self.lock:
+            for doc_id in doc_ids:
+                doc = self.doc_index.pop(doc_id, None)
+                if doc is not None:
+                    self.deleted.add(doc)
+                    self.total_len -= self.doc_lens[doc]
+                    self.texts[doc] = None
+            if self.deleted and len(self.deleted) >= self.compact_ratio * len(self.doc_ids):
+                self.compact()
+
+    def compact(self):
+        """去掉已删除文档的倒排记录并重新编号，不需要重新分词"""
+        with self.lock:
+            if not self.deleted:
+                return
+            if not self.doc_index:
+                self._reset()
+                return
+            keep = np.ones(len(self.doc_ids), dtype=bool)
+            keep[list(self.deleted)] = False
+            remap = (np.cumsum(keep) - 1).astype(np.uint32)
+
+            term_ids = {}
+            postings_docs = []
+            postings_tfs = []
+            for token, term in self.term_ids.items():
+                docs = np.frombuffer(self.postings_docs[term], dtype=np.uint32)
+                live = keep[docs]
+                if not live.any():
+                    continue
+                term_ids[token] = len(postings_docs)
+                postings_docs.append(array("I", remap[docs[live]].tobytes()))
+                postings_tfs.append(array("H", np.frombuffer(self.postings_tfs[term], dtype=np.uint16)[live].tobytes()))
+
+            live_docs = np.flatnonzero(keep)
+            self.term_ids = term_ids
+            self.postings_docs = postings_docs
+            self.postings_tfs = postings_tfs
+            self.doc_ids = [self.doc_ids[doc] for doc in live_docs]
+            self.texts = [self.texts[doc] for doc in live_docs]
+            self.doc_lens = array("I", np.frombuffer(self.doc_lens, dtype=np.uint32)[live_docs].tobytes())
+            self.doc_index = {doc_id: doc for doc, doc_id in enumerate(self.doc_ids)}
+            self.deleted = set()
+
+    def search(self, query, top_k=10):
+        """返回 [{"id", "text", "score"}]，按 BM25 分数从高到低排列"""
+        with self.lock:
+            num_docs = len(self.doc_index)
+            if num_docs == 0:
+                return []
+            doc_lens = np.frombuffer(self.doc_lens, dtype=np.uint32).astype(np.float32)
+            avg_len = self.total_len / num_docs
+            norm = self.k1 * (1 - self.b + self.b * doc_lens / avg_len)
+            scores = np.zeros(len(self.doc_ids), dtype=np.float32)
+            deleted = np.fromiter(self.deleted, dtype=np.uint32, count=len(self.deleted))
+
+            for token in set(tokenize(query)):
+                term = self.term_ids.get(token)
+                if term is None:
+                    continue
+                docs = np.frombuffer(self.postings_docs[term], dtype=np.uint32)
+                tfs = np.frombuffer(self.postings_tfs[term], dtype=np.uint16).astype(np.float32)
+                df = len(docs) - int(np.isin(docs, deleted).sum()) if len(deleted) else len(docs)
+                idf = math.log(1 + (num_docs - df + 0.5) / (df + 0.5))
+                scores[docs] += idf * tfs * (self.k1 + 1) / (tfs + norm[docs])
+
+            if len(deleted):
+                scores[deleted] = 0
+            matched = int(np.count_nonzero(scores))
+            k = min(top_k, matched)
+            if k == 0:
+                return []
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+            return [
+                {"id": self.doc_ids[doc], "text": self.texts[doc], "score": float(scores[doc])}
+                for doc in top
+            ]
+
+
+def reciprocal_rank_fusion(result_lists, top_k, k=60):
+    """倒数排名融合：score = sum(1 / (k + rank))，各列表中的结果以 id 对齐"""
+    fused = {}
+    for results in result_lists:
+        for rank, doc in enumerate(results, start=1):
+            entry = fused.get(doc["id"])
+            if entry is None:
+                entry = fused[doc["id"]] = {"id": doc["id"], "text": doc["text"], "score": 0.0}
+            entry["score"] += 1.0 / (k + rank)
+    return sorted(fused.values(), key=lambda d: d["score"], reverse=True)[:top_k]
@@ -0,0 +1,126 @@
+import argparse
+import os
+import random
+import shutil
+import subprocess
+import time
+import urllib.error
+import urllib.request
+from urllib.parse import urlparse
+
+from vector_backend import MILVUS_URI, create_client
+
+# 启动引导：按模式准备检索后端，就绪后立即返回，不再固定等待
+#   docker  确保 milvus_standalone 容器在运行，轮询健康检查端点直到就绪
+#   server  连接已有的 Milvus 服务器，同样轮询健康检查
+#   lite    嵌入式 Milvus Lite，数据保存在本地文件，无需 Docker
+#   local   进程内 NumPy 检索（vector_backend.LocalVectorClient）
+# lite 和 local 适合测试和单机部署，启动耗时远低于 1 秒
+
+BOOTSTRAP_MODE = os.environ.get("BOOTSTRAP_MODE", "docker")
+MODES = ("docker", "server", "lite", "local")
+
+MILVUS_CONTAINER = os.environ.get("MILVUS_CONTAINER", "milvus_standalone")
+MILVUS_IMAGE = os.environ.get("MILVUS_IMAGE", "milvusdb/milvus:v2.3.3")
+MILVUS_LITE_PATH = os.environ.get("MILVUS_LITE_PATH", "milvus_lite.db")
+
+
+def health_url_for(uri):
+    """Milvus 的 HTTP 健康检查端点（metrics 端口 9091），返回 200 表示服务就绪，与 uri 同一主机"""
+    return f"http://{urlparse(uri).hostname or 'localhost'}:9091/healthz"
+
+
+# 显式设置时覆盖由 MILVUS_URI 推出的地址；调用 bootstrap 时传入的 uri 优先于这里
+MILVUS_HEALTH_URL = os.environ.get("MILVUS_HEALTH_URL") or health_url_for(MILVUS_URI)
+
+
+def check_health(url=MILVUS_HEALTH_URL, timeout=1.0):
+    try:
+        with urllib.request.urlopen(url, timeout=timeout) as response:
+            return response.status == 200
+    except (urllib.error.URLError, OSError):
+        return False
+
+
+def wait_for_health(url=MILVUS_HEALTH_URL, timeout=120.0, interval=0.05, max_interval=1.0):
+    """轮询健康检查端点，间隔按 1.5 倍递增并加入抖动，就绪后返回等待的秒数"""
+    start = time.perf_counter()
+    while not check_health(url):
+        elapsed = time.perf_counter() - start
+        if elapsed >= timeout:
+            raise TimeoutError(f"Milvus 在 {timeout:.0f} 秒内未就绪: {url}")
+        time.sleep(min(interval * random.uniform(0.5, 1.0), timeout - elapsed))
+        interval = min(interval * 1.5, max_interval)
+    return time.perf_counter() - start
+
+
+def docker_available():
+    if shutil.which("docker") is None:
+        return False
+    return subprocess.run(["docker", "info"], capture_output=True).returncode == 0
+
+
+def ensure_container(name=MILVUS_CONTAINER, image=MILVUS_IMAGE):
+    """确保 Milvus 容器在运行，返回 running / started / created"""
+    existing = subprocess.run(
+        ["docker", "ps", "-a", "--filter", f"name=^{name}$", "--format", "{{.State}}"],
+        capture_output=True, text=True
+    ).stdout.strip()
+    if existing == "running":
+        return "running"
+    if existing:
+        subprocess.run(["docker", "start", name], check=True, capture_output=True)
+        return "started"
+    subprocess.run([
+        "docker", "run", "-d",
+        "--name", name,
+        "-p", "19530:19530",
+        "-p", "9091:9091",
+        image, "standalone"
+    ], check=True, capture_output=True)
+    return "created"
+
+
+def bootstrap(mode=BOOTSTRAP_MODE, uri=None, timeout=120.0, health_url=None):
+    """按模式准备后端并返回 (client, 各阶段耗时)；health_url 默认由 uri 推出"""
+    if mode not in MODES:
+        raise ValueError(f"未知的启动模式: {mode}")
+    timings = {}
+    start = time.perf_counter()
+
+    if mode == "local":
+        client = create_client("local")
+    elif mode == "lite":
+        client = create_client("milvus", uri=uri or MILVUS_LITE_PATH)
+        client.manager.wait_until_ready(timeout)
+    else:
+        if mode == "docker":
+            if not docker_available():
+                raise RuntimeError("Docker 未运行，请先启动 Docker，或使用 lite / local 模式")
+            step = time.perf_counter()
+            timings["container"] = ensure_container()
+            timings["container_seconds"] = time.perf_counter() - step
+        health_url = health_url or (health_url_for(uri) if uri else MILVUS_HEALTH_URL)
+        timings["health_seconds"] = wait_for_health(health_url, timeout=timeout)
+        client = create_client("milvus", uri=uri or MILVUS_URI)
+        # HTTP 端点就绪后 gRPC 端口可能还需要片刻，用一次轻量调用确认
+        timings["connect_seconds"] = client.manager.wait_until_ready(timeout)
+
+    timings["total_seconds"] = time.perf_counter() - start
+    return client, timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="启动并等待检索后端就绪")
+    parser.add_argument("--mode", choices=MODES, default=BOOTSTRAP_MODE)
+    parser.add_argument("--uri", help="Milvus 地址或 Milvus Lite 数据文件")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--health-url", help="健康检查端点，默认由 --uri 的主机推出")
+    args = parser.parse_args()
+
+    _, timings = bootstrap(args.mode, args.uri, args.timeout, args.health_url)
+    print(f"{args.mode} 模式已就绪，耗时 {timings['total_seconds']:.2f}秒")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+import math
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from vector_backend import MILVUS_URI
+
+# 列式批量导入：数据以 {字段名: NumPy 数组} 的形式传入（可以是 np.load(mmap_mode="r") 的内存映射），
+# 按字节上限切成视图分批写入，不再为每一行构造 dict 和 list；
+# 可同时保持多个写入请求在途，让下一批的生成/读取与上一批的网络传输重叠
+#
+# Milvus 的 MilvusClient.insert 只接受行格式，列式写入走 ORM 的 Collection.insert，
+# 因此集合需要显式 schema（id、embedding、text、score、household_id、device_type），不能依赖动态字段
+
+# Milvus 单个 gRPC 消息默认上限 64 MB，每批留一半余量
+DEFAULT_BATCH_BYTES = 32 * 1024 * 1024
+BULK_CONNECTION_ALIAS = "bulk_loader"
+
+
+def peak_rss_mb():
+    """进程峰值常驻内存（MB），Linux 上 ru_maxrss 单位为 KB，macOS 上为字节；
+    resource 模块只在 Unix 上可用，其他平台返回 nan"""
+    try:
+        import resource
+    except ImportError:
+        return math.nan
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def row_bytes(columns, sample_size=1000):
+    """估计每行的序列化字节数，字符串列按抽样的平均 UTF-8 长度计算"""
+    total = 0
+    for values in columns.values():
+        values = np.asarray(values[:sample_size])
+        if values.dtype.kind in "UO":
+            total += sum(len(str(v).encode("utf-8")) for v in values) / max(len(values), 1) + 4
+        else:
+            total += values.itemsize * int(np.prod(values.shape[1:]))
+    return max(int(total), 1)
+
+
+def iter_column_batches(columns, max_batch_bytes=DEFAULT_BATCH_BYTES):
+    """把列式数据切成不超过 max_batch_bytes 的批次，每批是原数组的切片视图"""
+    num_rows = len(next(iter(columns.values())))
+    batch_rows = max(1, max_batch_bytes // row_bytes(columns))
+    for start in range(0, num_rows, batch_rows):
+        yield {name: values[start:start + batch_rows] for name, values in columns.items()}
+
+
+def create_columnar_collection(client, collection_name, dim, metric_type="L2", max_text_length=512,
+                               partition_key=None, num_partitions=16):
+    """创建显式 schema 的集合；partition_key 为 household_id 或 device_type 时按该字段哈希分区，
+    带该字段取值的过滤搜索只访问对应分区。进程内后端直接建表"""
+    if client.has_collection(collection_name):
+        client.drop_collection(collection_name)
+    if hasattr(client, "insert_columns"):
+        client.create_collection(
+            collection_name=collection_name,
+            dimension=dim,
+            primary_field_name="id",
+            vector_field_name="embedding",
+            metric_type=metric_type,
+            partition_key_field=partition_key,
+            num_partitions=num_partitions
+        )
+        return
+
+    from pymilvus import DataType
+
+    schema = client.create_schema(auto_id=False, enable_dynamic_field=False)
+    schema.add_field("id", DataType.INT64, is_primary=True)
+    schema.add_field("embedding", DataType.FLOAT_VECTOR, dim=dim)
+    schema.add_field("text", DataType.VARCHAR, max_length=max_text_length)
+    schema.add_field("score", DataType.FLOAT)
+    schema.add_field("household_id", DataType.INT64, is_partition_key=partition_key == "household_id")
+    schema.add_field("device_type", DataType.VARCHAR, max_length=64, is_partition_key=partition_key == "device_type")
+    kwargs = {"num_partitions": num_partitions} if partition_key else {}
+    client.create_collection(collection_name=collection_name, schema=schema, **kwargs)
+
+
+def create_scalar_indexes(client, collection_name, indexes):
+    """为过滤字段建立标量索引，indexes 为 {字段名: 索引类型}，如 {"score": "STL_SORT", "device_type": "INVERTED"}"""
+    if not indexes:
+        return
+    index_params = client.prepare_index_params()
+    for field_name, index_type in indexes.items():
+        index_params.add_index(field_name=field_name, index_type=index_type)
+    client.create_index(collection_name, index_params)
+
+
+class BulkLoader:
+    """列式批量写入器，最多 concurrency 个写入请求同时在途"""
+
+    def __init__(self, client, collection_name, concurrency=1, max_batch_bytes=DEFAULT_BATCH_BYTES,
+                 uri=MILVUS_URI, progress_every=1_000_000):
+        self.client = client
+        self.collection_name = collection_name
+        self.concurrency = max(1, concurrency)
+        self.max_batch_bytes = max_batch_bytes
+        self.progress_every = progress_every
+        self.rows = 0
+        self.batches = 0
+        self.started = None
+        self._lock = threading.Lock()
+        self._insert = self._local_insert if hasattr(client, "insert_columns") else self._milvus_insert(uri)
+
+    def _local_insert(self, batch):
+        self.client.insert_columns(self.collection_name, batch)
+
+    def _milvus_insert(self, uri):
+        from pymilvus import Collection, connections
+
+        connections.connect(alias=BULK_CONNECTION_ALIAS, uri=uri)
+        collection = Collection(self.collection_name, using=BULK_CONNECTION_ALIAS)
+        field_names = [field.name for field in collection.schema.fields]
+
+        def insert(batch):
+            # 按 schema 字段顺序传入列，向量列保持二维 float32 数组
+            collection.insert([batch[name] for name in field_names])
+        return insert
+
+    def _insert_batch(self, batch):
+        self._insert(batch)
+        size = len(batch["id"])
+        with self._lock:
+            last_report = self.rows // self.progress_every
+            self.rows += size
+            self.batches += 1
+            if self.rows // self.progress_every > last_report:
+                print(f"已导入 {self.rows} 行 ({self.rows / (time.perf_counter() - self.started):.0f} 行/秒, "
+                      f"峰值内存 {peak_rss_mb():.0f} MB)")
+
+    def load(self, batches):
+        """写入 iter_column_batches 等产出的批次，返回统计"""
+        self.started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            inflight = []
+            for batch in batches:
+                # 在途请求达到上限时等待最早的一个完成，限制同时驻留内存的批次数
+                if len(inflight) >= self.concurrency:
+                    inflight.pop(0).result()
+                inflight.append(executor.submit(self._insert_batch, batch))
+            for future in inflight:
+                future.result()
+        return self.stats()
+
+    def load_columns(self, columns):
+        return self.load(iter_column_batches(columns, self.max_batch_bytes))
+
+    def stats(self):
+        elapsed = time.perf_counter() - self.started if self.started else 0.0
+        return {
+            "rows": self.rows,
+            "batches": self.batches,
+            "elapsed_seconds": round(elapsed, 3),
+            "rows_per_sec": round(self.rows / elapsed, 1) if elapsed else 0.0,
+            "peak_rss_mb": round(peak_rss_mb(), 1),
+        }
+
+
+def bulk_load(client, collection_name, columns=None, batches=None, **kwargs):
+    """columns 为完整的列式数据，batches 为已切好的批次迭代器（如流式生成的合成数据），二选一"""
+    loader = BulkLoader(client, collection_name, **kwargs)
+    if columns is not None:
+        return loader.load_columns(columns)
+    return loader.load(batches)
@@ -1,114 +1,226 @@
-from pymilvus import MilvusClient
+import argparse
 import numpy as np
 import random
+
+from vector_backend import create_client
+from bulk_loader import DEFAULT_BATCH_BYTES, bulk_load, create_columnar_collection, create_scalar_indexes, row_bytes
 # 这是测试用的
-# 创建 Milvus 客户端
-# 如果使用默认设置的本地 Milvus 服务，可以不传参数
-# 如果连接远程服务器，需要指定 uri
-client = MilvusClient(uri="http://localhost:19530")
 
 # 定义集合名称
 collection_name = "example_collection"
 
-# 删除已存在的同名集合（如果存在）
-if client.has_collection(collection_name):
-    client.drop_collection(collection_name)
-
-# 创建集合
 # 定义向量维度
 dim = 128
 
-# 创建集合，指定主键字段和向量字段
-client.create_collection(
-    collection_name=collection_name,
-    dimension=dim,
-    primary_field_name="id",
-    vector_field_name="embedding"
-)
-
-# 准备要插入的数据
-# 生成随机向量数据
-num_entities = 1000
-entities = [
-    {
-        "id": i,  # 主键
-        "embedding": np.random.random(dim).tolist(),  # 向量数据
-        "text": f"这是第 {i} 个文档",  # 额外的文本字段
-        "score": random.uniform(0, 100)  # 额外的数值字段
+# 模拟生产环境的过滤字段：住户 id 和设备类型
+num_households = 1000
+device_types = ["light", "lock", "camera", "thermostat", "speaker", "plug", "sensor", "curtain"]
+
+# 过滤字段的标量索引：数值范围过滤用排序索引，等值过滤用倒排索引
+SCALAR_INDEXES = {"score": "STL_SORT", "household_id": "INVERTED", "device_type": "INVERTED"}
+
+
+# 生成随机测试数据，索引调优等基准也复用这里的生成器
+def generate_vectors(num_entities, dim=dim, seed=None):
+    """生成 (num_entities, dim) 的随机 float32 向量矩阵"""
+    rng = np.random.default_rng(seed)
+    return rng.random((num_entities, dim), dtype=np.float32)
+
+
+def generate_entities(num_entities, dim=dim, vectors=None, start_id=0):
+    """生成带标量字段的实体列表"""
+    if vectors is None:
+        vectors = generate_vectors(num_entities, dim)
+    return [
+        {
+            "id": start_id + i,  # 主键
+            "embedding": row,  # 向量数据
+            "text": f"这是第 {start_id + i} 个文档",  # 额外的文本字段
+            "score": random.uniform(0, 100),  # 额外的数值字段
+            "household_id": (start_id + i) % num_households,  # 住户 id
+            "device_type": device_types[(start_id + i) % len(device_types)]  # 设备类型
+        }
+        for i, row in enumerate(vectors.tolist())
+    ]
+
+
+def generate_columns(num_entities, dim=dim, start_id=0, rng=None):
+    """生成列式数据 {字段名: 数组}，供 bulk_loader 直接写入"""
+    rng = rng or np.random.default_rng()
+    ids = np.arange(start_id, start_id + num_entities, dtype=np.int64)
+    return {
+        "id": ids,
+        "embedding": rng.random((num_entities, dim), dtype=np.float32),
+        "text": np.char.add(np.char.add("这是第 ", ids.astype(str)), " 个文档"),
+        "score": rng.uniform(0, 100, num_entities).astype(np.float32),
+        "household_id": rng.integers(0, num_households, num_entities),
+        "device_type": np.array(device_types)[rng.integers(0, len(device_types), num_entities)],
+    }
+
+
+def iter_synthetic_batches(num_entities, dim=dim, max_batch_bytes=DEFAULT_BATCH_BYTES, seed=None):
+    """按批流式生成合成数据，内存占用只取决于批大小，可用于千万行级别的容量测试"""
+    rng = np.random.default_rng(seed)
+    batch_rows = max(1, max_batch_bytes // row_bytes(generate_columns(1000, dim, rng=rng)))
+    for start in range(0, num_entities, batch_rows):
+        yield generate_columns(min(batch_rows, num_entities - start), dim, start, rng)
+
+
+def load_columns(vectors_path, scores_path=None, texts_path=None):
+    """以内存映射方式读取真实数据集的 .npy 文件，缺少的标量字段按行号补齐"""
+    vectors = np.load(vectors_path, mmap_mode="r")
+    num_entities = len(vectors)
+    ids = np.arange(num_entities, dtype=np.int64)
+    return {
+        "id": ids,
+        "embedding": vectors,
+        "text": np.load(texts_path, mmap_mode="r") if texts_path else np.char.add("文档 ", ids.astype(str)),
+        "score": np.load(scores_path, mmap_mode="r") if scores_path else np.zeros(num_entities, dtype=np.float32),
+        "household_id": ids % num_households,
+        "device_type": np.array(device_types)[ids % len(device_types)],
     }
-    for i in range(num_entities)
-]
-
-# 插入数据
-client.insert(
-    collection_name=collection_name,
-    data=entities
-)
-
-# 创建索引以加速搜索
-client.create_index(
-    collection_name=collection_name,
-    field_name="embedding",
-    index_type="IVF_FLAT",  # 索引类型
-    metric_type="L2",       # 距离度量方式
-    params={"nlist": 128}   # 索引参数
-)
-
-# 加载集合到内存
-client.load_collection(collection_name)
-
-# 执行向量搜索
-# 生成一个随机查询向量
-query_vector = np.random.random(dim).tolist()
-
-# 执行搜索
-search_results = client.search(
-    collection_name=collection_name,
-    data=[query_vector],    # 查询向量
-    field_name="embedding", # 要搜索的向量字段
-    limit=5,                # 返回最相似的5个结果
-    output_fields=["text", "score"]  # 返回这些额外字段
-)
-
-# 打印搜索结果
-print("搜索结果:")
-for i, result in enumerate(search_results):
-    print(f"\n查询向量 {i} 的结果:")
-    for hit in result:
-        print(f"ID: {hit['id']}, 距离: {hit['distance']}, 文本: {hit['entity']['text']}, 分数: {hit['entity']['score']}")
-
-# 按条件过滤搜索
-filtered_results = client.search(
-    collection_name=collection_name,
-    data=[query_vector],
-    field_name="embedding",
-    limit=5,
-    filter="score > 50",  # 只返回分数大于50的结果
-    output_fields=["text", "score"]
-)
-
-# 打印过滤后的搜索结果
-print("\n过滤后的搜索结果 (score > 50):")
-for i, result in enumerate(filtered_results):
-    print(f"\n查询向量 {i} 的结果:")
-    for hit in result:
-        print(f"ID: {hit['id']}, 距离: {hit['distance']}, 文本: {hit['entity']['text']}, 分数: {hit['entity']['score']}")
-
-# 执行混合查询（向量 + 标量查询）
-hybrid_results = client.query(
-    collection_name=collection_name,
-    filter="score > 70",
-    output_fields=["id", "score", "text"],
-    limit=5
-)
-
-# 打印混合查询结果
-print("\n混合查询结果 (score > 70):")
-for result in hybrid_results:
-    print(f"ID: {result['id']}, 文本: {result['text']}, 分数: {result['score']}")
-
-# 清理：释放集合并删除
-client.release_collection(collection_name)
-client.drop_collection(collection_name)
-
-print("\n示例完成，集合已删除")
+
+
+def main(num_entities=1000, concurrency=1, batch_mb=DEFAULT_BATCH_BYTES // 2 ** 20,
+         vectors_path=None, scores_path=None, texts_path=None, load_only=False,
+         partition_key=None, scalar_index=False):
+    # 创建 Milvus 客户端
+    # 如果使用默认设置的本地 Milvus 服务，可以不传参数
+    # 如果连接远程服务器，需要通过 MILVUS_URI 指定 uri
+    # 设置 VECTOR_BACKEND=local 时改用进程内的 NumPy 检索
+    client = create_client()
+
+    # 准备要插入的数据：真实数据集的 .npy 文件，或按批流式生成的随机数据
+    max_batch_bytes = batch_mb * 2 ** 20
+    if vectors_path:
+        columns = load_columns(vectors_path, scores_path, texts_path)
+        vector_dim = columns["embedding"].shape[1]
+        batches = None
+    else:
+        columns = None
+        vector_dim = dim
+        batches = iter_synthetic_batches(num_entities, dim, max_batch_bytes)
+
+    # 删除已存在的同名集合，显式建表；可选按住户 id 分区
+    create_columnar_collection(client, collection_name, vector_dim, partition_key=partition_key)
+
+    # 列式批量插入数据
+    stats = bulk_load(
+        client,
+        collection_name,
+        columns=columns,
+        batches=batches,
+        concurrency=concurrency,
+        max_batch_bytes=max_batch_bytes
+    )
+    print(f"导入完成: {stats['rows']} 行, {stats['batches']} 批, 耗时 {stats['elapsed_seconds']:.2f}秒, "
+          f"{stats['rows_per_sec']:.0f} 行/秒, 峰值内存 {stats['peak_rss_mb']:.0f} MB")
+    # 本地后端设置了 LOCAL_VECTOR_PATH 时写入磁盘，--load-only 导入的数据供后续进程使用
+    client.flush(collection_name)
+    if load_only:
+        return stats
+
+    # 创建索引以加速搜索
+    client.create_index(
+        collection_name=collection_name,
+        field_name="embedding",
+        index_type="IVF_FLAT",  # 索引类型
+        metric_type="L2",       # 距离度量方式
+        params={"nlist": 128}   # 索引参数
+    )
+
+    # 为过滤字段创建标量索引
+    if scalar_index:
+        create_scalar_indexes(client, collection_name, SCALAR_INDEXES)
+
+    # 加载集合到内存
+    client.load_collection(collection_name)
+
+    # 执行向量搜索
+    # 生成一个随机查询向量
+    query_vector = np.random.random(vector_dim).tolist()
+
+    # 执行搜索
+    search_results = client.search(
+        collection_name=collection_name,
+        data=[query_vector],    # 查询向量
+        field_name="embedding", # 要搜索的向量字段
+        limit=5,                # 返回最相似的5个结果
+        output_fields=["text", "score"]  # 返回这些额外字段
+    )
+
+    # 打印搜索结果
+    print("搜索结果:")
+    for i, result in enumerate(search_results):
+        print(f"\n查询向量 {i} 的结果:")
+        for hit in result:
+            print(f"ID: {hit['id']}, 距离: {hit['distance']}, 文本: {hit['entity']['text']}, 分数: {hit['entity']['score']}")
+
+    # 按条件过滤搜索
+    filtered_results = client.search(
+        collection_name=collection_name,
+        data=[query_vector],
+        field_name="embedding",
+        limit=5,
+        filter="score > 50",  # 只返回分数大于50的结果
+        output_fields=["text", "score"]
+    )
+
+    # 打印过滤后的搜索结果
+    print("\n过滤后的搜索结果 (score > 50):")
+    for i, result in enumerate(filtered_results):
+        print(f"\n查询向量 {i} 的结果:")
+        for hit in result:
+            print(f"ID: {hit['id']}, 距离: {hit['distance']}, 文本: {hit['entity']['text']}, 分数: {hit['entity']['score']}")
+
+    # 按住户和设备类型过滤搜索，使用分区键时只访问该住户所在的分区
+    household_filter = 'household_id == 42 and device_type == "light"'
+    household_results = client.search(
+        collection_name=collection_name,
+        data=[query_vector],
+        field_name="embedding",
+        limit=5,
+        filter=household_filter,
+        output_fields=["text", "household_id", "device_type"]
+    )
+
+    print(f"\n按住户过滤的搜索结果 ({household_filter}):")
+    for result in household_results:
+        for hit in result:
+            print(f"ID: {hit['id']}, 距离: {hit['distance']}, 文本: {hit['entity']['text']}, "
+                  f"住户: {hit['entity']['household_id']}, 设备: {hit['entity']['device_type']}")
+
+    # 执行混合查询（向量 + 标量查询）
+    hybrid_results = client.query(
+        collection_name=collection_name,
+        filter="score > 70",
+        output_fields=["id", "score", "text"],
+        limit=5
+    )
+
+    # 打印混合查询结果
+    print("\n混合查询结果 (score > 70):")
+    for result in hybrid_results:
+        print(f"ID: {result['id']}, 文本: {result['text']}, 分数: {result['score']}")
+
+    # 清理：释放集合并删除
+    client.release_collection(collection_name)
+    client.drop_collection(collection_name)
+
+    print("\n示例完成，集合已删除")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Milvus 示例与列式批量导入")
+    parser.add_argument("--num-entities", type=int, default=1000, help="随机生成的行数")
+    parser.add_argument("--concurrency", type=int, default=1, help="同时在途的写入请求数")
+    parser.add_argument("--batch-mb", type=int, default=DEFAULT_BATCH_BYTES // 2 ** 20, help="单批写入的大小上限 (MB)")
+    parser.add_argument("--vectors", help="真实数据集的向量 .npy 文件，指定后不再随机生成")
+    parser.add_argument("--scores", help="score 字段的 .npy 文件")
+    parser.add_argument("--texts", help="text 字段的 .npy 文件")
+    parser.add_argument("--load-only", action="store_true", help="只导入数据，保留集合，不运行搜索示例")
+    parser.add_argument("--partition-key", choices=["household_id", "device_type"], help="按该字段分区")
+    parser.add_argument("--scalar-index", action="store_true", help="为过滤字段创建标量索引")
+    args = parser.parse_args()
+    main(args.num_entities, args.concurrency, args.batch_mb, args.vectors, args.scores, args.texts, args.load_only,
+         args.partition_key, args.scalar_index)
@@ -0,0 +1,346 @@
+import functools
+import os
+import queue
+import random
+import threading
+import time
+
+from metrics import Histogram
+
+# Milvus 连接管理：有界连接池、带抖动的指数退避重试、单次调用超时、健康检查，
+# 以及在途请求数和各方法的延迟统计
+# 各脚本通过 vector_backend.create_client() 拿到 PooledClient，用法与 MilvusClient 相同，
+# 多个工作线程并发检索时分摊到不同连接上，不会在同一个连接上排队
+
+MILVUS_POOL_SIZE = int(os.environ.get("MILVUS_POOL_SIZE", "4"))
+MILVUS_TIMEOUT = float(os.environ.get("MILVUS_TIMEOUT", "10"))
+MILVUS_MAX_RETRIES = int(os.environ.get("MILVUS_MAX_RETRIES", "3"))
+
+# 只在本地构造对象、不发请求的方法，不占用连接也不重试
+LOCAL_METHODS = {"create_schema", "create_field_schema", "prepare_index_params"}
+# 超时后服务端可能已经执行成功，这类方法只在确定请求未送达时重试，避免重复写入
+NON_IDEMPOTENT_METHODS = {"insert"}
+# 返回的迭代器在后续 next() 中继续使用创建它的连接，连接一直借出到迭代器关闭
+ITERATOR_METHODS = {"query_iterator", "search_iterator"}
+
+UNAVAILABLE_MARKERS = ("UNAVAILABLE", "Fail connecting to server", "Connection refused", "connection reset",
+                       "MilvusUnavailableException")
+TIMEOUT_MARKERS = ("DEADLINE_EXCEEDED", "deadline exceeded", "RESOURCE_EXHAUSTED", "rate limit")
+
+
+def _error_text(exc):
+    code = getattr(exc, "code", None)
+    if callable(code):
+        # grpc.RpcError.code() 返回 StatusCode
+        try:
+            code = code()
+        except Exception:
+            code = None
+    return f"{type(exc).__name__} {getattr(code, 'name', code)} {exc}"
+
+
+def is_unavailable(exc):
+    """连接失败类错误：请求没有送达服务端"""
+    if isinstance(exc, ConnectionError):
+        return True
+    text = _error_text(exc)
+    return any(marker in text for marker in UNAVAILABLE_MARKERS)
+
+
+def is_transient(exc):
+    """可重试的临时错误：连接不可用、超时或限流"""
+    if isinstance(exc, TimeoutError) or is_unavailable(exc):
+        return True
+    text = _error_text(exc)
+    return any(marker in text for marker in TIMEOUT_MARKERS)
+
+
+class MethodStats:
+    def __init__(self, name):
+        self.calls = 0
+        self.errors = 0
+        self.retries = 0
+        self.latency = Histogram(name)
+
+    def as_dict(self):
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "retries": self.retries,
+            "p50_ms": self.latency.quantile(0.5) / 1e6,
+            "p99_ms": self.latency.quantile(0.99) / 1e6,
+            "max_ms": self.latency.max / 1e6,
+        }
+
+
+class ConnectionManager:
+    """最多 pool_size 个客户端的连接池，连接在首次需要时创建
+
+    client_class 是代理对外暴露的接口类型（默认 MilvusClient），用于判断方法是否存在，不需要建立连接
+    """
+
+    def __init__(self, uri=None, pool_size=MILVUS_POOL_SIZE, timeout=MILVUS_TIMEOUT,
+                 max_retries=MILVUS_MAX_RETRIES, backoff_base=0.1, backoff_max=2.0,
+                 client_factory=None, client_class=None, **client_kwargs):
+        if uri is None:
+            from vector_backend import MILVUS_URI
+            uri = MILVUS_URI
+        self.uri = uri
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.client_factory = client_factory or self._default_factory
+        self.client_kwargs = client_kwargs
+
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(pool_size)
+        self._lock = threading.Lock()
+        self._client_type = client_class
+        self.created = 0
+        self.discarded = 0
+        self.inflight = 0
+        self.max_inflight = 0
+        self.method_stats = {}
+
+        self.healthy = None
+        self.last_health_check = None
+        self._health_thread = None
+        self._health_stop = threading.Event()
+
+    def _default_factory(self):
+        from pymilvus import MilvusClient
+        return MilvusClient(uri=self.uri, timeout=self.timeout, **self.client_kwargs)
+
+    def _create(self):
+        client = self.client_factory()
+        with self._lock:
+            self.created += 1
+        return client
+
+    def _discard(self, client):
+        with self._lock:
+            self.discarded += 1
+        try:
+            client.close()
+        except Exception:
+            pass
+
+    def _checkout(self, timeout=None):
+        if not self._slots.acquire(timeout=timeout or self.timeout):
+            raise TimeoutError(f"等待 Milvus 连接超时（连接池大小 {self.pool_size}）")
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            try:
+                return self._create()
+            except Exception:
+                self._slots.release()
+                raise
+
+    def _checkin(self, client, broken=False):
+        if broken:
+            # 连接类错误后丢弃该客户端，下次使用时重新建立连接
+            self._discard(client)
+        else:
+            self._idle.put(client)
+        self._slots.release()
+
+    def client_type(self):
+        if self._client_type is None:
+            from pymilvus import MilvusClient
+            self._client_type = MilvusClient
+        return self._client_type
+
+    def _stats(self, method):
+        stats = self.method_stats.get(method)
+        if stats is None:
+            with self._lock:
+                stats = self.method_stats.setdefault(method, MethodStats(method))
+        return stats
+
+    def backoff(self, attempt):
+        """全抖动指数退避：在 [0, min(上限, base * 2^attempt)] 内随机等待"""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def _retryable(self, method, exc):
+        if method in NON_IDEMPOTENT_METHODS:
+            return is_unavailable(exc)
+        return is_transient(exc)
+
+    def call(self, method, *args, **kwargs):
+        """从连接池取出客户端执行 method，临时错误按退避策略重试"""
+        if method in LOCAL_METHODS:
+            client = self._checkout()
+            try:
+                return getattr(client, method)(*args, **kwargs)
+            finally:
+                self._checkin(client)
+
+        kwargs.setdefault("timeout", self.timeout)
+        stats = self._stats(method)
+        attempt = 0
+        while True:
+            with self._lock:
+                self.inflight += 1
+                self.max_inflight = max(self.max_inflight, self.inflight)
+            start = time.perf_counter_ns()
+            try:
+                client = self._checkout()
+                try:
+                    result = getattr(client, method)(*args, **kwargs)
+                except Exception as e:
+                    self._checkin(client, broken=is_unavailable(e))
+                    raise
+                self._checkin(client)
+                stats.latency.record(time.perf_counter_ns() - start)
+                with self._lock:
+                    stats.calls += 1
+                return result
+            except Exception as e:
+                retry = attempt < self.max_retries and self._retryable(method, e)
+                with self._lock:
+                    stats.errors += 1
+                    stats.retries += retry
+                if not retry:
+                    raise
+                attempt += 1
+                time.sleep(self.backoff(attempt))
+            finally:
+                with self._lock:
+                    self.inflight -= 1
+
+    def iterator(self, method, *args, **kwargs):
+        """创建 query_iterator / search_iterator，客户端借出到迭代器 close() 为止，
+        期间其他线程不会拿到这个连接；迭代过程中同一线程再调用其他方法会占用另一个连接"""
+        kwargs.setdefault("timeout", self.timeout)
+        client = self._checkout()
+        try:
+            iterator = getattr(client, method)(*args, **kwargs)
+        except Exception as e:
+            self._checkin(client, broken=is_unavailable(e))
+            raise
+        return PooledIterator(self, client, iterator)
+
+    def client(self):
+        return PooledClient(self)
+
+    def ping(self, timeout=None):
+        """健康检查：执行一次 list_collections，成功返回 True"""
+        try:
+            client = self._checkout(timeout)
+        except Exception:
+            self.healthy = False
+            return False
+        try:
+            client.list_collections(timeout=timeout or self.timeout)
+            self.healthy = True
+        except Exception as e:
+            self.healthy = False
+            self._checkin(client, broken=is_unavailable(e))
+            return False
+        finally:
+            self.last_health_check = time.time()
+        self._checkin(client)
+        return True
+
+    def wait_until_ready(self, timeout=60.0, probe_timeout=2.0):
+        """轮询健康检查直到服务可用，超过 timeout 秒抛出 TimeoutError，返回等待秒数"""
+        start = time.perf_counter()
+        attempt = 0
+        while not self.ping(probe_timeout):
+            elapsed = time.perf_counter() - start
+            if elapsed >= timeout:
+                raise TimeoutError(f"Milvus 在 {timeout:.0f} 秒内未就绪: {self.uri}")
+            attempt += 1
+            time.sleep(min(self.backoff(attempt), timeout - elapsed))
+        return time.perf_counter() - start
+
+    def start_health_checks(self, interval=30.0):
+        """后台线程定期健康检查，失败时清空空闲连接以便重新建立"""
+        if self._health_thread is not None:
+            return
+
+        def run():
+            while not self._health_stop.wait(interval):
+                if not self.ping():
+                    self._drain_idle()
+
+        self._health_thread = threading.Thread(target=run, name="milvus-health", daemon=True)
+        self._health_thread.start()
+
+    def _drain_idle(self):
+        while True:
+            try:
+                self._discard(self._idle.get_nowait())
+            except queue.Empty:
+                return
+
+    def stats(self):
+        return {
+            "uri": self.uri,
+            "pool_size": self.pool_size,
+            "created": self.created,
+            "discarded": self.discarded,
+            "idle": self._idle.qsize(),
+            "inflight": self.inflight,
+            "max_inflight": self.max_inflight,
+            "healthy": self.healthy,
+            "methods": {name: s.as_dict() for name, s in sorted(self.method_stats.items())},
+        }
+
+    def close(self):
+        self._health_stop.set()
+        self._drain_idle()
+
+
+class PooledClient:
+    """MilvusClient 兼容的代理：每次方法调用都经过 ConnectionManager.call"""
+
+    def __init__(self, manager):
+        self.manager = manager
+
+    def __getattr__(self, name):
+        # 只代理 MilvusClient 上真实存在的方法，hasattr 判断后端能力时结果与直连一致
+        if name.startswith("_") or not hasattr(self.manager.client_type(), name):
+            raise AttributeError(name)
+        if name in ITERATOR_METHODS:
+            return functools.partial(self.manager.iterator, name)
+        return functools.partial(self.manager.call, name)
+
+    def close(self):
+        self.manager.close()
+
+
+class PooledIterator:
+    """包装 MilvusClient 的迭代器，close() 时把借出的客户端还回连接池"""
+
+    def __init__(self, manager, client, iterator):
+        self.manager = manager
+        self.client = client
+        self.iterator = iterator
+        self.broken = False
+        self.closed = False
+
+    def next(self):
+        try:
+            return self.iterator.next()
+        except Exception as e:
+            self.broken = self.broken or is_unavailable(e)
+            raise
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        try:
+            self.iterator.close()
+        finally:
+            self.manager._checkin(self.client, broken=self.broken)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
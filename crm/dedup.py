@@ -0,0 +1,118 @@
+import hashlib
+import zlib
+
+import numpy as np
+
+# 近似重复文档块检测
+# 对字符 shingle 计算 MinHash 签名，再用 LSH 分桶找候选，
+# 每个文档块只与同桶的已保留块比较，整体耗时与语料规模近似线性，
+# 重复的段落在进入 text_to_vector 之前就被丢弃
+
+MERSENNE_PRIME = (1 << 61) - 1
+MAX_HASH = (1 << 32) - 1
+
+
+def text_digest(text):
+    """完全重复检测用的定长摘要（16 字节），不保存文本本身，内存不随块长度增长"""
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+
+
+def shingles(text, size=5):
+    """字符 shingle 集合，忽略空白"""
+    text = "".join(text.split())
+    if len(text) <= size:
+        return {text}
+    return {text[i:i + size] for i in range(len(text) - size + 1)}
+
+
+class MinHasher:
+    """按 (a*x + b) mod p 生成 num_perm 个哈希函数"""
+
+    def __init__(self, num_perm=64, seed=1):
+        rng = np.random.default_rng(seed)
+        self.num_perm = num_perm
+        # a、b 取 32 位以内，保证与 32 位 shingle 哈希相乘不会溢出 uint64
+        self.a = rng.integers(1, MAX_HASH, num_perm, dtype=np.uint64)
+        self.b = rng.integers(0, MAX_HASH, num_perm, dtype=np.uint64)
+
+    def signature(self, text, shingle_size=5):
+        hashes = np.fromiter(
+            (zlib.crc32(s.encode("utf-8")) for s in shingles(text, shingle_size)),
+            dtype=np.uint64
+        )
+        values = (hashes[:, None] * self.a[None, :] + self.b[None, :]) % MERSENNE_PRIME
+        return (values & MAX_HASH).min(axis=0).astype(np.uint32)
+
+
+class NearDuplicateFilter:
+    """流式去重：add(text) 返回 False 表示与已保留的文档块近似重复"""
+
+    def __init__(self, threshold=0.8, num_perm=64, bands=16, shingle_size=5, vector_bytes=384 * 4):
+        if num_perm % bands:
+            raise ValueError("num_perm 必须能被 bands 整除")
+        self.threshold = threshold
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        self.vector_bytes = vector_bytes
+        self.hasher = MinHasher(num_perm)
+        self.buckets = [{} for _ in range(bands)]
+        # 已保留文档块的签名矩阵，候选比较一次向量化完成
+        self.signatures = np.empty((1024, num_perm), dtype=np.uint32)
+
+        self.kept = 0
+        self.dropped = 0
+        self.exact_dropped = 0
+        self.seen_exact = set()
+
+    def add(self, text):
+        # 完全相同的文本直接丢弃，无需计算签名
+        digest = text_digest(text)
+        if digest in self.seen_exact:
+            self.dropped += 1
+            self.exact_dropped += 1
+            return False
+
+        signature = self.hasher.signature(text, self.shingle_size)
+        keys = [signature[i * self.rows:(i + 1) * self.rows].tobytes() for i in range(self.bands)]
+        candidates = set()
+        for band, key in zip(self.buckets, keys):
+            candidates.update(band.get(key, ()))
+        if candidates:
+            rows = self.signatures[np.fromiter(candidates, dtype=np.int64, count=len(candidates))]
+            if (rows == signature).mean(axis=1).max() >= self.threshold:
+                self.dropped += 1
+                return False
+
+        index = self.kept
+        if index >= len(self.signatures):
+            self.signatures = np.concatenate([self.signatures, np.empty_like(self.signatures)])
+        self.signatures[index] = signature
+        for band, key in zip(self.buckets, keys):
+            band.setdefault(key, []).append(index)
+        self.seen_exact.add(digest)
+        self.kept += 1
+        return True
+
+    def filter(self, chunks):
+        """惰性过滤，可直接串接在流式导入流水线中"""
+        for chunk in chunks:
+            if self.add(chunk):
+                yield chunk
+
+    def report(self):
+        return {
+            "kept": self.kept,
+            "dropped": self.dropped,
+            "exact_dropped": self.exact_dropped,
+            "near_dropped": self.dropped - self.exact_dropped,
+            "embeddings_saved": self.dropped,
+            "vector_bytes_saved": self.dropped * self.vector_bytes,
+        }
+
+
+def deduplicate(chunks, threshold=0.8, **kwargs):
+    """对文档块列表去重，返回 (保留的文档块, 统计)"""
+    dedup_filter = NearDuplicateFilter(threshold, **kwargs)
+    kept = list(dedup_filter.filter(chunks))
+    return kept, dedup_filter.report()
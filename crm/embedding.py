@@ -0,0 +1,154 @@
+import os
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+
+import numpy as np
+
+# 批量向量化工具
+# model.encode 一次只处理一条文本时吞吐很低，这里统一按批次编码，
+# 结果保持为 NumPy 矩阵，直到插入 Milvus 时才整体转换为列表
+
+MODEL_NAME = 'paraphrase-multilingual-MiniLM-L12-v2'
+DEFAULT_BATCH_SIZE = 64
+
+
+def iter_batches(items, batch_size):
+    """把序列切分成固定大小的批次"""
+    for start in range(0, len(items), batch_size):
+        yield items[start:start + batch_size]
+
+
+def encode_batch(model, texts, batch_size=DEFAULT_BATCH_SIZE):
+    """批量向量化文本，返回 (N, dim) 的 float32 矩阵"""
+    texts = list(texts)
+    if not texts:
+        dim = model.get_sentence_embedding_dimension()
+        return np.empty((0, dim), dtype=np.float32)
+
+    vectors = model.encode(
+        texts,
+        batch_size=batch_size,
+        convert_to_numpy=True,
+        show_progress_bar=False
+    )
+    return np.ascontiguousarray(vectors, dtype=np.float32)
+
+
+def embed_texts(model, texts, batch_size=DEFAULT_BATCH_SIZE, cache=None, pool=None):
+    """统一的向量化入口：可选向量缓存和多进程池"""
+    if pool is not None:
+        encode_fn = pool.encode
+    else:
+        encode_fn = lambda batch: encode_batch(model, batch, batch_size)
+    if cache is None:
+        return encode_fn(list(texts))
+    return cache.get_or_encode(texts, encode_fn)
+
+
+def build_entities(ids, texts, vectors):
+    """插入前组装实体，向量矩阵只做一次整体 tolist 转换"""
+    rows = vectors.tolist() if isinstance(vectors, np.ndarray) else vectors
+    return [
+        {"id": id_, "text": text, "embedding": row}
+        for id_, text, row in zip(ids, texts, rows)
+    ]
+
+
+# 进程池中每个工作进程持有自己的模型实例
+_worker_model = None
+
+
+def _init_worker(backend, model_name, num_threads):
+    global _worker_model
+    from resources import load_model
+
+    # 与主进程使用同一个向量化后端，写入缓存的向量与缓存键的模型标识一致；
+    # 限制每个进程的线程数，避免多进程之间争抢CPU
+    _worker_model = load_model(backend, model_name, num_threads)
+
+
+def _encode_in_worker(texts, batch_size):
+    return encode_batch(_worker_model, texts, batch_size)
+
+
+def _worker_dimension():
+    return _worker_model.get_sentence_embedding_dimension()
+
+
+class EmbeddingPool:
+    """多进程向量化：每个进程加载一份模型，文本按批次分发到各个CPU核心"""
+
+    def __init__(self, model_name=MODEL_NAME, num_workers=None, batch_size=DEFAULT_BATCH_SIZE, backend=None):
+        # backend 默认取 resources.EMBEDDING_BACKEND，与 get_model() 一致
+        cpu_count = os.cpu_count() or 1
+        self.num_workers = num_workers or cpu_count
+        self.batch_size = batch_size
+        self.dimension = None
+        threads_per_worker = max(1, cpu_count // self.num_workers)
+        self.executor = ProcessPoolExecutor(
+            max_workers=self.num_workers,
+            initializer=_init_worker,
+            initargs=(backend, model_name, threads_per_worker)
+        )
+
+    def encode(self, texts, chunk_size=None):
+        """并行向量化，结果按输入顺序拼接"""
+        texts = list(texts)
+        if not texts:
+            # 与 encode_batch 一致返回 (0, dim)，维度向工作进程中的模型查询一次
+            if self.dimension is None:
+                self.dimension = self.executor.submit(_worker_dimension).result()
+            return np.empty((0, self.dimension), dtype=np.float32)
+
+        # 每个任务包含若干个批次，减少进程间通信次数
+        chunk_size = chunk_size or self.batch_size * 4
+        parts = self.executor.map(
+            _encode_in_worker,
+            iter_batches(texts, chunk_size),
+            repeat(self.batch_size)
+        )
+        return np.vstack(list(parts))
+
+    def close(self):
+        self.executor.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def encode_parallel(texts, model_name=MODEL_NAME, num_workers=None, batch_size=DEFAULT_BATCH_SIZE):
+    """一次性的多进程向量化，适合大规模离线导入"""
+    with EmbeddingPool(model_name, num_workers, batch_size) as pool:
+        return pool.encode(texts)
+
+
+class HashEmbedder:
+    """确定性的伪向量模型：字符 bigram 特征哈希到固定维度后归一化，不需要下载模型。
+    语义上没有意义，但相同文本得到相同向量、字面相近的文本向量也相近，
+    用于离线基准和没有模型环境时的端到端测试，encode 接口与 SentenceTransformer 一致"""
+
+    def __init__(self, dimension=384):
+        self.dimension = dimension
+
+    def get_sentence_embedding_dimension(self):
+        return self.dimension
+
+    def _encode_one(self, text):
+        vector = np.zeros(self.dimension, dtype=np.float32)
+        grams = [text[i:i + 2] for i in range(max(len(text) - 1, 1))]
+        for gram in grams:
+            h = zlib.crc32(gram.encode("utf-8"))
+            vector[h % self.dimension] += 1.0 if h & 0x80000000 else -1.0
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def encode(self, texts, batch_size=DEFAULT_BATCH_SIZE, convert_to_numpy=True, show_progress_bar=False, **kwargs):
+        if isinstance(texts, str):
+            return self._encode_one(texts)
+        if not texts:
+            return np.empty((0, self.dimension), dtype=np.float32)
+        return np.vstack([self._encode_one(text) for text in texts])
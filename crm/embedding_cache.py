@@ -0,0 +1,241 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+# 向量缓存：按 (模型名, 文本) 的哈希寻址
+# 第一级是内存中的 LRU，第二级是磁盘上的内存映射矩阵 + 偏移索引，
+# 命中时完全跳过 SentenceTransformer 的调用
+
+# 索引文件按向量精度区分，与 vectors.{精度} 矩阵一一对应，切换精度后不会读到没写过的行
+INDEX_FILE = "index.{dtype}.tsv"
+
+
+def cache_key(model_name, text):
+    """模型名和文本共同决定缓存键"""
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(model_name.encode("utf-8"))
+    digest.update(b"\0")
+    digest.update(text.encode("utf-8"))
+    return digest.hexdigest()
+
+
+class DiskVectorStore:
+    """磁盘层：定长向量写入内存映射矩阵，索引文件记录 键 -> 行号"""
+
+    def __init__(self, path, dim, dtype="float32", max_items=None):
+        os.makedirs(path, exist_ok=True)
+        self.dim = dim
+        self.dtype = np.dtype(dtype)
+        self.max_items = max_items
+        self.row_bytes = self.dim * self.dtype.itemsize
+        self.matrix_path = os.path.join(path, f"vectors.{self.dtype.name}")
+        self.index_path = os.path.join(path, INDEX_FILE.format(dtype=self.dtype.name))
+
+        self.key_to_row = {}
+        self.row_keys = []
+        self.evictions = 0
+        self.cursor = 0
+        self._load_index()
+        self.matrix = None
+        self.capacity = 0
+        self._map(max(len(self.row_keys), 1024))
+        self.index_file = open(self.index_path, "a", encoding="utf-8")
+
+    def _load_index(self):
+        if not os.path.exists(self.index_path):
+            return
+        lines = 0
+        malformed = 0
+        with open(self.index_path, encoding="utf-8", errors="replace") as f:
+            for line in f:
+                lines += 1
+                # 进程崩溃时最后一行可能只写了一半，格式不对或行号不连续的记录直接丢弃
+                parts = line.rstrip("\n").split("\t")
+                if not line.endswith("\n") or len(parts) != 2 or not parts[1].isdigit() \
+                        or int(parts[1]) > len(self.row_keys):
+                    malformed += 1
+                    continue
+                key, row = parts[0], int(parts[1])
+                # 后写入的记录覆盖先前占用同一行的键
+                if row < len(self.row_keys):
+                    self.key_to_row.pop(self.row_keys[row], None)
+                    self.row_keys[row] = key
+                else:
+                    self.row_keys.append(key)
+                self.key_to_row[key] = row
+                if self.max_items:
+                    self.cursor = (row + 1) % self.max_items
+        # 被覆盖的记录过多或有损坏的记录时重写索引文件，之后的追加从完整的行开始
+        if malformed or lines > 2 * len(self.row_keys):
+            with open(self.index_path, "w", encoding="utf-8") as f:
+                for row, key in enumerate(self.row_keys):
+                    f.write(f"{key}\t{row}\n")
+
+    def _map(self, capacity):
+        """确保矩阵文件至少能容纳 capacity 行，并重新映射"""
+        if self.matrix is not None:
+            self.matrix.flush()
+            self.matrix = None
+        size = os.path.getsize(self.matrix_path) if os.path.exists(self.matrix_path) else 0
+        needed = capacity * self.row_bytes
+        if size < needed:
+            with open(self.matrix_path, "ab") as f:
+                f.truncate(needed)
+            size = needed
+        self.capacity = size // self.row_bytes
+        self.matrix = np.memmap(self.matrix_path, dtype=self.dtype, mode="r+",
+                                shape=(self.capacity, self.dim))
+
+    def __len__(self):
+        return len(self.key_to_row)
+
+    @property
+    def nbytes(self):
+        return len(self.row_keys) * self.row_bytes
+
+    def get(self, key):
+        row = self.key_to_row.get(key)
+        if row is None:
+            return None
+        return np.array(self.matrix[row], dtype=np.float32)
+
+    def put(self, key, vector):
+        if key in self.key_to_row:
+            return
+        if self.max_items and len(self.row_keys) >= self.max_items:
+            # 达到上限后按写入顺序循环覆盖最旧的行
+            row = self.cursor
+            self.cursor = (row + 1) % self.max_items
+            self.key_to_row.pop(self.row_keys[row], None)
+            self.row_keys[row] = key
+            self.evictions += 1
+        else:
+            row = len(self.row_keys)
+            if row >= self.capacity:
+                self._map(self.capacity * 2)
+            self.row_keys.append(key)
+            if self.max_items:
+                self.cursor = (row + 1) % self.max_items
+        self.matrix[row] = vector
+        self.key_to_row[key] = row
+        self.index_file.write(f"{key}\t{row}\n")
+
+    def flush(self):
+        self.matrix.flush()
+        self.index_file.flush()
+
+    def close(self):
+        self.flush()
+        self.index_file.close()
+
+
+class EmbeddingCache:
+    """两级向量缓存：内存 LRU + 可选的磁盘层"""
+
+    def __init__(self, model_name, dim, cache_dir=None, memory_items=10000,
+                 dtype="float32", max_disk_items=None):
+        self.model_name = model_name
+        self.dim = dim
+        self.memory_items = memory_items
+        self.memory = OrderedDict()
+        self.disk = None
+        if cache_dir:
+            safe_name = model_name.replace("/", "__")
+            self.disk = DiskVectorStore(os.path.join(cache_dir, safe_name), dim, dtype, max_disk_items)
+        self.lock = threading.Lock()
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.memory_evictions = 0
+
+    def _remember(self, key, vector):
+        self.memory[key] = vector
+        self.memory.move_to_end(key)
+        if len(self.memory) > self.memory_items:
+            self.memory.popitem(last=False)
+            self.memory_evictions += 1
+
+    def _lookup(self, key):
+        vector = self.memory.get(key)
+        if vector is not None:
+            self.memory.move_to_end(key)
+            self.memory_hits += 1
+            return vector
+        if self.disk is not None:
+            vector = self.disk.get(key)
+            if vector is not None:
+                self.disk_hits += 1
+                self._remember(key, vector)
+                return vector
+        self.misses += 1
+        return None
+
+    def get(self, text):
+        with self.lock:
+            return self._lookup(cache_key(self.model_name, text))
+
+    def put(self, text, vector):
+        key = cache_key(self.model_name, text)
+        vector = np.asarray(vector, dtype=np.float32)
+        with self.lock:
+            self._remember(key, vector)
+            if self.disk is not None:
+                self.disk.put(key, vector)
+
+    def get_or_encode(self, texts, encode_fn):
+        """批量查缓存，只把未命中的文本交给 encode_fn 编码，返回 (N, dim) 矩阵"""
+        texts = list(texts)
+        result = np.empty((len(texts), self.dim), dtype=np.float32)
+        missing = {}
+        with self.lock:
+            for i, text in enumerate(texts):
+                key = cache_key(self.model_name, text)
+                vector = self._lookup(key)
+                if vector is None:
+                    missing.setdefault(text, []).append(i)
+                else:
+                    result[i] = vector
+
+        if missing:
+            miss_texts = list(missing)
+            vectors = encode_fn(miss_texts)
+            for text, vector in zip(miss_texts, vectors):
+                result[missing[text]] = vector
+                self.put(text, vector)
+        return result
+
+    def flush(self):
+        if self.disk is not None:
+            with self.lock:
+                self.disk.flush()
+
+    def close(self):
+        if self.disk is not None:
+            with self.lock:
+                self.disk.close()
+
+    def stats(self):
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            "lookups": lookups,
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+            "memory_size": len(self.memory),
+            "memory_evictions": self.memory_evictions,
+            "disk_size": len(self.disk) if self.disk is not None else 0,
+            "disk_bytes": self.disk.nbytes if self.disk is not None else 0,
+            "disk_evictions": self.disk.evictions if self.disk is not None else 0,
+        }
+
+    def report(self):
+        s = self.stats()
+        return (f"向量缓存: 命中率 {s['hit_rate']:.1%} "
+                f"(内存命中 {s['memory_hits']}, 磁盘命中 {s['disk_hits']}, 未命中 {s['misses']}), "
+                f"内存 {s['memory_size']} 条/淘汰 {s['memory_evictions']} 次, "
+                f"磁盘 {s['disk_size']} 条/{s['disk_bytes'] / 1024 / 1024:.1f} MB/淘汰 {s['disk_evictions']} 次")
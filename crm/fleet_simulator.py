@@ -0,0 +1,325 @@
+import argparse
+import asyncio
+import json
+import random
+import socket
+import time
+
+import paho.mqtt.client as mqtt
+
+from bench_utils import print_table
+from metrics import Histogram
+from mqtt_client import MQTT_KEEPALIVE, build_status
+from telemetry import TelemetryBatcher
+
+# 设备群模拟器 / MQTT 压测工具：在一个进程里用 asyncio 模拟成千上万个虚拟设备
+# 每个设备按 publish_sensor_data 的方式周期上报温湿度（文本或批量二进制），
+# 并订阅 home/devices/<设备>/command，收到命令后回复 home/devices/<设备>/status；
+# 控制端按设定速率下发命令，统计遥测发布吞吐和 命令 -> 状态 的往返延迟分位数
+#
+# 所有 paho 客户端都由同一个事件循环驱动（不调用 loop_start，没有每连接一个的网络线程），
+# 设备按 --connections 分摊到若干条连接上，连接数可以与设备数相同以模拟真实的连接规模
+#
+#   python fleet_simulator.py --devices 10000 --connections 500 --command-rate 200 --duration 60
+
+
+class AsyncioHelper:
+    """把 paho 客户端的套接字读写交给 asyncio 事件循环"""
+
+    def __init__(self, loop, client):
+        self.loop = loop
+        self.client = client
+        self.misc = None
+        client.on_socket_open = self.on_socket_open
+        client.on_socket_close = self.on_socket_close
+        client.on_socket_register_write = self.on_socket_register_write
+        client.on_socket_unregister_write = self.on_socket_unregister_write
+
+    def on_socket_open(self, client, userdata, sock):
+        self.loop.add_reader(sock, client.loop_read)
+        self.misc = self.loop.create_task(self.misc_loop())
+
+    def on_socket_close(self, client, userdata, sock):
+        self.loop.remove_reader(sock)
+        if self.misc is not None:
+            self.misc.cancel()
+
+    def on_socket_register_write(self, client, userdata, sock):
+        self.loop.add_writer(sock, client.loop_write)
+
+    def on_socket_unregister_write(self, client, userdata, sock):
+        self.loop.remove_writer(sock)
+
+    async def misc_loop(self):
+        # 心跳和重发超时由 loop_misc 处理
+        while self.client.loop_misc() == mqtt.MQTT_ERR_SUCCESS:
+            await asyncio.sleep(1)
+
+
+class FleetConnection:
+    """一条 MQTT 连接，消息按主题分发给注册的处理函数"""
+
+    def __init__(self, loop, client_id):
+        self.loop = loop
+        self.client = mqtt.Client(client_id=client_id)
+        self.helper = AsyncioHelper(loop, self.client)
+        self.handlers = {}
+        self.default_handler = None
+        self._connected = loop.create_future()
+        self._subscribed = {}
+        self.client.on_connect = self._on_connect
+        self.client.on_subscribe = self._on_subscribe
+        self.client.on_message = self._on_message
+
+    def _on_connect(self, client, userdata, flags, rc):
+        if self._connected.done():
+            return
+        if rc == 0:
+            self._connected.set_result(True)
+        else:
+            self._connected.set_exception(ConnectionError(f"MQTT 连接失败，返回码: {rc}"))
+
+    def _on_subscribe(self, client, userdata, mid, granted_qos):
+        future = self._subscribed.pop(mid, None)
+        if future is not None and not future.done():
+            future.set_result(granted_qos)
+
+    def _on_message(self, client, userdata, msg):
+        handler = self.handlers.get(msg.topic, self.default_handler)
+        if handler is not None:
+            handler(msg.topic, msg.payload)
+
+    async def connect(self, host, port, timeout=10.0):
+        self.client.connect(host, port, MQTT_KEEPALIVE)
+        await asyncio.wait_for(self._connected, timeout)
+
+    async def subscribe(self, topics, chunk_size=100):
+        """批量订阅并等待代理确认，topics 为主题列表"""
+        futures = []
+        for start in range(0, len(topics), chunk_size):
+            rc, mid = self.client.subscribe([(topic, 0) for topic in topics[start:start + chunk_size]])
+            if rc != mqtt.MQTT_ERR_SUCCESS:
+                raise ConnectionError(f"订阅失败，返回码: {rc}")
+            futures.append(self._subscribed.setdefault(mid, self.loop.create_future()))
+        await asyncio.gather(*futures)
+
+    def publish(self, topic, payload, qos=0):
+        return self.client.publish(topic, payload, qos=qos)
+
+    def disconnect(self):
+        self.client.disconnect()
+
+
+class FleetStats:
+    def __init__(self):
+        self.telemetry_messages = 0
+        self.readings = 0
+        self.commands_sent = 0
+        self.statuses = 0
+        self.handled_commands = 0
+        self.round_trip = Histogram("command_round_trip")
+
+    def as_dict(self, elapsed):
+        rtt = self.round_trip
+        return {
+            "elapsed_seconds": elapsed,
+            "telemetry_messages": self.telemetry_messages,
+            "telemetry_messages_per_sec": self.telemetry_messages / elapsed,
+            "readings_per_sec": self.readings / elapsed,
+            "commands_sent": self.commands_sent,
+            "commands_handled": self.handled_commands,
+            "statuses_received": self.statuses,
+            "commands_lost": self.commands_sent - self.statuses,
+            "rtt_p50_ms": rtt.quantile(0.5) / 1e6,
+            "rtt_p90_ms": rtt.quantile(0.9) / 1e6,
+            "rtt_p99_ms": rtt.quantile(0.99) / 1e6,
+            "rtt_max_ms": rtt.max / 1e6,
+        }
+
+
+class VirtualDevice:
+    """虚拟设备：周期上报温湿度，收到命令后回复状态"""
+
+    def __init__(self, device_id, connection, stats, telemetry_format="batch", batch_readings=12):
+        self.device_id = device_id
+        self.connection = connection
+        self.stats = stats
+        self.status = "off"
+        self.telemetry_format = telemetry_format
+        self.batcher = None
+        if telemetry_format == "batch":
+            self.batcher = TelemetryBatcher(connection, f"home/{device_id}/telemetry", max_readings=batch_readings)
+        connection.handlers[self.command_topic] = self.handle_command
+
+    @property
+    def command_topic(self):
+        return f"home/devices/{self.device_id}/command"
+
+    def handle_command(self, topic, payload):
+        try:
+            command = json.loads(payload)
+        except json.JSONDecodeError:
+            return
+        if "action" not in command:
+            return
+        self.status = command["action"]
+        self.stats.handled_commands += 1
+        self.connection.publish(f"home/devices/{self.device_id}/status", json.dumps(build_status(command)))
+
+    def publish_reading(self, rng):
+        temperature = round(rng.uniform(20, 30), 1)
+        humidity = round(rng.uniform(40, 70), 1)
+        self.stats.readings += 2
+        if self.batcher is not None:
+            batches = self.batcher.batches
+            self.batcher.add("temperature", temperature)
+            self.batcher.add("humidity", humidity)
+            self.stats.telemetry_messages += self.batcher.batches - batches
+        else:
+            self.connection.publish(f"home/{self.device_id}/temperature", str(temperature))
+            self.connection.publish(f"home/{self.device_id}/humidity", str(humidity))
+            self.stats.telemetry_messages += 2
+
+    async def run(self, period, stop, rng):
+        # 随机错开首次上报，避免所有设备在同一时刻发布
+        await asyncio.sleep(rng.random() * period)
+        while not stop.is_set():
+            self.publish_reading(rng)
+            await asyncio.sleep(period)
+
+
+class CommandController:
+    """按固定速率向随机设备下发命令，并按 command_id 匹配状态回复计算往返延迟"""
+
+    def __init__(self, connection, device_ids, stats, rate):
+        self.connection = connection
+        self.device_ids = device_ids
+        self.stats = stats
+        self.rate = rate
+        self.pending = {}
+        connection.default_handler = self.handle_status
+
+    def handle_status(self, topic, payload):
+        try:
+            command_id = json.loads(payload).get("command_id")
+        except (json.JSONDecodeError, AttributeError):
+            return
+        sent = self.pending.pop(command_id, None)
+        if sent is not None:
+            self.stats.round_trip.record(time.perf_counter_ns() - sent)
+            self.stats.statuses += 1
+
+    async def run(self, stop, rng):
+        if not self.rate:
+            return
+        start = time.perf_counter()
+        while not stop.is_set():
+            # 按已经过的时间补发应发的命令，速率不受 sleep 精度影响
+            due = int((time.perf_counter() - start) * self.rate)
+            while self.stats.commands_sent < due:
+                command_id = self.stats.commands_sent
+                device_id = rng.choice(self.device_ids)
+                self.pending[command_id] = time.perf_counter_ns()
+                self.connection.publish(
+                    f"home/devices/{device_id}/command",
+                    json.dumps({"action": rng.choice(["on", "off"]), "command_id": command_id})
+                )
+                self.stats.commands_sent += 1
+            await asyncio.sleep(min(1 / self.rate, 0.01))
+
+
+def broker_reachable(host, port, timeout=1.0):
+    try:
+        with socket.create_connection((host, port), timeout=timeout):
+            return True
+    except OSError:
+        return False
+
+
+async def simulate(host="localhost", port=1883, num_devices=1000, num_connections=100, publish_period=5.0,
+                   command_rate=100.0, duration=30.0, telemetry_format="batch", batch_readings=12, drain=2.0,
+                   seed=0):
+    """运行一次模拟，返回统计字典"""
+    loop = asyncio.get_running_loop()
+    rng = random.Random(seed)
+    stats = FleetStats()
+    num_connections = max(1, min(num_connections, num_devices))
+    prefix = f"sim{random.randrange(16 ** 6):06x}"
+
+    connections = [FleetConnection(loop, f"{prefix}-conn{i}") for i in range(num_connections)]
+    controller_connection = FleetConnection(loop, f"{prefix}-controller")
+    for connection in connections + [controller_connection]:
+        await connection.connect(host, port)
+
+    devices = [
+        VirtualDevice(f"{prefix}-dev{i:05d}", connections[i % num_connections], stats, telemetry_format,
+                      batch_readings)
+        for i in range(num_devices)
+    ]
+    await asyncio.gather(*(
+        connection.subscribe(list(connection.handlers))
+        for connection in connections
+    ))
+    controller = CommandController(controller_connection, [d.device_id for d in devices], stats, command_rate)
+    await controller_connection.subscribe(["home/devices/+/status"])
+    print(f"已连接 {num_connections} 条连接，{num_devices} 个设备完成订阅")
+
+    stop = asyncio.Event()
+    start = time.perf_counter()
+    tasks = [loop.create_task(device.run(publish_period, stop, random.Random(rng.random()))) for device in devices]
+    tasks.append(loop.create_task(controller.run(stop, random.Random(rng.random()))))
+    await asyncio.sleep(duration)
+    stop.set()
+    elapsed = time.perf_counter() - start
+    # 等待在途命令的状态回复
+    deadline = time.perf_counter() + drain
+    while controller.pending and time.perf_counter() < deadline:
+        await asyncio.sleep(0.05)
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+    for device in devices:
+        if device.batcher is not None and device.batcher.flush():
+            stats.telemetry_messages += 1
+    await asyncio.sleep(0.1)
+    for connection in connections + [controller_connection]:
+        connection.disconnect()
+    return stats.as_dict(elapsed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="asyncio 设备群模拟器")
+    parser.add_argument("--broker", default="localhost", help="MQTT 代理地址，格式 host 或 host:port")
+    parser.add_argument("--devices", type=int, default=1000)
+    parser.add_argument("--connections", type=int, default=100, help="设备分摊到的 MQTT 连接数")
+    parser.add_argument("--publish-period", type=float, default=5.0, help="每个设备的上报周期（秒）")
+    parser.add_argument("--command-rate", type=float, default=100.0, help="每秒下发的命令数")
+    parser.add_argument("--duration", type=float, default=30.0)
+    parser.add_argument("--telemetry-format", choices=["batch", "text"], default="batch")
+    parser.add_argument("--batch-readings", type=int, default=12, help="批量格式下每批读数条数")
+    parser.add_argument("--output", help="结果 JSON 文件")
+    args = parser.parse_args()
+
+    host, _, port = args.broker.partition(":")
+    port = int(port or 1883)
+    if not broker_reachable(host, port):
+        print(f"MQTT 代理 {host}:{port} 不可用，请先启动本地代理（如 mosquitto）")
+        raise SystemExit(1)
+
+    result = asyncio.run(simulate(
+        host, port, args.devices, args.connections, args.publish_period, args.command_rate, args.duration,
+        args.telemetry_format, args.batch_readings
+    ))
+    rows = [[name, f"{value:.2f}" if isinstance(value, float) else value] for name, value in result.items()]
+    print(f"设备: {args.devices}, 连接: {args.connections}, 上报周期: {args.publish_period}秒, "
+          f"命令速率: {args.command_rate}/秒, 遥测格式: {args.telemetry_format}")
+    print_table(rows, ["指标", "数值"])
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+        print(f"结果已写入 {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+import hashlib
+
+from embedding import build_entities, iter_batches
+
+# 增量同步：主键由文档块内容哈希得到，
+# 与集合中已有的主键做差集，只写入新增的块、删除消失的块
+
+
+def chunk_id(text):
+    """由文本内容计算稳定的 INT64 主键（保证为正数）"""
+    digest = hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big") & 0x7FFFFFFFFFFFFFFF
+
+
+def chunk_ids(chunks):
+    return [chunk_id(chunk) for chunk in chunks]
+
+
+def unique_chunks(chunks):
+    """按内容哈希去掉重复的块，返回 (主键列表, 文本列表)，保留首次出现的顺序"""
+    unique = {}
+    for chunk in chunks:
+        unique.setdefault(chunk_id(chunk), chunk)
+    return list(unique), list(unique.values())
+
+
+def fetch_existing_ids(client, collection_name, batch_size=1000):
+    """分页读取集合中已有的全部主键"""
+    ids = set()
+    iterator = client.query_iterator(
+        collection_name=collection_name,
+        batch_size=batch_size,
+        filter="",
+        output_fields=["id"]
+    )
+    try:
+        while True:
+            rows = iterator.next()
+            if not rows:
+                break
+            ids.update(row["id"] for row in rows)
+    finally:
+        iterator.close()
+    return ids
+
+
+def diff_chunks(chunks, existing_ids):
+    """计算差异，返回 (新增的 {id: 文本}, 需删除的 id 集合, 未变化的数量)"""
+    wanted = {}
+    for chunk in chunks:
+        wanted.setdefault(chunk_id(chunk), chunk)
+
+    added = {id_: text for id_, text in wanted.items() if id_ not in existing_ids}
+    removed = existing_ids - wanted.keys()
+    unchanged = len(wanted) - len(added)
+    return added, removed, unchanged
+
+
+def sync_collection(client, collection_name, chunks, embed_fn, batch_size=1000):
+    """增量同步文档块到集合
+
+    embed_fn 接收文本列表并返回向量矩阵；内容相同的块不会重新向量化。
+    内容发生变化的块会得到新的主键，旧主键随之被删除。
+    """
+    existing_ids = fetch_existing_ids(client, collection_name, batch_size)
+    added, removed, unchanged = diff_chunks(chunks, existing_ids)
+
+    items = list(added.items())
+    for batch in iter_batches(items, batch_size):
+        ids = [id_ for id_, _ in batch]
+        texts = [text for _, text in batch]
+        vectors = embed_fn(texts)
+        client.upsert(
+            collection_name=collection_name,
+            data=build_entities(ids, texts, vectors)
+        )
+
+    removed = list(removed)
+    for batch in iter_batches(removed, batch_size):
+        client.delete(collection_name=collection_name, ids=batch)
+
+    return {"added": len(items), "removed": len(removed), "unchanged": unchanged}
@@ -0,0 +1,36 @@
+import json
+
+# 索引配置：默认值和 index_tuning.py --auto-tune --save 保存的配置文件
+# 只依赖标准库，演示脚本读取配置时不需要导入基准工具
+
+DEFAULT_METRIC_TYPE = "COSINE"
+
+DEFAULT_INDEX_CONFIG = {
+    "index_type": "IVF_FLAT",
+    "params": {"nlist": 128},
+    "search_params": {},
+    "metric_type": DEFAULT_METRIC_TYPE,
+}
+
+
+def load_index_config(path, default=None, metric_type=None, dim=None):
+    """读取自动调优保存的索引配置，文件不存在时返回默认配置；
+    指定 metric_type / dim 时，调优所用的度量或向量维度与之不一致的配置不会被采用"""
+    default = dict(default or DEFAULT_INDEX_CONFIG)
+    if not path:
+        return default
+    try:
+        with open(path, encoding="utf-8") as f:
+            config = json.load(f)
+    except FileNotFoundError:
+        return default
+    tuned_metric = config.get("metric_type")
+    if metric_type and tuned_metric and tuned_metric != metric_type:
+        print(f"索引配置 {path} 按 {tuned_metric} 度量调优，与集合的 {metric_type} 不一致，使用默认配置")
+        return default
+    tuned_dim = config.get("dim")
+    if dim and tuned_dim and tuned_dim != dim:
+        print(f"索引配置 {path} 按 {tuned_dim} 维数据调优，与集合的 {dim} 维不一致，使用默认配置")
+        return default
+    default.update({k: config[k] for k in ("index_type", "params", "search_params", "metric_type") if k in config})
+    return default
@@ -0,0 +1,222 @@
+import argparse
+import json
+import time
+
+import numpy as np
+
+from bench_utils import print_table
+from c import generate_vectors
+from index_config import DEFAULT_METRIC_TYPE
+from resources import EMBEDDING_DIM
+from vector_backend import create_client
+
+# 索引调优与召回/延迟基准
+# 基于 c.py 的随机数据生成器，遍历索引类型及其构建/搜索参数，
+# 测量构建耗时、索引内存、相对精确检索的 recall@k 和 QPS，
+# 自动调优模式在满足目标召回率的配置中选出 QPS 最高的一个；
+# 指定 QPS 下限时改为在同时满足召回率和 QPS 的配置中选内存最省的。
+# 只按内存选时 FLAT 的估算永远不高于 IVF_FLAT 且召回率恒为 1，任何规模都会推荐暴力检索
+# 默认维度与部署的向量模型一致（resources.EMBEDDING_DIM），保存的配置才适用于实际集合
+
+COLLECTION_NAME = "index_tuning_bench"
+
+# 索引类型 -> (构建参数列表, 搜索参数列表)
+INDEX_GRID = {
+    "FLAT": ([{}], [{}]),
+    "IVF_FLAT": ([{"nlist": 64}, {"nlist": 256}, {"nlist": 1024}],
+                 [{"nprobe": 1}, {"nprobe": 8}, {"nprobe": 32}, {"nprobe": 128}]),
+    "IVF_SQ8": ([{"nlist": 64}, {"nlist": 256}, {"nlist": 1024}],
+                [{"nprobe": 1}, {"nprobe": 8}, {"nprobe": 32}, {"nprobe": 128}]),
+    "IVF_PQ": ([{"nlist": 256, "m": 16, "nbits": 8}, {"nlist": 256, "m": 32, "nbits": 8}],
+               [{"nprobe": 8}, {"nprobe": 32}, {"nprobe": 128}]),
+    "HNSW": ([{"M": 8, "efConstruction": 200}, {"M": 16, "efConstruction": 200}, {"M": 32, "efConstruction": 200}],
+             [{"ef": 16}, {"ef": 64}, {"ef": 256}]),
+}
+
+def estimate_index_bytes(index_type, num_rows, dim, params):
+    """估算索引占用的内存（字节），Milvus 不直接暴露单个索引的内存"""
+    raw = num_rows * dim * 4
+    if index_type in ("FLAT", "IVF_FLAT"):
+        centroids = params.get("nlist", 0) * dim * 4
+        return raw + centroids + num_rows * 8
+    if index_type == "IVF_SQ8":
+        return num_rows * dim + params["nlist"] * dim * 4 + num_rows * 8
+    if index_type == "IVF_PQ":
+        codes = num_rows * params["m"] * params["nbits"] // 8
+        codebooks = params["m"] * (2 ** params["nbits"]) * (dim // params["m"]) * 4
+        return codes + codebooks + params["nlist"] * dim * 4 + num_rows * 8
+    if index_type == "HNSW":
+        # 原始向量 + 每层平均 2*M 条邻接边
+        return raw + num_rows * params["M"] * 2 * 4
+    return raw
+
+
+def exact_top_k(vectors, queries, k, metric_type):
+    """NumPy 精确检索，作为计算召回率的基准"""
+    if metric_type == "L2":
+        scores = -(np.einsum("ij,ij->i", queries, queries)[:, None]
+                   - 2 * queries @ vectors.T
+                   + np.einsum("ij,ij->i", vectors, vectors)[None, :])
+    elif metric_type == "COSINE":
+        q = queries / np.linalg.norm(queries, axis=1, keepdims=True)
+        v = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+        scores = q @ v.T
+    else:
+        scores = queries @ vectors.T
+    top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    return [set(row.tolist()) for row in top]
+
+
+def recall_at_k(results, truth):
+    hits = sum(len({hit["id"] for hit in hits} & expected) for hits, expected in zip(results, truth))
+    return hits / sum(len(expected) for expected in truth)
+
+
+def create_bench_collection(client, dim, vectors, batch_size=10000):
+    """显式定义 schema 创建集合，避免快速建表时自动生成索引"""
+    from pymilvus import DataType
+
+    if client.has_collection(COLLECTION_NAME):
+        client.drop_collection(COLLECTION_NAME)
+    schema = client.create_schema(auto_id=False)
+    schema.add_field("id", DataType.INT64, is_primary=True)
+    schema.add_field("embedding", DataType.FLOAT_VECTOR, dim=dim)
+    client.create_collection(collection_name=COLLECTION_NAME, schema=schema)
+    for start in range(0, len(vectors), batch_size):
+        rows = vectors[start:start + batch_size].tolist()
+        client.insert(
+            collection_name=COLLECTION_NAME,
+            data=[{"id": start + i, "embedding": row} for i, row in enumerate(rows)]
+        )
+    client.flush(COLLECTION_NAME)
+
+
+def build_index(client, index_type, params, metric_type):
+    """构建索引并加载集合，返回耗时（秒）"""
+    client.release_collection(COLLECTION_NAME)
+    for name in client.list_indexes(COLLECTION_NAME):
+        client.drop_index(COLLECTION_NAME, name)
+
+    index_params = client.prepare_index_params()
+    index_params.add_index(
+        field_name="embedding",
+        index_type=index_type,
+        metric_type=metric_type,
+        params=params
+    )
+    start = time.perf_counter()
+    client.create_index(COLLECTION_NAME, index_params)
+    client.load_collection(COLLECTION_NAME)
+    return time.perf_counter() - start
+
+
+def run_queries(client, queries, k, metric_type, search_params, batch_size=100):
+    results = []
+    start = time.perf_counter()
+    for offset in range(0, len(queries), batch_size):
+        results.extend(client.search(
+            collection_name=COLLECTION_NAME,
+            data=queries[offset:offset + batch_size].tolist(),
+            limit=k,
+            search_params={"metric_type": metric_type, "params": search_params}
+        ))
+    return results, time.perf_counter() - start
+
+
+def sweep(client, num_rows, dim=EMBEDDING_DIM, num_queries=200, k=10, metric_type="L2",
+          index_types=None, seed=0):
+    """遍历索引配置，返回每个 (索引, 构建参数, 搜索参数) 组合的测量结果"""
+    vectors = generate_vectors(num_rows, dim, seed)
+    queries = generate_vectors(num_queries, dim, seed + 1)
+    truth = exact_top_k(vectors, queries, k, metric_type)
+    create_bench_collection(client, dim, vectors)
+
+    results = []
+    for index_type in index_types or INDEX_GRID:
+        build_grid, search_grid = INDEX_GRID[index_type]
+        for params in build_grid:
+            # nlist 超过数据量时没有意义
+            if params.get("nlist", 0) > num_rows or dim % params.get("m", 1):
+                continue
+            build_seconds = build_index(client, index_type, params, metric_type)
+            for search_params in search_grid:
+                if search_params.get("nprobe", 0) > params.get("nlist", 1 << 30):
+                    continue
+                hits, elapsed = run_queries(client, queries, k, metric_type, search_params)
+                results.append({
+                    "index_type": index_type,
+                    "params": params,
+                    "search_params": search_params,
+                    "build_seconds": round(build_seconds, 3),
+                    "memory_bytes": estimate_index_bytes(index_type, num_rows, dim, params),
+                    "recall": round(recall_at_k(hits, truth), 4),
+                    "qps": round(num_queries / elapsed, 1),
+                })
+    client.drop_collection(COLLECTION_NAME)
+    return results
+
+
+def pick_best(results, target_recall, min_qps=None):
+    """在满足目标召回率的配置中选 QPS 最高的；指定 min_qps 时在同时达到该 QPS 的配置中选内存最省的"""
+    candidates = [r for r in results if r["recall"] >= target_recall]
+    if min_qps is None:
+        return max(candidates, key=lambda r: (r["qps"], -r["memory_bytes"]), default=None)
+    candidates = [r for r in candidates if r["qps"] >= min_qps]
+    return min(candidates, key=lambda r: (r["memory_bytes"], -r["qps"]), default=None)
+
+
+def print_results(results):
+    rows = [
+        [r["index_type"], json.dumps(r["params"]), json.dumps(r["search_params"]),
+         f"{r['build_seconds']:.2f}", f"{r['memory_bytes'] / 1024 / 1024:.1f}",
+         f"{r['recall']:.3f}", f"{r['qps']:.0f}"]
+        for r in results
+    ]
+    print_table(rows, ["索引", "构建参数", "搜索参数", "构建(秒)", "内存(MB,估算)", "召回率", "QPS"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="索引调优与召回/延迟基准")
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--dim", type=int, default=EMBEDDING_DIM, help="默认与部署的向量模型维度一致")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--metric", default=DEFAULT_METRIC_TYPE, choices=["L2", "COSINE", "IP"],
+                        help="与使用该配置的集合保持一致，演示脚本的集合使用 COSINE")
+    parser.add_argument("--index-types", nargs="+", choices=list(INDEX_GRID))
+    parser.add_argument("--auto-tune", action="store_true", help="选出满足目标召回率的配置")
+    parser.add_argument("--target-recall", type=float, default=0.95)
+    parser.add_argument("--min-qps", type=float, help="QPS 下限；指定时在满足召回率和 QPS 的配置中选内存最省的，"
+                                                      "否则选满足召回率且 QPS 最高的")
+    parser.add_argument("--save", help="把自动调优结果保存为 JSON，供 INDEX_CONFIG 使用")
+    parser.add_argument("--output", help="把全部测量结果写入 JSON 文件")
+    args = parser.parse_args()
+
+    client = create_client("milvus")
+    results = sweep(client, args.rows, args.dim, args.queries, args.k, args.metric, args.index_types)
+    print(f"数据量: {args.rows}, 维度: {args.dim}, 度量: {args.metric}, recall@{args.k}")
+    print_results(results)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+    if args.auto_tune:
+        best = pick_best(results, args.target_recall, args.min_qps)
+        budget = f"目标召回率 {args.target_recall}" + (f", QPS 下限 {args.min_qps:.0f}" if args.min_qps else "")
+        if best is None:
+            print(f"\n没有配置满足 {budget}")
+            return
+        print(f"\n推荐配置 ({budget}): {best['index_type']} "
+              f"构建参数 {best['params']} 搜索参数 {best['search_params']} "
+              f"召回率 {best['recall']:.3f}, QPS {best['qps']:.0f}")
+        if args.save:
+            with open(args.save, "w", encoding="utf-8") as f:
+                json.dump({**best, "metric_type": args.metric, "dim": args.dim, "num_rows": args.rows,
+                           "target_recall": args.target_recall, "min_qps": args.min_qps},
+                          f, ensure_ascii=False, indent=2)
+            print(f"已保存到 {args.save}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,257 @@
+import os
+import queue
+import threading
+import time
+
+import numpy as np
+
+from embedding import DEFAULT_BATCH_SIZE, build_entities
+from incremental_sync import chunk_ids
+import metrics
+
+# 流式导入流水线：读取/分段 -> 批量向量化 -> 分批写入
+# 三个阶段各自运行在独立线程中，通过有界队列衔接，
+# 内存占用只取决于队列长度和批大小，与语料总量无关
+
+DEFAULT_SUFFIXES = (".txt", ".md")
+# 没有空行的超长文本按该长度强制切分，避免单个段落撑大内存
+MAX_CHUNK_CHARS = 2000
+
+_DONE = object()
+
+
+def iter_files(path, suffixes=DEFAULT_SUFFIXES):
+    """遍历文件或目录树，按路径顺序产出文本文件"""
+    if os.path.isfile(path):
+        yield path
+        return
+    for root, dirs, files in os.walk(path):
+        dirs.sort()
+        for name in sorted(files):
+            if name.lower().endswith(suffixes):
+                yield os.path.join(root, name)
+
+
+def _join_lines(lines):
+    return "".join(lines).strip()
+
+
+def iter_file_chunks(path, max_chars=MAX_CHUNK_CHARS, encoding="utf-8"):
+    """逐行读取文件，按空行分段，与 process_documents 的分段规则一致；
+    每次最多读取 max_chars 个字符，没有换行的超长行也会被切开，每个块不超过 max_chars"""
+    lines = []
+    size = 0
+    with open(path, encoding=encoding, errors="replace") as f:
+        for line in iter(lambda: f.readline(max_chars), ""):
+            if not line.strip() or size + len(line) > max_chars:
+                chunk = _join_lines(lines)
+                if chunk:
+                    yield chunk
+                lines = []
+                size = 0
+                if not line.strip():
+                    continue
+            lines.append(line)
+            size += len(line)
+    chunk = _join_lines(lines)
+    if chunk:
+        yield chunk
+
+
+def iter_chunks(path, suffixes=DEFAULT_SUFFIXES, max_chars=MAX_CHUNK_CHARS):
+    """惰性产出路径下所有文件的文档块"""
+    for file_path in iter_files(path, suffixes):
+        yield from iter_file_chunks(file_path, max_chars)
+
+
+class StageStats:
+    """单个阶段的计数器：处理条数、批次数和忙碌时间"""
+
+    def __init__(self, name):
+        self.name = name
+        self.items = 0
+        self.batches = 0
+        self.busy_seconds = 0.0
+
+    def record(self, items, seconds):
+        self.items += items
+        self.batches += 1
+        self.busy_seconds += seconds
+        metrics.observe(f"ingest.{self.name}", seconds)
+
+    @property
+    def throughput(self):
+        return self.items / self.busy_seconds if self.busy_seconds else 0.0
+
+    def as_dict(self):
+        return {
+            "stage": self.name,
+            "items": self.items,
+            "batches": self.batches,
+            "busy_seconds": round(self.busy_seconds, 3),
+            "items_per_sec": round(self.throughput, 1),
+        }
+
+
+class IngestPipeline:
+    """有界队列连接的三段式导入流水线"""
+
+    def __init__(self, client, collection_name, embed_fn,
+                 embed_batch_size=DEFAULT_BATCH_SIZE, insert_batch_size=512,
+                 queue_size=4, progress_every=1000, on_progress=None, on_insert=None):
+        self.client = client
+        self.collection_name = collection_name
+        self.embed_fn = embed_fn
+        self.embed_batch_size = embed_batch_size
+        self.insert_batch_size = insert_batch_size
+        self.progress_every = progress_every
+        self.on_progress = on_progress or self._print_progress
+        # 每批写入成功后回调 on_insert(ids, texts)，用于同步更新其他索引
+        self.on_insert = on_insert
+
+        self.chunk_queue = queue.Queue(maxsize=queue_size)
+        self.vector_queue = queue.Queue(maxsize=queue_size)
+        self.stop = threading.Event()
+        self.errors = []
+
+        self.read_stats = StageStats("read")
+        self.embed_stats = StageStats("embed")
+        self.insert_stats = StageStats("insert")
+        self.started = None
+
+    def _put(self, q, item):
+        # 下游出错时不再阻塞等待
+        while not self.stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _get(self, q):
+        while True:
+            try:
+                return q.get(timeout=0.1)
+            except queue.Empty:
+                if self.stop.is_set():
+                    return _DONE
+
+    def _run_stage(self, target, *args):
+        try:
+            target(*args)
+        except Exception as e:
+            self.errors.append(e)
+            self.stop.set()
+
+    def _read(self, chunks):
+        batch = []
+        start = time.perf_counter()
+        try:
+            for chunk in chunks:
+                batch.append(chunk)
+                if len(batch) >= self.embed_batch_size:
+                    self.read_stats.record(len(batch), time.perf_counter() - start)
+                    if not self._put(self.chunk_queue, batch):
+                        return
+                    batch = []
+                    start = time.perf_counter()
+            if batch:
+                self.read_stats.record(len(batch), time.perf_counter() - start)
+                self._put(self.chunk_queue, batch)
+        finally:
+            self._put(self.chunk_queue, _DONE)
+
+    def _embed(self):
+        try:
+            while True:
+                texts = self._get(self.chunk_queue)
+                if texts is _DONE:
+                    return
+                start = time.perf_counter()
+                vectors = self.embed_fn(texts)
+                self.embed_stats.record(len(texts), time.perf_counter() - start)
+                if not self._put(self.vector_queue, (texts, vectors)):
+                    return
+        finally:
+            self._put(self.vector_queue, _DONE)
+
+    def _insert(self):
+        pending_texts = []
+        pending_vectors = []
+        last_report = 0
+        while True:
+            item = self._get(self.vector_queue)
+            if item is not _DONE:
+                texts, vectors = item
+                pending_texts.extend(texts)
+                pending_vectors.extend(vectors)
+            done = item is _DONE
+            while pending_texts and (done or len(pending_texts) >= self.insert_batch_size):
+                texts = pending_texts[:self.insert_batch_size]
+                vectors = pending_vectors[:self.insert_batch_size]
+                del pending_texts[:self.insert_batch_size]
+                del pending_vectors[:self.insert_batch_size]
+
+                start = time.perf_counter()
+                # 内容哈希主键 + upsert，重复导入同一语料不会产生重复数据；
+                # 同一批中重复的段落主键相同，upsert 不接受批内重复主键，只保留首次出现的
+                first = {}
+                for i, id_ in enumerate(chunk_ids(texts)):
+                    first.setdefault(id_, i)
+                ids = list(first)
+                texts = [texts[i] for i in first.values()]
+                vectors = np.asarray(vectors)[list(first.values())]
+                self.client.upsert(
+                    collection_name=self.collection_name,
+                    data=build_entities(ids, texts, vectors)
+                )
+                self.insert_stats.record(len(texts), time.perf_counter() - start)
+                if self.on_insert is not None:
+                    self.on_insert(ids, texts)
+                if self.insert_stats.items - last_report >= self.progress_every:
+                    last_report = self.insert_stats.items
+                    self.on_progress(self)
+            if done:
+                return
+
+    def _print_progress(self, pipeline):
+        elapsed = time.perf_counter() - self.started
+        print(f"已导入 {self.insert_stats.items} 个文档块 "
+              f"({self.insert_stats.items / elapsed:.1f} 块/秒, "
+              f"队列: 待向量化 {self.chunk_queue.qsize()} 批, 待写入 {self.vector_queue.qsize()} 批)")
+
+    def run(self, chunks):
+        """运行流水线直到输入耗尽，返回各阶段统计"""
+        self.started = time.perf_counter()
+        threads = [
+            threading.Thread(target=self._run_stage, args=(self._read, chunks), name="ingest-read"),
+            threading.Thread(target=self._run_stage, args=(self._embed,), name="ingest-embed"),
+            threading.Thread(target=self._run_stage, args=(self._insert,), name="ingest-insert"),
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        if self.errors:
+            raise self.errors[0]
+        return self.stats()
+
+    def stats(self):
+        elapsed = time.perf_counter() - self.started if self.started else 0.0
+        return {
+            "elapsed_seconds": round(elapsed, 3),
+            "chunks": self.insert_stats.items,
+            "chunks_per_sec": round(self.insert_stats.items / elapsed, 1) if elapsed else 0.0,
+            "stages": [s.as_dict() for s in (self.read_stats, self.embed_stats, self.insert_stats)],
+        }
+
+
+def ingest_path(path, client, collection_name, embed_fn, suffixes=DEFAULT_SUFFIXES,
+                chunk_filter=None, **kwargs):
+    """从文件或目录流式导入文档，chunk_filter 可在向量化前过滤文档块（如去重）"""
+    pipeline = IngestPipeline(client, collection_name, embed_fn, **kwargs)
+    chunks = iter_chunks(path, suffixes)
+    if chunk_filter is not None:
+        chunks = chunk_filter(chunks)
+    return pipeline.run(chunks)
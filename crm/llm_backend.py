@@ -0,0 +1,190 @@
+import json
+import os
+import re
+import time
+
+import metrics
+
+# 可插拔的流式生成后端
+# 所有后端都实现 stream(prompt, query, docs, max_tokens) -> 逐个产出 token 文本的迭代器，
+# query 和 docs 只供模拟后端使用，真实后端只看 prompt：
+#   simulated  进程内模拟，按设定的首 token 延迟和 token 间隔输出（默认，间隔为 0 时不等待）
+#   http       OpenAI 兼容的 /v1/chat/completions 流式接口（SSE），可指向 llm_stub_server.py
+# StreamStats 记录首 token 延迟（TTFT）和生成速度（tokens/秒）
+# 两种后端的迭代都是阻塞的（time.sleep / requests 流式读取），在事件循环中使用时要放到线程里，
+# rag_server.AsyncRAGServer 通过 asyncio.to_thread 调用 generate_answer
+
+LLM_BACKEND = os.environ.get("LLM_BACKEND", "simulated")
+LLM_URL = os.environ.get("LLM_URL", "http://127.0.0.1:8900/v1/chat/completions")
+LLM_MODEL = os.environ.get("LLM_MODEL", "stub")
+# 模拟后端的首 token 延迟和每个 token 的间隔（毫秒）
+LLM_FIRST_TOKEN_MS = float(os.environ.get("LLM_FIRST_TOKEN_MS", "0"))
+LLM_TOKEN_MS = float(os.environ.get("LLM_TOKEN_MS", "0"))
+
+# 中文按单字、英文和数字按整词切分，连续空白作为一个 token，拼接后可还原原文
+TOKEN_PATTERN = re.compile(r"[A-Za-z0-9_]+|\s+|.", re.S)
+
+
+def split_tokens(text):
+    return TOKEN_PATTERN.findall(text)
+
+
+def estimate_tokens(text):
+    """粗略估计 token 数（不计空白），用于提示词预算"""
+    return sum(1 for token in split_tokens(text) if not token.isspace())
+
+
+def truncate_tokens(text, budget):
+    """截取前 budget 个 token 对应的文本"""
+    count = 0
+    for match in TOKEN_PATTERN.finditer(text):
+        if not match.group().isspace():
+            count += 1
+            if count > budget:
+                return text[:match.start()]
+    return text
+
+
+class StreamStats:
+    """单次流式生成的计时：首 token 延迟和 tokens/秒"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.first_token_at = None
+        self.finished_at = None
+        self.tokens = 0
+
+    def on_token(self):
+        if self.first_token_at is None:
+            self.first_token_at = time.perf_counter()
+            metrics.observe("generate.ttft", self.first_token_at - self.started)
+        self.tokens += 1
+
+    def finish(self):
+        self.finished_at = time.perf_counter()
+        metrics.observe("generate.stream", self.finished_at - self.started)
+
+    @property
+    def ttft(self):
+        return self.first_token_at - self.started if self.first_token_at else None
+
+    @property
+    def tokens_per_sec(self):
+        # 按首 token 之后的解码阶段计算，不含排队和预填充时间
+        if self.first_token_at is None or self.finished_at is None:
+            return 0.0
+        decode_seconds = self.finished_at - self.first_token_at
+        return (self.tokens - 1) / decode_seconds if self.tokens > 1 and decode_seconds > 0 else 0.0
+
+    def as_dict(self):
+        return {
+            "ttft_seconds": self.ttft,
+            "tokens": self.tokens,
+            "tokens_per_sec": self.tokens_per_sec,
+            "total_seconds": (self.finished_at or time.perf_counter()) - self.started,
+        }
+
+
+def timed_stream(tokens, stats):
+    """包装 token 迭代器，边产出边记录统计"""
+    try:
+        for token in tokens:
+            stats.on_token()
+            yield token
+    finally:
+        stats.finish()
+
+
+class SimulatedGenerator:
+    """进程内模拟后端：由 respond_fn(prompt, query, docs) 生成完整回答，再按 token 间隔逐个输出"""
+
+    def __init__(self, respond_fn, first_token_ms=LLM_FIRST_TOKEN_MS, token_ms=LLM_TOKEN_MS):
+        self.respond_fn = respond_fn
+        self.first_token_delay = first_token_ms / 1000.0
+        self.token_delay = token_ms / 1000.0
+
+    def stream(self, prompt, query=None, docs=None, max_tokens=512):
+        if self.first_token_delay:
+            time.sleep(self.first_token_delay)
+        emitted = 0
+        for token in split_tokens(self.respond_fn(prompt, query, docs or [])):
+            if emitted >= max_tokens:
+                return
+            if emitted and self.token_delay:
+                time.sleep(self.token_delay)
+            if not token.isspace():
+                emitted += 1
+            yield token
+
+
+class HTTPStreamingGenerator:
+    """OpenAI 兼容的流式 chat completions 接口"""
+
+    def __init__(self, url=LLM_URL, model=LLM_MODEL, timeout=60, session=None):
+        import requests
+
+        self.url = url
+        self.model = model
+        self.timeout = timeout
+        self.session = session or requests.Session()
+
+    def stream(self, prompt, query=None, docs=None, max_tokens=512):
+        response = self.session.post(
+            self.url,
+            json={
+                "model": self.model,
+                "messages": [{"role": "user", "content": prompt}],
+                "max_tokens": max_tokens,
+                "stream": True,
+            },
+            stream=True,
+            timeout=self.timeout
+        )
+        with response:
+            # 在 with 中检查状态码，出错时也会关闭响应、归还连接
+            response.raise_for_status()
+            # 按字节切行后再解码，避免未声明字符集时按 latin-1 解码把中文中的字节当作换行
+            for line in response.iter_lines():
+                if not line.startswith(b"data:"):
+                    continue
+                data = line[len(b"data:"):].strip().decode("utf-8")
+                if data == "[DONE]":
+                    return
+                delta = json.loads(data)["choices"][0].get("delta", {})
+                if delta.get("content"):
+                    yield delta["content"]
+
+
+def create_generator(respond_fn, backend=None):
+    """按 LLM_BACKEND 创建生成后端，respond_fn(prompt, query, docs) 供模拟后端使用"""
+    backend = backend or LLM_BACKEND
+    if backend == "simulated":
+        return SimulatedGenerator(respond_fn)
+    if backend == "http":
+        return HTTPStreamingGenerator()
+    raise ValueError(f"未知的生成后端: {backend}")
+
+
+def pack_context(docs, token_budget, doc_overhead=8):
+    """按检索得分顺序把文档装入 token 预算，放不下的跳过，尝试后面更短的文档
+
+    第一篇文档即超出预算时截断后放入，保证至少有一篇上下文；按 id 去重。
+    doc_overhead 为每篇文档的 "文档 N:" 前缀和换行预留的 token 数。
+    """
+    packed = []
+    used = 0
+    seen = set()
+    for doc in docs:
+        key = doc.get("id", doc["text"])
+        if key in seen:
+            continue
+        cost = estimate_tokens(doc["text"]) + doc_overhead
+        if used + cost <= token_budget:
+            packed.append(doc)
+            used += cost
+            seen.add(key)
+        elif not packed and token_budget > doc_overhead:
+            packed.append(dict(doc, text=truncate_tokens(doc["text"], token_budget - doc_overhead)))
+            used = token_budget
+            seen.add(key)
+    return packed, used
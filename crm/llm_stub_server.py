@@ -0,0 +1,100 @@
+import argparse
+import json
+import re
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from llm_backend import split_tokens
+
+# 本地 LLM 桩服务：实现 OpenAI 兼容的 /v1/chat/completions 流式接口，
+# 按设定的首 token 延迟和 token 间隔输出，用于在没有真实模型时测试流式生成链路
+#   python llm_stub_server.py --port 8900 --first-token-ms 300 --token-ms 30
+#   LLM_BACKEND=http LLM_URL=http://127.0.0.1:8900/v1/chat/completions python milvus_rag_demo.py
+
+DOC_LINE = re.compile(r"^文档 \d+: (.*)$", re.M)
+QUESTION_LINE = re.compile(r"^用户问题: (.*)$", re.M)
+
+
+def stub_answer(prompt):
+    """根据提示词中的文档和问题拼出一段回答"""
+    docs = DOC_LINE.findall(prompt)
+    question = QUESTION_LINE.search(prompt)
+    question = question.group(1).strip().rstrip("？?") if question else "您的问题"
+    if not docs:
+        return "抱歉，我没有找到相关的信息来回答您的问题。"
+    return f"关于{question}，根据检索到的资料：{docs[0].strip()}"
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    first_token_delay = 0.3
+    token_delay = 0.03
+
+    def do_POST(self):
+        if self.path.rstrip("/") != "/v1/chat/completions":
+            self.send_error(404)
+            return
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        prompt = "\n".join(m.get("content", "") for m in body.get("messages", []))
+        tokens = split_tokens(stub_answer(prompt))[:body.get("max_tokens", 512)]
+
+        if not body.get("stream"):
+            time.sleep(self.first_token_delay + self.token_delay * len(tokens))
+            self._send_json({"choices": [{"message": {"role": "assistant", "content": "".join(tokens)}}]})
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream; charset=utf-8")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        time.sleep(self.first_token_delay)
+        for i, token in enumerate(tokens):
+            if i:
+                time.sleep(self.token_delay)
+            self._send_event({"choices": [{"delta": {"content": token}}]})
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+
+    def _send_event(self, payload):
+        self.wfile.write(f"data: {json.dumps(payload, ensure_ascii=False)}\n\n".encode("utf-8"))
+        self.wfile.flush()
+
+    def _send_json(self, payload):
+        data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def create_server(host="127.0.0.1", port=8900, first_token_ms=300, token_ms=30):
+    handler = type("ConfiguredStubHandler", (StubHandler,), {
+        "first_token_delay": first_token_ms / 1000.0,
+        "token_delay": token_ms / 1000.0,
+    })
+    return ThreadingHTTPServer((host, port), handler)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="本地 LLM 流式接口桩服务")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--first-token-ms", type=float, default=300)
+    parser.add_argument("--token-ms", type=float, default=30)
+    args = parser.parse_args()
+
+    server = create_server(args.host, args.port, args.first_token_ms, args.token_ms)
+    print(f"LLM 桩服务已启动: http://{args.host}:{args.port}/v1/chat/completions")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,211 @@
+import json
+import os
+import threading
+import time
+
+# 轻量级埋点：perf_counter_ns 计时的 span 写入 HDR 风格的对数直方图，
+# 可导出 Prometheus 文本格式或 JSON 快照
+# 默认关闭（METRICS=1 开启），关闭时 span() 直接返回共享的空上下文管理器，
+# 每个埋点只多一次函数调用和一次布尔判断
+
+ENABLED = os.environ.get("METRICS", "0") == "1"
+
+# 每个 2 的幂区间细分为 2^SUB_BUCKET_BITS 个桶，相对误差约 1/128
+SUB_BUCKET_BITS = 7
+SUB_BUCKET_COUNT = 1 << SUB_BUCKET_BITS
+SUB_BUCKET_HALF = SUB_BUCKET_COUNT // 2
+
+QUANTILES = (0.5, 0.95, 0.99)
+PROMETHEUS_METRIC = "crm_stage_duration_seconds"
+
+
+def bucket_index(value):
+    """HDR 布局：小于 SUB_BUCKET_COUNT 的值精确计数，更大的值只保留最高 SUB_BUCKET_BITS 位"""
+    if value < SUB_BUCKET_COUNT:
+        return value
+    shift = value.bit_length() - SUB_BUCKET_BITS
+    return SUB_BUCKET_COUNT + (shift - 1) * SUB_BUCKET_HALF + (value >> shift) - SUB_BUCKET_HALF
+
+
+def bucket_range(index):
+    """桶 index 覆盖的取值区间 [low, high)"""
+    if index < SUB_BUCKET_COUNT:
+        return index, index + 1
+    shift = (index - SUB_BUCKET_COUNT) // SUB_BUCKET_HALF + 1
+    mantissa = (index - SUB_BUCKET_COUNT) % SUB_BUCKET_HALF + SUB_BUCKET_HALF
+    return mantissa << shift, (mantissa + 1) << shift
+
+
+class Histogram:
+    """纳秒耗时直方图，桶稀疏存储，内存与取值范围的对数成正比"""
+
+    def __init__(self, name):
+        self.name = name
+        self.counts = {}
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = 0
+        self._lock = threading.Lock()
+
+    def record(self, value_ns):
+        value_ns = max(int(value_ns), 0)
+        index = bucket_index(value_ns)
+        with self._lock:
+            self.counts[index] = self.counts.get(index, 0) + 1
+            self.count += 1
+            self.total += value_ns
+            if self.min is None or value_ns < self.min:
+                self.min = value_ns
+            if value_ns > self.max:
+                self.max = value_ns
+
+    def quantile(self, q):
+        """第 q 分位数（纳秒），返回所在桶的中点，并限制在 [min, max] 内"""
+        with self._lock:
+            if not self.count:
+                return 0
+            rank = max(1, int(q * self.count + 0.5))
+            seen = 0
+            for index in sorted(self.counts):
+                seen += self.counts[index]
+                if seen >= rank:
+                    low, high = bucket_range(index)
+                    return min(max((low + high - 1) // 2, self.min), self.max)
+            return self.max
+
+    def snapshot(self):
+        mean = self.total / self.count if self.count else 0
+        result = {
+            "count": self.count,
+            "sum_ms": self.total / 1e6,
+            "mean_ms": mean / 1e6,
+            "min_ms": (self.min or 0) / 1e6,
+            "max_ms": self.max / 1e6,
+        }
+        for q in QUANTILES:
+            result[f"p{round(q * 100)}_ms"] = self.quantile(q) / 1e6
+        return result
+
+
+class Registry:
+    """按名称管理直方图"""
+
+    def __init__(self):
+        self.histograms = {}
+        self._lock = threading.Lock()
+
+    def histogram(self, name):
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            with self._lock:
+                histogram = self.histograms.setdefault(name, Histogram(name))
+        return histogram
+
+    def reset(self):
+        with self._lock:
+            self.histograms = {}
+
+    def snapshot(self):
+        return {name: h.snapshot() for name, h in sorted(self.histograms.items())}
+
+    def to_prometheus(self):
+        """Prometheus 文本格式，每个阶段作为 summary 的一个 stage 标签"""
+        lines = [
+            f"# HELP {PROMETHEUS_METRIC} 各处理阶段耗时",
+            f"# TYPE {PROMETHEUS_METRIC} summary",
+        ]
+        for name, histogram in sorted(self.histograms.items()):
+            for q in QUANTILES:
+                lines.append(f'{PROMETHEUS_METRIC}{{stage="{name}",quantile="{q}"}} '
+                             f"{histogram.quantile(q) / 1e9:.9f}")
+            lines.append(f'{PROMETHEUS_METRIC}_sum{{stage="{name}"}} {histogram.total / 1e9:.9f}')
+            lines.append(f'{PROMETHEUS_METRIC}_count{{stage="{name}"}} {histogram.count}')
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+
+class Span:
+    """计时上下文管理器，退出时把耗时写入同名直方图"""
+
+    __slots__ = ("histogram", "start")
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.histogram.record(time.perf_counter_ns() - self.start)
+        return False
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+def enable(flag=True):
+    global ENABLED
+    ENABLED = flag
+
+
+def enabled():
+    return ENABLED
+
+
+def span(name):
+    """with span("retrieve.search"): ... 关闭埋点时不计时"""
+    if not ENABLED:
+        return _NOOP_SPAN
+    return Span(registry.histogram(name))
+
+
+def observe(name, seconds):
+    """记录在别处已测得的耗时（秒）"""
+    if ENABLED:
+        registry.histogram(name).record(seconds * 1e9)
+
+
+def snapshot():
+    return registry.snapshot()
+
+
+def export_prometheus():
+    return registry.to_prometheus()
+
+
+def export_json(indent=2):
+    return json.dumps(snapshot(), ensure_ascii=False, indent=indent)
+
+
+def write(path):
+    """按扩展名写出：.prom 为 Prometheus 文本格式，其余为 JSON"""
+    content = export_prometheus() if path.endswith(".prom") else export_json()
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(content)
+
+
+def format_report():
+    """按阶段打印 p50/p95/p99 的文本报告"""
+    rows = snapshot()
+    if not rows:
+        return "没有埋点数据"
+    width = max(len(name) for name in rows)
+    lines = [f"{'阶段'.ljust(width)}  {'次数':>6}  {'p50(ms)':>9}  {'p95(ms)':>9}  {'p99(ms)':>9}  {'合计(ms)':>10}"]
+    for name, s in rows.items():
+        lines.append(f"{name.ljust(width)}  {s['count']:>6}  {s['p50_ms']:>9.3f}  {s['p95_ms']:>9.3f}  "
+                     f"{s['p99_ms']:>9.3f}  {s['sum_ms']:>10.3f}")
+    return "\n".join(lines)
@@ -1,25 +1,35 @@
-from pymilvus import MilvusClient
+import os
 import numpy as np
-from sentence_transformers import SentenceTransformer
 
-# 初始化文本向量模型
-model = SentenceTransformer('paraphrase-multilingual-MiniLM-L12-v2')
+from embedding import DEFAULT_BATCH_SIZE, embed_texts, build_entities
+from resources import get_model, get_client, get_embedding_cache
+from index_config import load_index_config
+from incremental_sync import unique_chunks
+from metrics import span
 
-# 连接到Milvus服务器
-client = MilvusClient(uri="http://localhost:19530")
+# 文本向量模型和检索客户端由 resources 延迟创建并在进程内共享：
+# get_model() 首次调用时加载模型，get_client() 首次调用时连接检索后端
+# （默认 Milvus 服务器，VECTOR_BACKEND=local 时使用进程内检索）
 
 # 集合名称
 COLLECTION_NAME = "text_search_demo"
 VECTOR_DIM = 384  # 向量维度，取决于模型
 
+# 索引配置，可由 index_tuning.py --auto-tune --save 生成后通过 INDEX_CONFIG 指定
+INDEX_CONFIG = load_index_config(os.environ.get("INDEX_CONFIG", ""), metric_type="COSINE", dim=VECTOR_DIM)
+
 # 创建集合
-def setup_collection():
-    # 如果集合已存在，先删除
-    if client.has_collection(COLLECTION_NAME):
-        client.drop_collection(COLLECTION_NAME)
+def setup_collection(reset=True):
+    if get_client().has_collection(COLLECTION_NAME):
+        # 增量模式下保留已有集合
+        if not reset:
+            print(f"集合 {COLLECTION_NAME} 已存在")
+            return
+        # 如果集合已存在，先删除
+        get_client().drop_collection(COLLECTION_NAME)
     
     # 创建新集合
-    client.create_collection(
+    get_client().create_collection(
         collection_name=COLLECTION_NAME,
         dimension=VECTOR_DIM,
         primary_field_name="id",
@@ -29,46 +39,48 @@ def setup_collection():
 
 # 将文本转换为向量
 def text_to_vector(text):
-    return model.encode(text).tolist()
+    return embed_texts(get_model(), [text], cache=get_embedding_cache())[0].tolist()
 
 # 插入数据
-def insert_data(texts):
-    entities = []
-    for i, text in enumerate(texts):
-        entities.append({
-            "id": i,
-            "text": text,
-            "embedding": text_to_vector(text)
-        })
+def insert_data(texts, batch_size=DEFAULT_BATCH_SIZE, pool=None):
+    # 主键由内容哈希生成，保证与增量同步一致；内容相同的文本只保留一条
+    ids, texts = unique_chunks(texts)
+    with span("store.embed"):
+        vectors = embed_texts(get_model(), texts, batch_size, get_embedding_cache(), pool)
+    with span("store.marshal"):
+        entities = build_entities(ids, texts, vectors)
     
-    client.insert(
-        collection_name=COLLECTION_NAME,
-        data=entities
-    )
+    # upsert 而不是 insert，重复运行不会产生重复主键
+    with span("store.insert"):
+        get_client().upsert(
+            collection_name=COLLECTION_NAME,
+            data=entities
+        )
     print(f"已插入 {len(texts)} 条数据")
 
 # 创建索引
 def create_index():
-    client.create_index(
+    get_client().create_index(
         collection_name=COLLECTION_NAME,
         field_name="embedding",
-        index_type="IVF_FLAT",
+        index_type=INDEX_CONFIG["index_type"],
         metric_type="COSINE",
-        params={"nlist": 128}
+        params=INDEX_CONFIG["params"]
     )
     print("索引创建成功")
     
     # 加载集合到内存
-    client.load_collection(COLLECTION_NAME)
+    get_client().load_collection(COLLECTION_NAME)
 
 # 搜索相似文本
 def search_similar(query_text, limit=5):
     query_vector = text_to_vector(query_text)
     
-    results = client.search(
+    results = get_client().search(
         collection_name=COLLECTION_NAME,
         data=[query_vector],
         field_name="embedding",
+        search_params={"metric_type": "COSINE", "params": INDEX_CONFIG["search_params"]},
         limit=limit,
         output_fields=["text"]
     )
@@ -107,6 +119,11 @@ def main():
     search_similar("如何用AI控制家里的设备")
     print("\n")
     search_similar("家庭安全系统")
+    
+    # 本地后端设置了 LOCAL_VECTOR_PATH 时把集合写入磁盘，Milvus 则把写入落盘
+    get_client().flush(COLLECTION_NAME)
+    get_embedding_cache().flush()
+    print(get_embedding_cache().report())
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
@@ -1,29 +1,88 @@
+import argparse
 import os
 import numpy as np
-from pymilvus import MilvusClient
-from sentence_transformers import SentenceTransformer
 import requests
 import json
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 
-# 初始化文本向量模型
-model = SentenceTransformer('paraphrase-multilingual-MiniLM-L12-v2')
+from embedding import DEFAULT_BATCH_SIZE, embed_texts, build_entities
+from resources import get_model, get_client, get_embedding_cache
+from index_config import load_index_config
+from incremental_sync import chunk_ids, sync_collection, unique_chunks
+from ingest_pipeline import ingest_path
+from bm25_index import BM25Index, reciprocal_rank_fusion
+from dedup import NearDuplicateFilter
+from query_cache import QueryCache
+from llm_backend import StreamStats, create_generator, pack_context, timed_stream
+import metrics
+from metrics import span
 
-# 连接到Milvus服务器
-client = MilvusClient(uri="http://localhost:19530")
+# 文本向量模型和检索客户端由 resources 延迟创建并在进程内共享：
+# get_model() 首次调用时加载模型，get_client() 首次调用时连接检索后端
+# （默认 Milvus 服务器，VECTOR_BACKEND=local 时使用进程内检索）
 
 # 集合名称和向量维度
 COLLECTION_NAME = "smart_home_knowledge"
 VECTOR_DIM = 384  # 向量维度，取决于模型
 
+# 索引配置，可由 index_tuning.py --auto-tune --save 生成后通过 INDEX_CONFIG 指定
+INDEX_CONFIG = load_index_config(os.environ.get("INDEX_CONFIG", ""), metric_type="COSINE", dim=VECTOR_DIM)
+
+# 与向量集合同步维护的 BM25 倒排索引，HYBRID_RETRIEVAL=1 时 rag_system 使用混合检索
+# 索引只在内存中，没有在本进程导入数据时（如 rag_server），首次混合检索前从集合中重建
+HYBRID_RETRIEVAL = os.environ.get("HYBRID_RETRIEVAL", "0") == "1"
+bm25_index = BM25Index()
+_bm25_loaded = False
+_bm25_lock = threading.Lock()
+# 混合检索时并行执行向量检索和关键词检索
+retrieval_executor = ThreadPoolExecutor(max_workers=4)
+# 后续上下文检索使用单独的线程池：它内部的混合检索会向 retrieval_executor 提交任务并等待，
+# 共用同一个线程池时并发请求会占满全部线程而互相等待
+followup_executor = ThreadPoolExecutor(max_workers=4)
+
+# 检索结果缓存，本进程写入语料时立即失效；QUERY_CACHE_SIZE=0 关闭，QUERY_CACHE_TTL 为过期秒数
+# 其他进程的写入通过每 QUERY_CACHE_CHECK_INTERVAL 秒检查一次集合行数发现，行数不变的改动最多在 TTL 后生效
+def collection_fingerprint():
+    return get_client().get_collection_stats(COLLECTION_NAME)["row_count"]
+
+query_cache = QueryCache(
+    max_entries=int(os.environ.get("QUERY_CACHE_SIZE", "1024")),
+    ttl=float(os.environ.get("QUERY_CACHE_TTL", "60")),
+    version_source=collection_fingerprint,
+    check_interval=float(os.environ.get("QUERY_CACHE_CHECK_INTERVAL", "1"))
+)
+
+# 近似重复判定阈值（MinHash 估计的 Jaccard 相似度），设为 0 关闭去重
+DEDUP_THRESHOLD = float(os.environ.get("DEDUP_THRESHOLD", "0.8"))
+
+# 提示词中检索文档的 token 预算，以及回答的最大 token 数
+PROMPT_TOKEN_BUDGET = int(os.environ.get("PROMPT_TOKEN_BUDGET", "1024"))
+MAX_ANSWER_TOKENS = int(os.environ.get("MAX_ANSWER_TOKENS", "512"))
+# 生成后端由 LLM_BACKEND 选择，首次生成时创建
+_generator = None
+
+# 埋点结果输出路径（METRICS=1 时生效），.prom 为 Prometheus 文本格式，其余为 JSON
+METRICS_OUTPUT = os.environ.get("METRICS_OUTPUT", "")
+
 # 1. 创建集合
-def setup_collection():
-    # 如果集合已存在，先删除
-    if client.has_collection(COLLECTION_NAME):
-        client.drop_collection(COLLECTION_NAME)
+def setup_collection(reset=True):
+    global _bm25_loaded
+    if get_client().has_collection(COLLECTION_NAME):
+        # 增量模式下保留已有集合
+        if not reset:
+            print(f"集合 {COLLECTION_NAME} 已存在")
+            return
+        # 如果集合已存在，先删除
+        get_client().drop_collection(COLLECTION_NAME)
+        query_cache.bump()
+    # 新集合为空，BM25 索引随之清空，不需要再从集合重建
+    bm25_index.clear()
+    _bm25_loaded = True
     
     # 创建新集合
-    client.create_collection(
+    get_client().create_collection(
         collection_name=COLLECTION_NAME,
         dimension=VECTOR_DIM,
         primary_field_name="id",
@@ -33,7 +92,7 @@ def setup_collection():
 
 # 2. 文本向量化
 def text_to_vector(text):
-    return model.encode(text).tolist()
+    return embed_texts(get_model(), [text], cache=get_embedding_cache())[0].tolist()
 
 # 3. 文档处理和加载
 def process_documents(documents):
@@ -45,62 +104,227 @@ def process_documents(documents):
         chunks.extend(paragraphs)
     return chunks
 
+# 3.1 近似重复去重：在向量化之前丢弃重复的段落
+def dedup_chunks(chunks, threshold=DEDUP_THRESHOLD):
+    if not threshold:
+        return chunks
+    dedup_filter = NearDuplicateFilter(threshold, vector_bytes=VECTOR_DIM * 4)
+    kept = list(dedup_filter.filter(chunks))
+    print_dedup_report(dedup_filter)
+    return kept
+
+def print_dedup_report(dedup_filter):
+    report = dedup_filter.report()
+    print(f"去重: 保留 {report['kept']} 个文档块, 丢弃 {report['dropped']} 个 "
+          f"(完全重复 {report['exact_dropped']}, 近似重复 {report['near_dropped']}), "
+          f"节省 {report['embeddings_saved']} 次向量化和 {report['vector_bytes_saved'] / 1024:.1f} KB 向量存储")
+
 # 4. 向量存储
-def store_documents(chunks):
-    entities = []
-    for i, chunk in enumerate(chunks):
-        entities.append({
-            "id": i,
-            "text": chunk,
-            "embedding": text_to_vector(chunk)
-        })
+def store_documents(chunks, batch_size=DEFAULT_BATCH_SIZE, pool=None):
+    """批量向量化并写入文档块，传入 EmbeddingPool 时使用多进程编码"""
+    # 主键由内容哈希生成，保证与增量同步一致；内容相同的块只保留一个
+    ids, chunks = unique_chunks(chunks)
+    with span("store.embed"):
+        vectors = embed_texts(get_model(), chunks, batch_size, get_embedding_cache(), pool)
+    with span("store.marshal"):
+        entities = build_entities(ids, chunks, vectors)
     
-    client.insert(
-        collection_name=COLLECTION_NAME,
-        data=entities
-    )
+    # upsert 而不是 insert，重复导入同一语料不会产生重复主键
+    with span("store.insert"):
+        get_client().upsert(
+            collection_name=COLLECTION_NAME,
+            data=entities
+        )
+    with span("store.bm25"):
+        bm25_index.add_many(ids, chunks)
+    query_cache.bump()
     print(f"已插入 {len(chunks)} 个文档块")
 
+# 4.1 增量同步：只向量化并写入新增或变化的文档块，删除已消失的块
+def sync_documents(chunks, batch_size=DEFAULT_BATCH_SIZE):
+    def embed_fn(texts):
+        with span("sync.embed"):
+            return embed_texts(get_model(), texts, batch_size, get_embedding_cache())
+
+    with span("sync.total"):
+        result = sync_collection(get_client(), COLLECTION_NAME, chunks, embed_fn)
+    print(f"增量同步完成: 新增 {result['added']} 个, 删除 {result['removed']} 个, 未变化 {result['unchanged']} 个")
+    
+    # BM25 索引与当前语料保持一致
+    ids = chunk_ids(chunks)
+    bm25_index.add_many(ids, chunks)
+    bm25_index.remove_many(bm25_index.ids() - set(ids))
+    query_cache.bump()
+    return result
+
+# 4.2 流式导入：从文件或目录逐段读取，分批向量化并写入，内存占用保持平稳
+def ingest_files(path, batch_size=DEFAULT_BATCH_SIZE, insert_batch_size=512):
+    dedup_filter = NearDuplicateFilter(DEDUP_THRESHOLD, vector_bytes=VECTOR_DIM * 4) if DEDUP_THRESHOLD else None
+
+    def on_insert(ids, texts):
+        bm25_index.add_many(ids, texts)
+        query_cache.bump()
+
+    stats = ingest_path(
+        path,
+        get_client(),
+        COLLECTION_NAME,
+        lambda texts: embed_texts(get_model(), texts, batch_size, get_embedding_cache()),
+        chunk_filter=dedup_filter.filter if dedup_filter else None,
+        embed_batch_size=batch_size,
+        insert_batch_size=insert_batch_size,
+        on_insert=on_insert
+    )
+    if dedup_filter:
+        print_dedup_report(dedup_filter)
+    print(f"流式导入完成: {stats['chunks']} 个文档块, 耗时 {stats['elapsed_seconds']:.2f}秒 ({stats['chunks_per_sec']:.1f} 块/秒)")
+    for stage in stats["stages"]:
+        print(f"  阶段 {stage['stage']}: {stage['items']} 条, {stage['batches']} 批, {stage['items_per_sec']:.1f} 条/秒")
+    return stats
+
 # 5. 创建索引
 def create_index():
-    client.create_index(
+    get_client().create_index(
         collection_name=COLLECTION_NAME,
         field_name="embedding",
-        index_type="IVF_FLAT",
+        index_type=INDEX_CONFIG["index_type"],
         metric_type="COSINE",
-        params={"nlist": 128}
+        params=INDEX_CONFIG["params"]
     )
     print("索引创建成功")
+    query_cache.bump()
     
     # 加载集合到内存
-    client.load_collection(COLLECTION_NAME)
+    get_client().load_collection(COLLECTION_NAME)
 
 # 6. 检索相关文档
 def retrieve_relevant_docs(query, top_k=3):
-    query_vector = text_to_vector(query)
+    # 相同问题在语料未变化时直接返回缓存的结果
+    cached = query_cache.get(query, top_k)
+    if cached is not None:
+        return cached
+    version = query_cache.version
     
-    results = client.search(
-        collection_name=COLLECTION_NAME,
-        data=[query_vector],
-        field_name="embedding",
-        limit=top_k,
-        output_fields=["text"]
-    )
+    with span("retrieve.embed"):
+        query_vector = text_to_vector(query)
+    
+    with span("retrieve.search"):
+        results = get_client().search(
+            collection_name=COLLECTION_NAME,
+            data=[query_vector],
+            field_name="embedding",
+            search_params={"metric_type": "COSINE", "params": INDEX_CONFIG["search_params"]},
+            limit=top_k,
+            output_fields=["text"]
+        )
     
+    with span("retrieve.marshal"):
+        relevant_docs = hits_to_docs(results[0])
+    query_cache.put(query, top_k, relevant_docs, version)
+    return relevant_docs
+
+def hits_to_docs(hits):
     relevant_docs = []
-    for hit in results[0]:
+    for hit in hits:
         relevant_docs.append({
+            "id": hit['id'],
             "text": hit['entity']['text'],
             "score": 1 - hit['distance']  # 转换距离为相似度分数
         })
     
     return relevant_docs
 
+# 6.1 批量检索：一次向量化全部问题，并用一次多向量搜索取回结果
+def retrieve_many(queries, top_k=3, batch_size=DEFAULT_BATCH_SIZE, max_nq=1024):
+    queries = list(queries)
+    if not queries:
+        return []
+    # 先查结果缓存，只有未命中的问题需要向量化和搜索
+    version = query_cache.version
+    all_docs = [query_cache.get(query, top_k) for query in queries]
+    missing = [i for i, docs in enumerate(all_docs) if docs is None]
+    if not missing:
+        return all_docs
+    miss_queries = [queries[i] for i in missing]
+    with span("retrieve_many.embed"):
+        query_vectors = embed_texts(get_model(), miss_queries, batch_size, get_embedding_cache())
+    
+    # 单次搜索的查询向量数有上限，超出时分段发送
+    for start in range(0, len(miss_queries), max_nq):
+        with span("retrieve_many.search"):
+            results = get_client().search(
+                collection_name=COLLECTION_NAME,
+                data=query_vectors[start:start + max_nq].tolist(),
+                field_name="embedding",
+                search_params={"metric_type": "COSINE", "params": INDEX_CONFIG["search_params"]},
+                limit=top_k,
+                output_fields=["text"]
+            )
+        # 结果与查询向量一一对应
+        with span("retrieve_many.marshal"):
+            for i, hits in zip(missing[start:start + max_nq], results):
+                all_docs[i] = hits_to_docs(hits)
+                query_cache.put(queries[i], top_k, all_docs[i], version)
+    
+    return all_docs
+
+# 6.2 混合检索：向量检索和 BM25 关键词检索并行执行，结果用倒数排名融合
+def load_bm25_index(batch_size=1000):
+    """分页读取集合中的全部文档块，补齐内存中的 BM25 索引（已有的 id 会跳过）"""
+    global _bm25_loaded
+    with _bm25_lock:
+        if _bm25_loaded:
+            return
+        if get_client().has_collection(COLLECTION_NAME):
+            iterator = get_client().query_iterator(
+                collection_name=COLLECTION_NAME,
+                batch_size=batch_size,
+                filter="",
+                output_fields=["id", "text"]
+            )
+            try:
+                while True:
+                    rows = iterator.next()
+                    if not rows:
+                        break
+                    bm25_index.add_many([row["id"] for row in rows], [row["text"] for row in rows])
+            finally:
+                iterator.close()
+            print(f"已从集合 {COLLECTION_NAME} 重建 BM25 索引: {len(bm25_index)} 个文档块")
+        _bm25_loaded = True
+
+def hybrid_retrieve(query, top_k=3, candidates=None):
+    candidates = candidates or top_k * 3
+    if not _bm25_loaded:
+        load_bm25_index()
+    vector_future = retrieval_executor.submit(retrieve_relevant_docs, query, candidates)
+    with span("retrieve.bm25"):
+        lexical_docs = bm25_index.search(query, candidates)
+    vector_docs = vector_future.result()
+    with span("retrieve.fusion"):
+        return reciprocal_rank_fusion([vector_docs, lexical_docs], top_k)
+
+# 6.3 后续上下文：在生成回答的同时检索更多相关文档，供用户追问时使用
+def retrieve_followup(query, seen_docs, top_k=3):
+    seen_ids = {doc["id"] for doc in seen_docs}
+    candidates = top_k + len(seen_ids)
+    if HYBRID_RETRIEVAL:
+        docs = hybrid_retrieve(query, candidates)
+    else:
+        docs = retrieve_relevant_docs(query, candidates)
+    return [doc for doc in docs if doc["id"] not in seen_ids][:top_k]
+
 # 7. 调用LLM生成回答
-def generate_answer(query, relevant_docs):
-    """使用检索到的文档增强LLM回答"""
-    # 构建提示
-    context = "\n".join([f"文档 {i+1}: {doc['text']}" for i, doc in enumerate(relevant_docs)])
+def get_generator():
+    global _generator
+    if _generator is None:
+        _generator = create_generator(simulate_llm_response)
+    return _generator
+
+def build_prompt(query, relevant_docs, token_budget=PROMPT_TOKEN_BUDGET):
+    """按 token 预算装入检索到的文档并构建提示，返回 (提示, 实际使用的文档)"""
+    docs, _ = pack_context(relevant_docs, token_budget)
+    context = "\n".join([f"文档 {i+1}: {doc['text']}" for i, doc in enumerate(docs)])
     
     prompt = f"""请基于以下智能家居领域的文档回答用户的问题。
 如果文档中没有相关信息，请诚实地说你不知道。
@@ -111,11 +335,22 @@ def generate_answer(query, relevant_docs):
 用户问题: {query}
 
 回答:"""
+    return prompt, docs
+
+def stream_answer(query, relevant_docs, stats=None):
+    """流式生成回答，逐个产出 token；stats 记录首 token 延迟和生成速度"""
+    stats = stats or StreamStats()
+    with span("generate.prompt"):
+        prompt, docs = build_prompt(query, relevant_docs)
+    
+    # 这里使用本地模型或API调用LLM，默认使用模拟的回答生成
+    tokens = get_generator().stream(prompt, query, docs, MAX_ANSWER_TOKENS)
+    return timed_stream(tokens, stats)
 
-    # 这里使用本地模型或API调用LLM
-    # 示例使用模拟的回答生成
-    answer = simulate_llm_response(prompt, query, relevant_docs)
-    return answer
+def generate_answer(query, relevant_docs):
+    """使用检索到的文档增强LLM回答"""
+    with span("generate.llm"):
+        return "".join(stream_answer(query, relevant_docs))
 
 # 模拟LLM响应（实际应用中应替换为真实的LLM API调用）
 def simulate_llm_response(prompt, query, docs):
@@ -136,32 +371,53 @@ def rag_system(query):
     print(f"用户问题: {query}")
     
     # 检索相关文档
-    start_time = time.time()
-    relevant_docs = retrieve_relevant_docs(query)
-    retrieval_time = time.time() - start_time
+    start_time = time.perf_counter()
+    with span("rag.retrieval"):
+        if HYBRID_RETRIEVAL:
+            relevant_docs = hybrid_retrieve(query)
+        else:
+            relevant_docs = retrieve_relevant_docs(query)
+    retrieval_time = time.perf_counter() - start_time
     
     print(f"检索到 {len(relevant_docs)} 个相关文档 (耗时: {retrieval_time:.2f}秒)")
     for i, doc in enumerate(relevant_docs):
         print(f"文档 {i+1} (相似度: {doc['score']:.4f}): {doc['text'][:100]}...")
     
-    # 生成回答
-    start_time = time.time()
-    answer = generate_answer(query, relevant_docs)
-    generation_time = time.time() - start_time
+    # 流式生成回答，同时在后台检索后续上下文
+    followup_future = followup_executor.submit(retrieve_followup, query, relevant_docs)
+    stats = StreamStats()
+    tokens = []
+    print("\n回答:")
+    with span("rag.generation"):
+        for token in stream_answer(query, relevant_docs, stats):
+            print(token, end="", flush=True)
+            tokens.append(token)
+    answer = "".join(tokens)
+    generation = stats.as_dict()
+    generation_time = generation["total_seconds"]
+    ttft = generation["ttft_seconds"] or 0.0
+    print(f"\n(首 token 延迟: {ttft * 1000:.1f}毫秒, {generation['tokens']} 个 token, "
+          f"{generation['tokens_per_sec']:.1f} tokens/秒, 生成耗时: {generation_time:.2f}秒)")
     
-    print(f"\n回答 (生成耗时: {generation_time:.2f}秒):")
-    print(answer)
+    followup_docs = followup_future.result()
+    if followup_docs:
+        print("延伸阅读:")
+        for doc in followup_docs:
+            print(f"- {doc['text'][:60]}...")
     
     return {
         "query": query,
         "relevant_docs": relevant_docs,
+        "followup_docs": followup_docs,
         "answer": answer,
         "retrieval_time": retrieval_time,
-        "generation_time": generation_time
+        "generation_time": generation_time,
+        "ttft": ttft,
+        "tokens_per_sec": generation["tokens_per_sec"]
     }
 
 # 9. 主函数
-def main():
+def main(incremental=False, source=None):
     # 示例智能家居领域知识
     documents = [
         """
@@ -213,17 +469,28 @@ def main():
         """
     ]
     
-    # 设置集合
-    setup_collection()
-    
-    # 处理文档
-    chunks = process_documents(documents)
+    # 设置集合（增量模式下不删除已有集合）
+    setup_collection(reset=not incremental)
     
-    # 存储文档
-    store_documents(chunks)
+    if source:
+        # 从文件或目录流式导入，替代内置示例文档
+        ingest_files(source)
+    elif incremental:
+        # 处理文档、去重并增量同步
+        chunks = dedup_chunks(process_documents(documents))
+        sync_documents(chunks)
+    else:
+        # 处理文档并去除近似重复的段落
+        chunks = dedup_chunks(process_documents(documents))
+        
+        # 存储文档
+        store_documents(chunks)
     
-    # 创建索引
-    create_index()
+    # 创建索引（保留已有集合时，索引已存在则只需加载集合）
+    if (source or incremental) and get_client().list_indexes(COLLECTION_NAME):
+        get_client().load_collection(COLLECTION_NAME)
+    else:
+        create_index()
     
     # 测试RAG系统
     test_queries = [
@@ -237,6 +504,22 @@ def main():
     for query in test_queries:
         result = rag_system(query)
         print("\n" + "-"*50 + "\n")
+    
+    # 本地后端设置了 LOCAL_VECTOR_PATH 时把集合写入磁盘，Milvus 则把写入落盘
+    get_client().flush(COLLECTION_NAME)
+    get_embedding_cache().flush()
+    print(get_embedding_cache().report())
+    print(query_cache.report())
+    
+    if metrics.enabled():
+        print(metrics.format_report())
+        if METRICS_OUTPUT:
+            metrics.write(METRICS_OUTPUT)
+            print(f"埋点数据已写入 {METRICS_OUTPUT}")
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="智能家居知识库 RAG 示例")
+    parser.add_argument("--incremental", action="store_true", help="增量同步，不重建集合")
+    parser.add_argument("--source", help="从文件或目录流式导入文档")
+    args = parser.parse_args()
+    main(incremental=args.incremental, source=args.source) 
\ No newline at end of file
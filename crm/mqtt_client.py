@@ -1,17 +1,43 @@
 import paho.mqtt.client as mqtt
+import os
 import time
 import json
 import random
 
+from mqtt_outbox import ReliablePublisher
+from telemetry import TelemetryBatcher, decode_batch
+from topic_router import OrderedDispatcher, TopicRouter
+
 # MQTT服务器配置
-MQTT_BROKER = "broker.emqx.io"  # 公共MQTT代理服务器
-MQTT_PORT = 1883
+# 默认使用公共MQTT代理服务器，离线测试时可通过 MQTT_BROKER=localhost 指向本地的 mosquitto
+MQTT_BROKER = os.environ.get("MQTT_BROKER", "broker.emqx.io")
+MQTT_PORT = int(os.environ.get("MQTT_PORT", "1883"))
 MQTT_KEEPALIVE = 60
 
 # 主题配置
 TOPIC_TEMPERATURE = "home/livingroom/temperature"
 TOPIC_HUMIDITY = "home/livingroom/humidity"
 TOPIC_COMMAND = "home/devices/+/command"  # 使用通配符订阅所有设备的命令
+# 批量遥测主题，负载为 telemetry.encode_batch 编码的二进制批次
+TOPIC_TELEMETRY = "home/livingroom/telemetry"
+
+# 遥测格式：batch（多个读数合并为一条二进制消息，默认）或 text（每个读数一条文本消息，兼容旧的订阅端）
+TELEMETRY_FORMAT = os.environ.get("TELEMETRY_FORMAT", "batch")
+# 批量模式下的发送间隔（秒）和单批最多读数条数，先到者触发发送
+TELEMETRY_FLUSH_INTERVAL = float(os.environ.get("TELEMETRY_FLUSH_INTERVAL", "30"))
+TELEMETRY_MAX_READINGS = int(os.environ.get("TELEMETRY_MAX_READINGS", "500"))
+
+# 消息处理的工作线程数和每个线程的队列容量，队列满时丢弃新消息，网络线程不会被处理函数阻塞
+MQTT_WORKERS = int(os.environ.get("MQTT_WORKERS", "4"))
+MQTT_QUEUE_SIZE = int(os.environ.get("MQTT_QUEUE_SIZE", "1000"))
+_dispatcher = None
+
+# 发布层：内存队列容量（满时阻塞生产者）、同时在途的消息数上限，
+# 以及断线期间保存消息的发件箱文件和容量（写满后覆盖最旧的消息）
+MQTT_MAX_QUEUE = int(os.environ.get("MQTT_MAX_QUEUE", "1000"))
+MQTT_MAX_INFLIGHT = int(os.environ.get("MQTT_MAX_INFLIGHT", "100"))
+MQTT_OUTBOX_PATH = os.environ.get("MQTT_OUTBOX_PATH", "mqtt_outbox.bin")
+MQTT_OUTBOX_MB = int(os.environ.get("MQTT_OUTBOX_MB", "64"))
 
 # 当连接到MQTT代理时的回调函数
 def on_connect(client, userdata, flags, rc):
@@ -24,24 +50,55 @@ def on_connect(client, userdata, flags, rc):
         print(f"连接失败，返回码: {rc}")
 
 # 当收到消息时的回调函数
+# 运行在 paho 的网络线程上，只做路由和入队，处理函数在工作线程中执行
 def on_message(client, userdata, msg):
+    matches = router.match(msg.topic)
+    if not matches:
+        print(f"没有处理函数的消息 [{msg.topic}]")
+        return
+    for handler, params in matches:
+        # 同一设备的消息进入同一个工作线程，按到达顺序处理
+        key = params[0] if params else msg.topic
+        if not get_dispatcher().submit(key, handler, client, msg.topic, params, msg.payload):
+            print(f"消息队列已满，丢弃消息 [{msg.topic}]")
+
+def get_dispatcher():
+    """返回共享的消息分发线程池，首次调用时创建"""
+    global _dispatcher
+    if _dispatcher is None:
+        _dispatcher = OrderedDispatcher(MQTT_WORKERS, MQTT_QUEUE_SIZE)
+    return _dispatcher
+
+# 命令主题 home/devices/<设备>/command，params[0] 为设备 id
+def handle_command(client, topic, params, payload):
+    payload = payload.decode()
+    print(f"收到消息 [{topic}]: {payload}")
     try:
-        payload = msg.payload.decode()
-        print(f"收到消息 [{msg.topic}]: {payload}")
-        
-        # 如果是命令主题，解析并执行命令
-        if "/command" in msg.topic:
-            device_id = msg.topic.split("/")[2]
-            try:
-                command = json.loads(payload)
-                process_command(device_id, command)
-            except json.JSONDecodeError:
-                print(f"无效的JSON命令: {payload}")
-    except Exception as e:
-        print(f"处理消息时出错: {e}")
+        command = json.loads(payload)
+    except json.JSONDecodeError:
+        print(f"无效的JSON命令: {payload}")
+        return
+    process_command(client, params[0], command)
+
+# 解码批量遥测，遥测批次是二进制负载，不能按文本解码
+def handle_telemetry(client, topic, params, payload):
+    try:
+        readings = decode_batch(payload)
+    except ValueError as e:
+        print(f"无效的遥测批次 [{topic}]: {e}")
+        return []
+    print(f"收到遥测 [{topic}]: {len(readings)} 条读数, {len(payload)} 字节")
+    return readings
+
+# 设备状态消息，命令中带 command_id 时原样带回，便于发送方匹配回复
+def build_status(command):
+    status = {"status": command["action"], "timestamp": time.time()}
+    if "command_id" in command:
+        status["command_id"] = command["command_id"]
+    return status
 
 # 处理命令
-def process_command(device_id, command):
+def process_command(client, device_id, command):
     if "action" in command:
         action = command["action"]
         print(f"执行设备 {device_id} 的 {action} 命令")
@@ -54,14 +111,22 @@ def process_command(device_id, command):
             print(f"关闭设备 {device_id}")
         
         # 发送状态更新
-        status = {"status": action, "timestamp": time.time()}
+        status = build_status(command)
         client.publish(f"home/devices/{device_id}/status", json.dumps(status))
 
+# 主题路由：订阅过滤器 -> 处理函数，处理函数的参数为 (client, 主题, 通配符捕获的层级, 负载)
+router = TopicRouter()
+router.add(TOPIC_COMMAND, handle_command)
+router.add(TOPIC_TELEMETRY, handle_telemetry)
+
 # 创建MQTT客户端
-def create_mqtt_client():
+# connect=False 时只创建客户端，由 ReliablePublisher 负责连接和重连
+def create_mqtt_client(connect=True):
     client = mqtt.Client()
     client.on_connect = on_connect
     client.on_message = on_message
+    if not connect:
+        return client
     
     # 连接到MQTT代理
     try:
@@ -73,17 +138,26 @@ def create_mqtt_client():
 
 # 模拟发送传感器数据
 def publish_sensor_data(client):
+    batcher = None
+    if TELEMETRY_FORMAT == "batch":
+        batcher = TelemetryBatcher(client, TOPIC_TELEMETRY, TELEMETRY_FLUSH_INTERVAL, TELEMETRY_MAX_READINGS)
+        batcher.start()
+        print(f"批量遥测: 每 {TELEMETRY_FLUSH_INTERVAL:.0f} 秒或每 {TELEMETRY_MAX_READINGS} 条读数发送一次到 {TOPIC_TELEMETRY}")
     while True:
         try:
             # 模拟温度数据
             temperature = round(random.uniform(20, 30), 1)
-            client.publish(TOPIC_TEMPERATURE, str(temperature))
-            print(f"已发布温度: {temperature}°C")
-            
             # 模拟湿度数据
             humidity = round(random.uniform(40, 70), 1)
-            client.publish(TOPIC_HUMIDITY, str(humidity))
-            print(f"已发布湿度: {humidity}%")
+            
+            if batcher:
+                batcher.add("temperature", temperature)
+                batcher.add("humidity", humidity)
+            else:
+                client.publish(TOPIC_TEMPERATURE, str(temperature))
+                print(f"已发布温度: {temperature}°C")
+                client.publish(TOPIC_HUMIDITY, str(humidity))
+                print(f"已发布湿度: {humidity}%")
             
             time.sleep(5)  # 每5秒发送一次数据
         except KeyboardInterrupt:
@@ -91,24 +165,40 @@ def publish_sensor_data(client):
         except Exception as e:
             print(f"发布数据时出错: {e}")
             time.sleep(5)  # 出错后等待5秒再重试
+    if batcher:
+        # 退出前发送缓冲区中剩余的读数
+        batcher.stop()
+        stats = batcher.stats()
+        print(f"共发送 {stats['batches']} 批 {stats['readings']} 条读数, 平均每条 {stats['bytes_per_reading']:.1f} 字节")
 
 # 主函数
 def main():
-    client = create_mqtt_client()
-    if client:
-        # 启动网络循环
-        client.loop_start()
-        
-        try:
-            # 发布传感器数据
-            publish_sensor_data(client)
-        except KeyboardInterrupt:
-            print("程序被用户中断")
-        finally:
-            # 断开连接
-            client.loop_stop()
-            client.disconnect()
-            print("已断开MQTT连接")
+    client = create_mqtt_client(connect=False)
+    publisher = ReliablePublisher(
+        client, MQTT_BROKER, MQTT_PORT, MQTT_KEEPALIVE,
+        outbox_path=MQTT_OUTBOX_PATH,
+        outbox_bytes=MQTT_OUTBOX_MB * 1024 * 1024,
+        max_queue=MQTT_MAX_QUEUE,
+        max_inflight=MQTT_MAX_INFLIGHT
+    )
+    if len(publisher.outbox):
+        print(f"发件箱中有 {len(publisher.outbox)} 条上次未发出的消息，连接后重放")
+    # 启动网络循环，连接断开后按带抖动的指数退避自动重连
+    publisher.start()
+    
+    try:
+        # 发布传感器数据，断线期间的读数写入发件箱
+        publish_sensor_data(publisher)
+    except KeyboardInterrupt:
+        print("程序被用户中断")
+    finally:
+        # 断开连接，未发出的消息保留在发件箱中
+        publisher.stop()
+        print("已断开MQTT连接")
+        print(publisher.report())
+        if _dispatcher is not None:
+            _dispatcher.close()
+            print(_dispatcher.report())
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
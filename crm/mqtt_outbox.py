@@ -0,0 +1,446 @@
+import mmap
+import os
+import queue
+import random
+import struct
+import threading
+import time
+import zlib
+from collections import OrderedDict
+
+import paho.mqtt.client as mqtt
+
+# 可靠发布层：有界内存队列 + 断线时落盘的环形缓冲发件箱 + 带抖动退避的重连
+#
+# 生产者调用 ReliablePublisher.publish（接口与 client.publish 相同），消息先进入有界内存队列，
+# 队列满时生产者阻塞（背压）；发送线程在连接正常且发件箱为空时直接发布，
+# 断线或发件箱中还有积压时追加到发件箱，重新连接后按批次从发件箱重放
+# 已交给 paho 但还没写到套接字的消息（on_publish 尚未回调）在断线时重新写回发件箱，不会丢失；
+# 写回的同时从 paho 的发送队列中删除，重连后只由发件箱重放，paho 不会再重发一遍；
+# 已写到套接字但断线前没收到 PUBACK 的 QoS 1 消息仍会重放，代理可能收到两次（至少一次，不是恰好一次）；
+# 同时在途的消息数有上限，paho 内部的发送队列不会无限增长
+#
+# RingBufferOutbox 是内存映射的定长文件，只在尾部追加；写满时覆盖最旧的记录并计数，
+# 每条记录带 CRC32，进程崩溃后重新打开时丢弃写了一半的尾部记录
+
+OUTBOX_MAGIC = b"MQOB"
+OUTBOX_VERSION = 2
+# 版本 1 的标志字节只有 QoS，记录格式与版本 2 兼容，打开时升级文件头
+COMPATIBLE_VERSIONS = (1, 2)
+# magic, 版本, 数据区容量, 读位置, 写位置, 记录数, 覆盖丢弃的记录数（位置均为单调递增的绝对偏移）
+OUTBOX_HEADER = struct.Struct("<4sIQQQQQ")
+OUTBOX_HEADER_SIZE = 64
+# 记录头：主题 + 负载的长度, CRC32, 标志（低两位 QoS，RETAIN_FLAG 为 retain）, 主题长度
+RECORD_HEADER = struct.Struct("<IIBH")
+RETAIN_FLAG = 0x04
+
+
+def jittered_backoff(attempt, base=0.5, cap=30.0):
+    """全抖动指数退避：在 [0, min(cap, base * 2^attempt)] 内随机取值"""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+class RingBufferOutbox:
+    """定长的内存映射环形发件箱"""
+
+    def __init__(self, path, capacity_bytes=64 * 1024 * 1024, sync_every=256):
+        self.path = path
+        self.sync_every = sync_every
+        self._unsynced = 0
+        self.lock = threading.Lock()
+        exists = os.path.exists(path) and os.path.getsize(path) > OUTBOX_HEADER_SIZE
+        if not exists:
+            with open(path, "wb") as f:
+                f.truncate(OUTBOX_HEADER_SIZE + capacity_bytes)
+        self.file = open(path, "r+b")
+        self.mm = mmap.mmap(self.file.fileno(), 0)
+        if exists:
+            magic, version, capacity, head, tail, count, dropped = OUTBOX_HEADER.unpack_from(self.mm)
+            if magic != OUTBOX_MAGIC or version not in COMPATIBLE_VERSIONS:
+                raise ValueError(f"无法识别的发件箱文件: {path}")
+            # 已有文件沿用其容量
+            self.capacity, self.head, self.tail, self.count, self.dropped = capacity, head, tail, count, dropped
+            self.recovered = self._recover()
+        else:
+            self.capacity = capacity_bytes
+            self.head = self.tail = self.count = self.dropped = 0
+            self.recovered = 0
+            self._write_header()
+
+    def _write_header(self):
+        OUTBOX_HEADER.pack_into(self.mm, 0, OUTBOX_MAGIC, OUTBOX_VERSION, self.capacity,
+                                self.head, self.tail, self.count, self.dropped)
+
+    def _write(self, offset, data):
+        pos = offset % self.capacity
+        first = min(len(data), self.capacity - pos)
+        self.mm[OUTBOX_HEADER_SIZE + pos:OUTBOX_HEADER_SIZE + pos + first] = data[:first]
+        if first < len(data):
+            self.mm[OUTBOX_HEADER_SIZE:OUTBOX_HEADER_SIZE + len(data) - first] = data[first:]
+
+    def _read(self, offset, size):
+        pos = offset % self.capacity
+        first = min(size, self.capacity - pos)
+        data = self.mm[OUTBOX_HEADER_SIZE + pos:OUTBOX_HEADER_SIZE + pos + first]
+        if first < size:
+            data += self.mm[OUTBOX_HEADER_SIZE:OUTBOX_HEADER_SIZE + size - first]
+        return data
+
+    def _read_record(self, offset):
+        """返回 (记录总字节数, 主题, 负载, qos, retain)，校验失败返回 None"""
+        if self.tail - offset < RECORD_HEADER.size:
+            return None
+        length, crc, flags, topic_length = RECORD_HEADER.unpack(self._read(offset, RECORD_HEADER.size))
+        size = RECORD_HEADER.size + length
+        if topic_length > length or self.tail - offset < size:
+            return None
+        body = self._read(offset + RECORD_HEADER.size, length)
+        if zlib.crc32(body, flags) != crc:
+            return None
+        return size, body[:topic_length].decode("utf-8"), body[topic_length:], flags & 0x03, bool(flags & RETAIN_FLAG)
+
+    def _recover(self):
+        """从读位置逐条校验，截掉崩溃时没写完的尾部记录，返回丢弃的字节数"""
+        offset = self.head
+        count = 0
+        while offset < self.tail:
+            record = self._read_record(offset)
+            if record is None:
+                break
+            offset += record[0]
+            count += 1
+        truncated = self.tail - offset
+        self.tail = offset
+        self.count = count
+        self._write_header()
+        return truncated
+
+    def append(self, topic, payload, qos=0, retain=False):
+        if isinstance(payload, str):
+            payload = payload.encode("utf-8")
+        topic_bytes = topic.encode("utf-8")
+        body = topic_bytes + bytes(payload)
+        flags = qos | (RETAIN_FLAG if retain else 0)
+        record = RECORD_HEADER.pack(len(body), zlib.crc32(body, flags), flags, len(topic_bytes)) + body
+        if len(record) > self.capacity:
+            raise ValueError(f"消息大小 {len(record)} 字节超过发件箱容量")
+        with self.lock:
+            # 空间不足时覆盖最旧的记录
+            while self.capacity - (self.tail - self.head) < len(record):
+                length = RECORD_HEADER.unpack(self._read(self.head, RECORD_HEADER.size))[0]
+                self.head += RECORD_HEADER.size + length
+                self.count -= 1
+                self.dropped += 1
+            self._write(self.tail, record)
+            self.tail += len(record)
+            self.count += 1
+            self._write_header()
+            self._unsynced += 1
+            if self._unsynced >= self.sync_every:
+                self._sync()
+
+    def peek(self, max_records):
+        """从最旧的记录开始读取至多 max_records 条，返回 [((主题, 负载, qos, retain), 该记录之后的位置)]"""
+        records = []
+        with self.lock:
+            offset = self.head
+            while offset < self.tail and len(records) < max_records:
+                record = self._read_record(offset)
+                if record is None:
+                    break
+                offset += record[0]
+                records.append((record[1:], offset))
+        return records
+
+    def commit(self, offset, num_records):
+        """peek 返回的前 num_records 条记录已发出，把读位置前移到 offset"""
+        with self.lock:
+            # 读取之后被覆盖的部分不能重复扣减
+            if offset <= self.head:
+                return
+            self.head = offset
+            self.count = max(self.count - num_records, 0)
+            self._write_header()
+
+    def _sync(self):
+        self.mm.flush()
+        self._unsynced = 0
+
+    def flush(self):
+        with self.lock:
+            self._sync()
+
+    def close(self):
+        with self.lock:
+            self._sync()
+            self.mm.close()
+            self.file.close()
+
+    def __len__(self):
+        return self.count
+
+    @property
+    def depth_bytes(self):
+        return self.tail - self.head
+
+
+class ReliablePublisher:
+    """带背压、发件箱和自动重连的发布器，自己驱动 paho 的网络循环（不要再调用 loop_start）"""
+
+    def __init__(self, client, host, port=1883, keepalive=60, outbox_path="mqtt_outbox.bin",
+                 outbox_bytes=64 * 1024 * 1024, max_queue=1000, max_inflight=100, replay_batch=500,
+                 backoff_base=0.5, backoff_max=30.0):
+        self.client = client
+        self.host = host
+        self.port = port
+        self.keepalive = keepalive
+        self.outbox = RingBufferOutbox(outbox_path, outbox_bytes)
+        self.queue = queue.Queue(max_queue)
+        self.max_inflight = max_inflight
+        self.replay_batch = replay_batch
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+        self.cond = threading.Condition()
+        self.connected = False
+        self.pending = OrderedDict()
+        self._early_acks = set()
+        self._sending = False
+        # 每次断线加一，_send 据此发现发布期间发生的断线
+        self._session = 0
+        self._stop = threading.Event()
+        self._threads = []
+
+        self.reconnects = 0
+        self.connect_failures = 0
+        self.published = 0
+        self.spilled = 0
+        self.respilled = 0
+        self.replayed = 0
+        self.replay_seconds = 0.0
+        self.blocked_puts = 0
+        self.blocked_seconds = 0.0
+
+        # 保留 mqtt_client 设置的回调（如连接后订阅），在其后更新连接状态
+        self._user_on_connect = client.on_connect
+        self._user_on_disconnect = client.on_disconnect
+        client.on_connect = self._on_connect
+        client.on_disconnect = self._on_disconnect
+        client.on_publish = self._on_publish
+
+    def _on_connect(self, client, userdata, flags, rc):
+        if self._user_on_connect is not None:
+            self._user_on_connect(client, userdata, flags, rc)
+        if rc == 0:
+            with self.cond:
+                self.connected = True
+                self.cond.notify_all()
+
+    def _on_disconnect(self, client, userdata, rc):
+        self._mark_disconnected()
+        if self._user_on_disconnect is not None:
+            self._user_on_disconnect(client, userdata, rc)
+
+    def _on_publish(self, client, userdata, mid):
+        # QoS 0 在写入套接字后回调，QoS 1/2 在代理确认后回调
+        with self.cond:
+            # 只有正在 _send 中、还没登记到 pending 的那条消息会提前确认；
+            # 写回发件箱的消息已从 paho 删除，不会再有迟到的回调
+            if self.pending.pop(mid, None) is None and self._sending:
+                self._early_acks.add(mid)
+            self.cond.notify_all()
+
+    def _mark_disconnected(self):
+        """在网络线程中调用：断线时立即把在途消息写回发件箱，赶在 reconnect() 让 paho 重发之前"""
+        with self.cond:
+            was_connected = self.connected
+            self.connected = False
+            self.cond.notify_all()
+        if was_connected:
+            self._respill_pending()
+
+    def publish(self, topic, payload, qos=0, retain=False, timeout=None):
+        """放入内存队列；队列满时阻塞生产者，超过 timeout 秒抛出 queue.Full"""
+        if isinstance(payload, str):
+            payload = payload.encode("utf-8")
+        item = (topic, payload, qos, retain)
+        try:
+            self.queue.put_nowait(item)
+            return
+        except queue.Full:
+            pass
+        start = time.perf_counter()
+        try:
+            self.queue.put(item, timeout=timeout)
+        finally:
+            self.blocked_puts += 1
+            self.blocked_seconds += time.perf_counter() - start
+
+    def start(self):
+        for target, name in ((self._network_loop, "mqtt-network"), (self._sender_loop, "mqtt-sender")):
+            thread = threading.Thread(target=target, name=name, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def _network_loop(self):
+        attempt = 0
+        ever_connected = False
+        while not self._stop.is_set():
+            if not self.connected and not self._socket_open():
+                try:
+                    if ever_connected:
+                        self.client.reconnect()
+                        self.reconnects += 1
+                    else:
+                        self.client.connect(self.host, self.port, self.keepalive)
+                        ever_connected = True
+                except (OSError, ValueError) as e:
+                    self.connect_failures += 1
+                    delay = jittered_backoff(attempt, self.backoff_base, self.backoff_max)
+                    attempt += 1
+                    print(f"连接MQTT代理失败 ({e})，{delay:.1f} 秒后重试，发件箱积压 {len(self.outbox)} 条")
+                    self._stop.wait(delay)
+                    continue
+            rc = self.client.loop(timeout=0.1)
+            if rc == mqtt.MQTT_ERR_SUCCESS:
+                if self.connected:
+                    attempt = 0
+            else:
+                self._mark_disconnected()
+                self._stop.wait(jittered_backoff(attempt, self.backoff_base, self.backoff_max))
+                attempt += 1
+
+    def _socket_open(self):
+        return self.client.socket() is not None
+
+    def _spill(self, item):
+        self.outbox.append(*item)
+        self.spilled += 1
+
+    def _discard_client_messages(self, mids):
+        """从 paho 的 _out_messages 中删除这些消息，重连后 paho 不再重发，也不再回调 on_publish
+
+        不能在持有 self.cond 时调用：paho 在持有 _out_message_mutex 时回调 on_publish
+        """
+        out_messages = getattr(self.client, "_out_messages", None)
+        if not mids or out_messages is None:
+            return
+        with self.client._out_message_mutex:
+            for mid in mids:
+                out_messages.pop(mid, None)
+
+    def _respill_pending(self):
+        """断线时把尚未写出的在途消息写回发件箱，并从 paho 的发送队列中删除，避免重连后送达两次"""
+        with self.cond:
+            items = list(self.pending.items())
+            self.pending.clear()
+            self._early_acks.clear()
+            self._session += 1
+        self._discard_client_messages([mid for mid, _ in items])
+        for _, item in items:
+            self.outbox.append(*item)
+        self.respilled += len(items)
+
+    def _send(self, item):
+        """等待在途数降到上限以下后发布，成功返回 True；断线或被拒绝返回 False"""
+        with self.cond:
+            # 停止阶段网络线程已退出，不再等待 on_publish
+            while self.connected and len(self.pending) >= self.max_inflight and not self._stop.is_set():
+                self.cond.wait(0.1)
+            if not self.connected:
+                return False
+            session = self._session
+            self._sending = True
+            self._early_acks.clear()
+        try:
+            info = self.client.publish(*item)
+        except Exception:
+            with self.cond:
+                self._sending = False
+            raise
+        with self.cond:
+            self._sending = False
+            acked = info.mid in self._early_acks
+            self._early_acks.clear()
+            # 发布期间断线时在途消息已经写回发件箱，这条也交给调用方写回
+            sent = acked or (info.rc == mqtt.MQTT_ERR_SUCCESS and session == self._session)
+            if sent and not acked:
+                self.pending[info.mid] = item
+        if not sent:
+            # 未连接时 QoS 1/2 的消息仍留在 paho 的 _out_messages 中，删除后只由发件箱重放
+            self._discard_client_messages([info.mid])
+            return False
+        self.published += 1
+        return True
+
+    def _replay(self):
+        """按批次重放发件箱，遇到断线时停止"""
+        while self.connected and len(self.outbox) and not self._stop.is_set():
+            start = time.perf_counter()
+            records = self.outbox.peek(self.replay_batch)
+            sent = 0
+            for item, _ in records:
+                if not self._send(item):
+                    break
+                sent += 1
+            if sent:
+                self.outbox.commit(records[sent - 1][1], sent)
+            self.replayed += sent
+            self.replay_seconds += time.perf_counter() - start
+            if sent < len(records):
+                return
+
+    def _sender_loop(self):
+        # 断线时的写回由网络线程在 _mark_disconnected 中完成
+        while not (self._stop.is_set() and self.queue.empty()):
+            try:
+                item = self.queue.get(timeout=0.1)
+            except queue.Empty:
+                item = None
+            connected = self.connected
+
+            if item is not None:
+                # 发件箱有积压时新消息也排到后面，保证按顺序送达
+                if not (connected and not len(self.outbox) and self._send(item)):
+                    self._spill(item)
+            if connected and len(self.outbox):
+                self._replay()
+
+    def stop(self, timeout=10.0):
+        """发送完内存队列（连不上时写入发件箱）后停止，发件箱落盘"""
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        # 停止时仍未写出的在途消息也保存到发件箱，下次启动时重放
+        self._respill_pending()
+        try:
+            self.client.disconnect()
+        except Exception:
+            pass
+        self.outbox.close()
+
+    def stats(self):
+        return {
+            "connected": self.connected,
+            "queue_depth": self.queue.qsize(),
+            "inflight": len(self.pending),
+            "outbox_records": len(self.outbox),
+            "outbox_bytes": self.outbox.depth_bytes,
+            "outbox_dropped": self.outbox.dropped,
+            "published": self.published,
+            "spilled": self.spilled,
+            "respilled": self.respilled,
+            "replayed": self.replayed,
+            "replay_per_sec": self.replayed / self.replay_seconds if self.replay_seconds else 0.0,
+            "reconnects": self.reconnects,
+            "connect_failures": self.connect_failures,
+            "blocked_puts": self.blocked_puts,
+            "blocked_seconds": self.blocked_seconds,
+        }
+
+    def report(self):
+        s = self.stats()
+        return (f"发布: 已发出 {s['published']} 条, 写入发件箱 {s['spilled']} 条 (在途写回 {s['respilled']} 条), "
+                f"重放 {s['replayed']} 条 ({s['replay_per_sec']:.0f} 条/秒), "
+                f"发件箱积压 {s['outbox_records']} 条/{s['outbox_bytes'] / 1024:.1f} KB (覆盖丢弃 {s['outbox_dropped']} 条), "
+                f"重连 {s['reconnects']} 次, 背压阻塞 {s['blocked_puts']} 次/{s['blocked_seconds']:.2f} 秒")
@@ -0,0 +1,128 @@
+import argparse
+import json
+import os
+
+import numpy as np
+
+from embedding import MODEL_NAME
+
+# ONNX Runtime 推理后端
+# 把 MiniLM 模型导出为 ONNX（可选 int8 动态量化），在纯 CPU 的边缘设备上替代 PyTorch 推理，
+# OnnxEmbedder.encode 与 SentenceTransformer.encode 接口一致，可直接用于 text_to_vector 和批量接口
+
+ONNX_MODEL_DIR = os.environ.get("ONNX_MODEL_DIR", "onnx_model")
+MODEL_FILE = "model.onnx"
+QUANTIZED_MODEL_FILE = "model.int8.onnx"
+CONFIG_FILE = "embedding_config.json"
+
+
+def export_onnx(output_dir=ONNX_MODEL_DIR, model_name=MODEL_NAME, quantize=True, opset=14):
+    """导出 Transformer 主干为 ONNX，池化在 NumPy 中完成；quantize=True 时额外生成 int8 模型"""
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    os.makedirs(output_dir, exist_ok=True)
+    st_model = SentenceTransformer(model_name, device="cpu")
+    transformer = st_model[0].auto_model.eval()
+    tokenizer = st_model.tokenizer
+
+    dummy = tokenizer(["智能家居", "Matter协议是什么"], padding=True, return_tensors="pt")
+    model_path = os.path.join(output_dir, MODEL_FILE)
+    with torch.no_grad():
+        torch.onnx.export(
+            transformer,
+            (dummy["input_ids"], dummy["attention_mask"]),
+            model_path,
+            input_names=["input_ids", "attention_mask"],
+            output_names=["last_hidden_state"],
+            dynamic_axes={
+                "input_ids": {0: "batch", 1: "sequence"},
+                "attention_mask": {0: "batch", 1: "sequence"},
+                "last_hidden_state": {0: "batch", 1: "sequence"},
+            },
+            opset_version=opset
+        )
+    tokenizer.save_pretrained(output_dir)
+    with open(os.path.join(output_dir, CONFIG_FILE), "w", encoding="utf-8") as f:
+        json.dump({
+            "model_name": model_name,
+            "max_length": st_model.max_seq_length,
+            "dimension": st_model.get_sentence_embedding_dimension(),
+        }, f, ensure_ascii=False, indent=2)
+
+    if quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+        quantize_dynamic(model_path, os.path.join(output_dir, QUANTIZED_MODEL_FILE), weight_type=QuantType.QInt8)
+    print(f"ONNX 模型已导出到 {output_dir}")
+
+
+class OnnxEmbedder:
+    """与 SentenceTransformer.encode 兼容的 ONNX Runtime 向量模型"""
+
+    def __init__(self, model_dir=ONNX_MODEL_DIR, quantized=True, intra_op_threads=None, inter_op_threads=1):
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+
+        with open(os.path.join(model_dir, CONFIG_FILE), encoding="utf-8") as f:
+            config = json.load(f)
+        self.max_length = config["max_length"]
+        self.dimension = config["dimension"]
+        self.quantized = quantized
+        self.tokenizer = AutoTokenizer.from_pretrained(model_dir)
+
+        options = ort.SessionOptions()
+        # 单个请求内并行（intra-op）用满核心，算子间并行（inter-op）对这类串行图帮助不大
+        options.intra_op_num_threads = intra_op_threads or os.cpu_count() or 1
+        options.inter_op_num_threads = inter_op_threads
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        model_file = QUANTIZED_MODEL_FILE if quantized else MODEL_FILE
+        self.session = ort.InferenceSession(
+            os.path.join(model_dir, model_file),
+            options,
+            providers=["CPUExecutionProvider"]
+        )
+        self.input_names = {i.name for i in self.session.get_inputs()}
+
+    def get_sentence_embedding_dimension(self):
+        return self.dimension
+
+    def _encode_batch(self, texts):
+        tokens = self.tokenizer(
+            texts,
+            padding=True,
+            truncation=True,
+            max_length=self.max_length,
+            return_tensors="np"
+        )
+        feeds = {k: v.astype(np.int64) for k, v in tokens.items() if k in self.input_names}
+        hidden = self.session.run(None, feeds)[0]
+        # 与 SentenceTransformer 的池化层一致：按 attention mask 求平均
+        mask = tokens["attention_mask"][..., None].astype(np.float32)
+        return (hidden * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9)
+
+    def encode(self, sentences, batch_size=32, convert_to_numpy=True, show_progress_bar=False, **kwargs):
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        if not texts:
+            return np.empty((0, self.dimension), dtype=np.float32)
+
+        # 按长度排序后分批，减少同一批次内的填充
+        order = np.argsort([-len(t) for t in texts], kind="stable")
+        output = np.empty((len(texts), self.dimension), dtype=np.float32)
+        for start in range(0, len(texts), batch_size):
+            indices = order[start:start + batch_size]
+            output[indices] = self._encode_batch([texts[i] for i in indices])
+        return output[0] if single else output
+
+
+def main():
+    parser = argparse.ArgumentParser(description="导出 ONNX 向量模型")
+    parser.add_argument("--output-dir", default=ONNX_MODEL_DIR)
+    parser.add_argument("--no-quantize", action="store_true")
+    args = parser.parse_args()
+    export_onnx(args.output_dir, quantize=not args.no_quantize)
+
+
+if __name__ == "__main__":
+    main()
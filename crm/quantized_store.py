@@ -0,0 +1,195 @@
+import numpy as np
+
+# 紧凑向量存储：第一阶段在量化后的向量上检索，
+# 候选结果再用内存映射侧文件中的全精度向量重排
+#
+# 每百万条 384 维向量的第一阶段内存占用（不含主键）：
+#   float32 原始向量   1536 MB
+#   float16             768 MB  (1/2)
+#   int8 标量量化       384 MB  (1/4)
+#   二值 (Hamming)       48 MB  (1/32)
+# 全精度向量只保存在磁盘侧文件中，重排时按需读取候选行。
+# 本地检索后端设置 LOCAL_QUANTIZATION 时用同样的方式粗排，全精度向量取自集合自身的向量矩阵。
+#
+# 召回率影响（bench_quantized.py 默认参数，5 万条 384 维聚类合成向量，recall@10）：
+#   float16             重排倍数 1: 1.000   4: 1.000
+#   int8                重排倍数 1: 0.976   4: 1.000
+#   二值                重排倍数 1: 0.037   4: 0.114   16: 0.252
+# 二值量化只适合作为超大规模下的预筛选，需配合较大的 rerank_factor；
+# 默认推荐 int8 + rerank_factor=4
+
+MODES = ("float16", "int8", "binary")
+# 粗排时每次只把这么多行量化向量转换为 float32，避免临时还原出整个全精度矩阵
+SCORE_BLOCK_ROWS = 65536
+
+# 0-255 每个字节中 1 的个数，用于计算 Hamming 距离
+POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+def normalize(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    return vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+
+
+class ScalarQuantizer:
+    """按维度的 int8 标量量化：每一维用各自的最小值和步长线性映射到 [-128, 127]"""
+
+    def __init__(self, low, high):
+        self.low = low.astype(np.float32)
+        self.scale = np.maximum(high - low, 1e-12).astype(np.float32) / 255.0
+
+    @classmethod
+    def fit(cls, vectors):
+        return cls(vectors.min(axis=0), vectors.max(axis=0))
+
+    def encode(self, vectors):
+        codes = np.rint((vectors - self.low) / self.scale) - 128
+        return np.clip(codes, -128, 127).astype(np.int8)
+
+    def decode(self, codes):
+        return (codes.astype(np.float32) + 128) * self.scale + self.low
+
+
+def binarize(vectors):
+    """按符号位二值化并打包，每 8 维占 1 字节"""
+    return np.packbits(vectors > 0, axis=1)
+
+
+def hamming_distances(query_codes, codes):
+    """(nq, n) 的 Hamming 距离矩阵，逐条查询计算以限制临时内存"""
+    distances = np.empty((len(query_codes), len(codes)), dtype=np.int32)
+    for i, query in enumerate(query_codes):
+        distances[i] = POPCOUNT[np.bitwise_xor(codes, query)].sum(axis=1, dtype=np.int32)
+    return distances
+
+
+class FullPrecisionStore:
+    """全精度向量侧文件：追加写入，读取时使用只读内存映射
+
+    侧文件属于创建它的索引，行号与索引中的顺序一一对应，创建时清空已存在的同名文件
+    """
+
+    def __init__(self, path, dim):
+        self.path = path
+        self.dim = dim
+        open(path, "wb").close()
+        self.size = 0
+        self._mapped = None
+
+    def append(self, vectors):
+        with open(self.path, "ab") as f:
+            f.write(np.ascontiguousarray(vectors, dtype=np.float32).tobytes())
+        self.size += len(vectors)
+        self._mapped = None
+
+    def rows(self, indices):
+        if self._mapped is None:
+            self._mapped = np.memmap(self.path, dtype=np.float32, mode="r", shape=(self.size, self.dim))
+        return np.asarray(self._mapped[indices])
+
+
+class ArrayStore:
+    """以已有的向量矩阵（可以是只读内存映射）作为全精度存储，重排时读取候选行并归一化"""
+
+    def __init__(self, vectors):
+        self.vectors = vectors
+
+    def append(self, vectors):
+        # 向量已经在矩阵中
+        pass
+
+    def rows(self, indices):
+        return normalize(self.vectors[indices])
+
+
+class QuantizedVectorIndex:
+    """量化向量的两阶段检索：量化向量粗排取 k * rerank_factor 个候选，全精度向量精排
+
+    向量在写入前做 L2 归一化，按余弦相似度排序。
+    int8 模式的量化参数在第一次 add 时根据该批数据拟合，之后的数据沿用。
+    全精度向量默认写入 full_path 侧文件；传入 store（如 ArrayStore）时由调用方保存。
+    """
+
+    def __init__(self, dim, mode="int8", full_path="full_vectors.f32", rerank_factor=4, store=None):
+        if mode not in MODES:
+            raise ValueError(f"不支持的量化方式: {mode}")
+        self.dim = dim
+        self.mode = mode
+        self.rerank_factor = rerank_factor
+        self.store = store if store is not None else FullPrecisionStore(full_path, dim)
+        self.quantizer = None
+        self.code_chunks = []
+        self._codes = None
+        self.ids = np.empty(0, dtype=np.int64)
+
+    def _encode(self, vectors):
+        if self.mode == "float16":
+            return vectors.astype(np.float16)
+        if self.mode == "int8":
+            return self.quantizer.encode(vectors)
+        return binarize(vectors)
+
+    @property
+    def codes(self):
+        if self._codes is None:
+            self._codes = np.concatenate(self.code_chunks) if self.code_chunks else None
+            self.code_chunks = [self._codes] if self._codes is not None else []
+        return self._codes
+
+    def add(self, ids, vectors):
+        vectors = normalize(vectors)
+        if self.mode == "int8" and self.quantizer is None:
+            self.quantizer = ScalarQuantizer.fit(vectors)
+        self.code_chunks.append(self._encode(vectors))
+        self._codes = None
+        self.ids = np.concatenate([self.ids, np.asarray(ids, dtype=np.int64)])
+        self.store.append(vectors)
+
+    def memory_bytes(self):
+        """第一阶段常驻内存的字节数（量化向量 + 主键）"""
+        codes = self.codes
+        return (codes.nbytes if codes is not None else 0) + self.ids.nbytes
+
+    def _coarse_scores(self, queries):
+        codes = self.codes
+        if self.mode == "binary":
+            return -hamming_distances(binarize(queries), codes).astype(np.float32)
+
+        if self.mode == "int8":
+            # q·decode(c) = (q*scale)·c + q·(128*scale + low)，直接在量化值上计算
+            weights = queries * self.quantizer.scale
+            offset = queries @ (128 * self.quantizer.scale + self.quantizer.low)
+        else:
+            weights = queries
+            offset = 0.0
+        scores = np.empty((len(queries), len(codes)), dtype=np.float32)
+        for start in range(0, len(codes), SCORE_BLOCK_ROWS):
+            block = codes[start:start + SCORE_BLOCK_ROWS].astype(np.float32)
+            scores[:, start:start + len(block)] = weights @ block.T
+        if self.mode == "int8":
+            scores += offset[:, None]
+        return scores
+
+    def search(self, queries, k=10, rerank_factor=None):
+        """返回 (ids, scores)，形状均为 (nq, k)"""
+        queries = normalize(np.atleast_2d(queries))
+        n = len(self.ids)
+        k = min(k, n)
+        candidates = min(n, k * (rerank_factor or self.rerank_factor))
+
+        scores = self._coarse_scores(queries)
+        if candidates < n:
+            top = np.argpartition(-scores, candidates - 1, axis=1)[:, :candidates]
+        else:
+            top = np.tile(np.arange(n), (len(queries), 1))
+
+        result_ids = np.empty((len(queries), k), dtype=np.int64)
+        result_scores = np.empty((len(queries), k), dtype=np.float32)
+        for i, (query, rows) in enumerate(zip(queries, top)):
+            # 只读取候选行的全精度向量
+            rows = np.sort(rows)
+            exact = self.store.rows(rows) @ query
+            order = np.argsort(-exact)[:k]
+            result_ids[i] = self.ids[rows[order]]
+            result_scores[i] = exact[order]
+        return result_ids, result_scores
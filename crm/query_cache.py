@@ -0,0 +1,128 @@
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+# 检索结果缓存：按 (规范化后的问题, top_k, 语料版本号) 缓存 retrieve_relevant_docs 的结果，
+# 命中时跳过向量化和向量搜索
+# 本进程内的每次写入（store_documents / 增量同步 / 流式导入）都会调用 bump() 递增版本号，
+# 旧版本的结果不会再被返回；内存占用由条目数上限（LRU 淘汰）和过期时间（TTL）共同限制
+#
+# 其他进程写入集合时本进程收不到 bump()：传入 version_source 后，每隔 check_interval 秒
+# 读取一次集合的指纹（如行数），变化时同样使缓存失效。行数不变的改动（同时新增和删除相同数量的块）
+# 察觉不到，这类改动最多在 TTL 之后生效
+
+TRAILING_PUNCTUATION = "？?。.！!，,；;～~ "
+WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_query(text):
+    """全角转半角、统一大小写、合并空白并去掉句末标点，"Matter协议是什么？" 与 "matter协议是什么" 视为同一问题"""
+    text = unicodedata.normalize("NFKC", text).lower()
+    return WHITESPACE.sub(" ", text).strip().rstrip(TRAILING_PUNCTUATION)
+
+
+class QueryCache:
+    """线程安全的 LRU + TTL 结果缓存，max_entries 为 0 时不缓存"""
+
+    def __init__(self, max_entries=1024, ttl=60.0, clock=time.monotonic, version_source=None, check_interval=1.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.clock = clock
+        self.version = 0
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.version_source = version_source
+        self.check_interval = check_interval
+        self._fingerprint = None
+        self._checked_at = None
+
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def key(self, query, top_k, version=None):
+        return (normalize_query(query), top_k, self.version if version is None else version)
+
+    def refresh(self):
+        """距上次检查超过 check_interval 时读取 version_source，指纹变化说明语料被其他写入方修改"""
+        if self.version_source is None:
+            return
+        now = self.clock()
+        with self.lock:
+            if self._checked_at is not None and now - self._checked_at < self.check_interval:
+                return
+            self._checked_at = now
+        try:
+            fingerprint = self.version_source()
+        except Exception:
+            # 读取失败（如集合尚不存在）时不影响检索，下次再检查
+            return
+        changed = self._fingerprint is not None and fingerprint != self._fingerprint
+        self._fingerprint = fingerprint
+        if changed:
+            self.bump()
+
+    def get(self, query, top_k):
+        """返回缓存的文档列表（副本），未命中或已过期返回 None"""
+        if not self.max_entries:
+            return None
+        self.refresh()
+        key = self.key(query, top_k)
+        now = self.clock()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and self.ttl and now - entry[0] > self.ttl:
+                del self.entries[key]
+                self.expired += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+        return [dict(doc) for doc in entry[1]]
+
+    def put(self, query, top_k, docs, version):
+        """version 为开始检索前读取的版本号，检索期间语料有更新时丢弃这次的结果"""
+        if not self.max_entries:
+            return
+        key = self.key(query, top_k, version)
+        with self.lock:
+            if version != self.version:
+                return
+            self.entries[key] = (self.clock(), [dict(doc) for doc in docs])
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def bump(self):
+        """语料发生变化：递增版本号并清空已缓存的结果"""
+        with self.lock:
+            self.version += 1
+            self.invalidations += 1
+            self.entries.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "lookups": lookups,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "expired": self.expired,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "size": len(self.entries),
+            "version": self.version,
+        }
+
+    def report(self):
+        s = self.stats()
+        return (f"检索结果缓存: 命中率 {s['hit_rate']:.1%} (命中 {s['hits']}, 未命中 {s['misses']}), "
+                f"{s['size']} 条, 过期 {s['expired']} 次, 淘汰 {s['evictions']} 次, "
+                f"语料版本 {s['version']} (失效 {s['invalidations']} 次)")
@@ -0,0 +1,166 @@
+import asyncio
+import time
+
+import milvus_rag_demo as rag
+import resources
+
+# 异步 RAG 服务：并发请求在很短的时间窗口内合并成一批，
+# 共用一次 model.encode 批量编码和一次多向量搜索
+
+
+class MicroBatcher:
+    """动态微批处理：攒够 max_batch_size 个请求或等待超过 max_wait_ms 即发出一批"""
+
+    def __init__(self, batch_fn, max_batch_size=32, max_wait_ms=5.0, max_inflight=1):
+        # batch_fn 是同步函数，接收请求列表并按相同顺序返回结果列表
+        self.batch_fn = batch_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.queue = None
+        self.inflight = None
+        self.max_inflight = max_inflight
+        self.task = None
+        self.pending = set()
+        # 正在攒批、尚未交给 _run 的请求，停止时需要处理
+        self.collecting = []
+        self.closed = False
+        self.batch_sizes = []
+
+    async def start(self):
+        self.queue = asyncio.Queue()
+        self.inflight = asyncio.Semaphore(self.max_inflight)
+        self.task = asyncio.create_task(self._collect())
+
+    async def stop(self):
+        """停止攒批，已提交的请求全部处理完再返回，之后的 submit 直接报错"""
+        self.closed = True
+        if self.task:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+        # 攒了一半的批次和队列中剩余的请求照常处理，不让调用方一直等待
+        leftover = self.collecting
+        self.collecting = []
+        while self.queue is not None and not self.queue.empty():
+            leftover.append(self.queue.get_nowait())
+        for start in range(0, len(leftover), self.max_batch_size):
+            await self.inflight.acquire()
+            await self._run(leftover[start:start + self.max_batch_size])
+        if self.pending:
+            await asyncio.gather(*self.pending, return_exceptions=True)
+
+    async def submit(self, item):
+        if self.closed:
+            raise RuntimeError("MicroBatcher 已停止")
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((item, future))
+        return await future
+
+    async def _collect(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = self.collecting = [await self.queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                # 先取走已经排队的请求，再在剩余时间窗口内等待新请求
+                if not self.queue.empty():
+                    batch.append(self.queue.get_nowait())
+                    continue
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            await self.inflight.acquire()
+            task = asyncio.create_task(self._run(batch))
+            self.collecting = []
+            self.pending.add(task)
+            task.add_done_callback(self.pending.discard)
+
+    async def _run(self, batch):
+        try:
+            self.batch_sizes.append(len(batch))
+            items = [item for item, _ in batch]
+            try:
+                results = list(await asyncio.to_thread(self.batch_fn, items))
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                return
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+            # batch_fn 返回的结果少于请求数时，多出的请求不能一直挂起
+            if len(results) < len(batch):
+                error = RuntimeError(f"batch_fn 返回 {len(results)} 个结果，请求有 {len(batch)} 个")
+                for _, future in batch[len(results):]:
+                    if not future.done():
+                        future.set_exception(error)
+        finally:
+            self.inflight.release()
+
+    def stats(self):
+        sizes = self.batch_sizes
+        return {
+            "batches": len(sizes),
+            "requests": sum(sizes),
+            "avg_batch_size": sum(sizes) / len(sizes) if sizes else 0.0,
+            "max_batch_size": max(sizes) if sizes else 0,
+        }
+
+
+class AsyncRAGServer:
+    """rag_system 的异步前端"""
+
+    def __init__(self, top_k=3, max_batch_size=32, max_wait_ms=5.0, max_inflight=1,
+                 retrieve_many=None, generate_answer=None, warm_up=False):
+        retrieve_many = retrieve_many or rag.retrieve_many
+        self.generate_answer = generate_answer or rag.generate_answer
+        self.warm_up = warm_up
+        self.batcher = MicroBatcher(
+            lambda queries: retrieve_many(queries, top_k),
+            max_batch_size,
+            max_wait_ms,
+            max_inflight
+        )
+
+    async def start(self):
+        # 预热放在启动阶段，避免第一批请求承担模型加载和连接的耗时
+        if self.warm_up:
+            await asyncio.to_thread(resources.warm_up, rag.COLLECTION_NAME)
+        await self.batcher.start()
+
+    async def stop(self):
+        await self.batcher.stop()
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.stop()
+
+    async def rag_system(self, query):
+        """与 rag_system 返回相同的结构，但不打印过程信息"""
+        start_time = time.perf_counter()
+        relevant_docs = await self.batcher.submit(query)
+        retrieval_time = time.perf_counter() - start_time
+
+        start_time = time.perf_counter()
+        # 生成是阻塞调用（流式后端逐 token 等待），放到线程中执行，不阻塞其他请求的检索和生成
+        answer = await asyncio.to_thread(self.generate_answer, query, relevant_docs)
+        generation_time = time.perf_counter() - start_time
+
+        return {
+            "query": query,
+            "relevant_docs": relevant_docs,
+            "answer": answer,
+            "retrieval_time": retrieval_time,
+            "generation_time": generation_time
+        }
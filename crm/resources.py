@@ -0,0 +1,89 @@
+import os
+import threading
+
+from embedding import MODEL_NAME
+
+# 进程内共享的重量级资源：向量模型、检索客户端和向量缓存
+# 全部延迟到第一次使用时才创建，导入 process_documents 这类工具函数时
+# 不再需要加载模型或连接 Milvus 服务器
+
+EMBEDDING_DIM = 384  # paraphrase-multilingual-MiniLM-L12-v2 的输出维度
+
+# 向量化后端：torch（SentenceTransformer，默认）、onnx（ONNX fp32）、onnx-int8（int8 量化），
+# 或 hash（确定性的伪向量，离线基准和测试用）
+EMBEDDING_BACKEND = os.environ.get("EMBEDDING_BACKEND", "torch")
+
+_lock = threading.Lock()
+_model = None
+_client = None
+_embedding_cache = None
+
+
+def load_model(backend=None, model_name=MODEL_NAME, num_threads=None):
+    """按向量化后端新建一个模型实例；num_threads 限制推理线程数，供多进程编码的工作进程使用"""
+    backend = backend or EMBEDDING_BACKEND
+    if backend == "torch":
+        from sentence_transformers import SentenceTransformer
+        if not num_threads:
+            return SentenceTransformer(model_name)
+        import torch
+        torch.set_num_threads(num_threads)
+        return SentenceTransformer(model_name, device="cpu")
+    if backend in ("onnx", "onnx-int8"):
+        from onnx_embedding import OnnxEmbedder
+        return OnnxEmbedder(quantized=backend == "onnx-int8", intra_op_threads=num_threads)
+    if backend == "hash":
+        from embedding import HashEmbedder
+        return HashEmbedder(EMBEDDING_DIM)
+    raise ValueError(f"未知的向量化后端: {backend}")
+
+
+def get_model():
+    """返回共享的向量模型，首次调用时加载"""
+    global _model
+    if _model is None:
+        with _lock:
+            if _model is None:
+                _model = load_model()
+    return _model
+
+
+def embedding_model_id():
+    """缓存键使用的模型标识，不同推理后端的输出略有差异，缓存需要分开"""
+    if EMBEDDING_BACKEND == "torch":
+        return MODEL_NAME
+    return f"{MODEL_NAME}:{EMBEDDING_BACKEND}"
+
+
+def get_client():
+    """返回共享的检索客户端，首次调用时按 VECTOR_BACKEND 创建"""
+    global _client
+    if _client is None:
+        with _lock:
+            if _client is None:
+                from vector_backend import create_client
+                _client = create_client()
+    return _client
+
+
+def get_embedding_cache():
+    """返回共享的向量缓存，目录由 EMBEDDING_CACHE_DIR 指定，空字符串表示只用内存"""
+    global _embedding_cache
+    if _embedding_cache is None:
+        with _lock:
+            if _embedding_cache is None:
+                from embedding_cache import EmbeddingCache
+                _embedding_cache = EmbeddingCache(
+                    embedding_model_id(),
+                    EMBEDDING_DIM,
+                    cache_dir=os.environ.get("EMBEDDING_CACHE_DIR", ".embedding_cache")
+                )
+    return _embedding_cache
+
+
+def warm_up(collection_name=None):
+    """服务启动时预热：加载模型并完成一次编码，连接后端并加载集合"""
+    get_model().encode(["预热"], show_progress_bar=False)
+    client = get_client()
+    if collection_name and client.has_collection(collection_name):
+        client.load_collection(collection_name)
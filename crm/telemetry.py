@@ -0,0 +1,219 @@
+import math
+import numbers
+import struct
+import threading
+import time
+
+# 批量传感器遥测：缓冲多个传感器的读数，按时间间隔或条数上限合并成一条 MQTT 消息，
+# 使用紧凑的二进制编码，订阅端用 decode_batch 还原
+#
+# 批次格式（整数均为 LEB128 变长编码，有符号数先做 zigzag）：
+#   magic "T" | 版本 1B | 小数位数 1B | 起始时间戳毫秒 8B (<Q)
+#   传感器数 | 每个传感器名: 长度 + UTF-8
+#   读数条数 | 每条读数: 传感器序号, 与上一条的时间差(毫秒, 有符号), 数值 * 10^小数位数(有符号)
+# 温湿度这类一位小数的读数每条约 4-5 字节，原来每个读数单独一条文本消息，连同主题约 35 字节
+
+MAGIC = b"T"
+VERSION = 1
+HEADER = struct.Struct("<cBBQ")
+DEFAULT_DECIMALS = 1
+# zigzag 编码按 64 位有符号整数处理
+INT64_LIMIT = 1 << 63
+
+
+def write_uvarint(out, value):
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def read_uvarint(data, pos):
+    result = 0
+    shift = 0
+    while True:
+        if pos >= len(data) or shift > 63:
+            raise ValueError("遥测批次已截断或变长整数过长")
+        byte = data[pos]
+        pos += 1
+        result |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return result, pos
+        shift += 7
+
+
+def zigzag(value):
+    return (value << 1) ^ (value >> 63)
+
+
+def unzigzag(value):
+    return (value >> 1) ^ -(value & 1)
+
+
+def validate_reading(sensor, timestamp, value, decimals=DEFAULT_DECIMALS):
+    """检查一条读数能否编码：传感器名为字符串，时间戳和数值为有限数且不超出 64 位范围"""
+    if not isinstance(sensor, str):
+        raise ValueError(f"传感器名必须是字符串: {sensor!r}")
+    for name, number in (("时间戳", timestamp), ("数值", value)):
+        if isinstance(number, bool) or not isinstance(number, numbers.Real) or not math.isfinite(number):
+            raise ValueError(f"{sensor} 的{name}不是有限数: {number!r}")
+    if not 0 <= timestamp * 1000 < INT64_LIMIT:
+        raise ValueError(f"{sensor} 的时间戳超出范围: {timestamp!r}")
+    if abs(value) * 10 ** decimals >= INT64_LIMIT:
+        raise ValueError(f"{sensor} 的数值超出范围: {value!r}")
+
+
+def encode_batch(readings, decimals=DEFAULT_DECIMALS):
+    """readings 为 (传感器名, 时间戳秒, 数值) 列表，返回二进制批次"""
+    if not readings:
+        raise ValueError("批次中没有读数")
+    scale = 10 ** decimals
+    sensor_index = {}
+    for sensor, _, _ in readings:
+        sensor_index.setdefault(sensor, len(sensor_index))
+
+    base_ms = int(round(readings[0][1] * 1000))
+    out = bytearray(HEADER.pack(MAGIC, VERSION, decimals, base_ms))
+    write_uvarint(out, len(sensor_index))
+    for sensor in sensor_index:
+        name = sensor.encode("utf-8")
+        write_uvarint(out, len(name))
+        out += name
+
+    write_uvarint(out, len(readings))
+    previous_ms = base_ms
+    for sensor, timestamp, value in readings:
+        timestamp_ms = int(round(timestamp * 1000))
+        write_uvarint(out, sensor_index[sensor])
+        write_uvarint(out, zigzag(timestamp_ms - previous_ms))
+        write_uvarint(out, zigzag(int(round(value * scale))))
+        previous_ms = timestamp_ms
+    return bytes(out)
+
+
+def decode_batch(payload):
+    """encode_batch 的逆操作，返回 (传感器名, 时间戳秒, 数值) 列表；负载截断或损坏时抛出 ValueError"""
+    if len(payload) < HEADER.size:
+        raise ValueError(f"遥测批次过短: {len(payload)} 字节")
+    magic, version, decimals, base_ms = HEADER.unpack_from(payload)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f"无法识别的遥测批次: magic={magic!r}, version={version}")
+    scale = 10 ** decimals
+    pos = HEADER.size
+    num_sensors, pos = read_uvarint(payload, pos)
+    sensors = []
+    for _ in range(num_sensors):
+        length, pos = read_uvarint(payload, pos)
+        if pos + length > len(payload):
+            raise ValueError("遥测批次已截断")
+        try:
+            sensors.append(bytes(payload[pos:pos + length]).decode("utf-8"))
+        except UnicodeDecodeError as e:
+            raise ValueError(f"传感器名不是有效的 UTF-8: {e}") from None
+        pos += length
+
+    count, pos = read_uvarint(payload, pos)
+    readings = []
+    timestamp_ms = base_ms
+    for _ in range(count):
+        index, pos = read_uvarint(payload, pos)
+        delta, pos = read_uvarint(payload, pos)
+        value, pos = read_uvarint(payload, pos)
+        if index >= len(sensors):
+            raise ValueError(f"传感器序号越界: {index}")
+        timestamp_ms += unzigzag(delta)
+        readings.append((sensors[index], timestamp_ms / 1000, unzigzag(value) / scale))
+    if pos != len(payload):
+        raise ValueError(f"遥测批次末尾有 {len(payload) - pos} 字节多余数据")
+    return readings
+
+
+def publish_packet_bytes(topic, payload):
+    """QoS 0 的 MQTT PUBLISH 报文在线路上的字节数：固定头 + 主题 + 负载"""
+    remaining = 2 + len(topic.encode("utf-8")) + len(payload)
+    length_bytes = 1
+    while remaining >= 128 ** length_bytes:
+        length_bytes += 1
+    return 1 + length_bytes + remaining
+
+
+class TelemetryBatcher:
+    """缓冲读数，攒满 max_readings 条或距上次发送超过 interval 秒时合并发送一条消息
+
+    无法编码的读数在 add 时抛出 ValueError，不会进入缓冲区；后台发送失败时计数并继续运行
+    """
+
+    def __init__(self, client, topic, interval=5.0, max_readings=500, decimals=DEFAULT_DECIMALS, qos=0):
+        self.client = client
+        self.topic = topic
+        self.interval = interval
+        self.max_readings = max_readings
+        self.decimals = decimals
+        self.qos = qos
+        self.buffer = []
+        self.lock = threading.Lock()
+        self.batches = 0
+        self.readings = 0
+        self.payload_bytes = 0
+        self.errors = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def add(self, sensor, value, timestamp=None):
+        """加入一条读数，达到条数上限时立即发送"""
+        timestamp = time.time() if timestamp is None else timestamp
+        validate_reading(sensor, timestamp, value, self.decimals)
+        with self.lock:
+            self.buffer.append((sensor, timestamp, value))
+            full = len(self.buffer) >= self.max_readings
+        if full:
+            self.flush()
+
+    def flush(self):
+        """发送缓冲区中的全部读数，返回发送的条数"""
+        with self.lock:
+            readings, self.buffer = self.buffer, []
+        if not readings:
+            return 0
+        payload = encode_batch(readings, self.decimals)
+        self.client.publish(self.topic, payload, qos=self.qos)
+        with self.lock:
+            self.batches += 1
+            self.readings += len(readings)
+            self.payload_bytes += len(payload)
+        return len(readings)
+
+    def start(self):
+        """后台线程按 interval 定时发送"""
+        if self._thread is not None:
+            return
+
+        def run():
+            while not self._stop.wait(self.interval):
+                try:
+                    self.flush()
+                except Exception as e:
+                    # 发布失败时这一批读数丢弃，定时发送继续进行
+                    with self.lock:
+                        self.errors += 1
+                    print(f"发送遥测批次失败: {e}")
+
+        self._thread = threading.Thread(target=run, name="telemetry-flush", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+
+    def stats(self):
+        return {
+            "batches": self.batches,
+            "readings": self.readings,
+            "payload_bytes": self.payload_bytes,
+            "bytes_per_reading": self.payload_bytes / self.readings if self.readings else 0.0,
+            "buffered": len(self.buffer),
+            "errors": self.errors,
+        }
@@ -0,0 +1,182 @@
+import queue
+import threading
+import time
+import zlib
+
+import metrics
+from metrics import Histogram
+
+# MQTT 消息路由和分发
+# TopicRouter 把订阅（支持 + 和 # 通配符）预先编译成按层级的前缀树，
+# 匹配一个主题只需沿层级走一遍，耗时与主题深度成正比，与订阅数量无关
+# OrderedDispatcher 把处理函数放到有界的工作线程池中执行，paho 的网络线程只负责入队；
+# 同一个键（如设备 id）的消息总是进入同一个工作线程，保证按到达顺序处理
+
+_STOP = object()
+
+
+def split_topic(topic):
+    return topic.split("/")
+
+
+def validate_filter(pattern):
+    """检查订阅过滤器：+ 和 # 必须独占一个层级，# 只能出现在最后"""
+    levels = split_topic(pattern)
+    for i, level in enumerate(levels):
+        if ("+" in level or "#" in level) and len(level) > 1:
+            raise ValueError(f"通配符必须独占一个层级: {pattern}")
+        if level == "#" and i != len(levels) - 1:
+            raise ValueError(f"# 只能出现在最后一个层级: {pattern}")
+    return levels
+
+
+class _Node:
+    __slots__ = ("children", "plus", "hash_handlers", "handlers")
+
+    def __init__(self):
+        self.children = {}
+        self.plus = None
+        self.hash_handlers = []
+        self.handlers = []
+
+
+class TopicRouter:
+    """主题前缀树，match 返回 [(处理函数, 通配符捕获的层级列表)]"""
+
+    def __init__(self):
+        self.root = _Node()
+        self.filters = []
+
+    def add(self, pattern, handler):
+        node = self.root
+        levels = validate_filter(pattern)
+        for level in levels:
+            if level == "#":
+                node.hash_handlers.append(handler)
+                break
+            if level == "+":
+                if node.plus is None:
+                    node.plus = _Node()
+                node = node.plus
+            else:
+                node = node.children.setdefault(level, _Node())
+        else:
+            node.handlers.append(handler)
+        self.filters.append(pattern)
+
+    def match(self, topic):
+        levels = split_topic(topic)
+        matches = []
+        # (节点, 当前层级, 已捕获的通配符层级)
+        stack = [(self.root, 0, ())]
+        while stack:
+            node, depth, params = stack.pop()
+            # 以 $ 开头的系统主题不匹配首层通配符
+            wildcard_allowed = depth > 0 or not levels[0].startswith("$")
+            if node.hash_handlers and wildcard_allowed:
+                rest = ("/".join(levels[depth:]),) if depth < len(levels) else ()
+                matches.extend((handler, params + rest) for handler in node.hash_handlers)
+            if depth == len(levels):
+                matches.extend((handler, params) for handler in node.handlers)
+                continue
+            level = levels[depth]
+            child = node.children.get(level)
+            if child is not None:
+                stack.append((child, depth + 1, params))
+            if node.plus is not None and wildcard_allowed:
+                stack.append((node.plus, depth + 1, params + (level,)))
+        return matches
+
+
+class OrderedDispatcher:
+    """num_workers 个工作线程，每个线程一个容量为 max_queue 的队列；
+    submit 从不阻塞，队列满时丢弃消息并计数"""
+
+    def __init__(self, num_workers=4, max_queue=1000, name="mqtt"):
+        self.name = name
+        self.queues = [queue.Queue(max_queue) for _ in range(num_workers)]
+        self.submitted = 0
+        self.completed = 0
+        self.dropped = 0
+        self.errors = 0
+        self.max_depth = 0
+        self.queue_wait = Histogram(f"{name}.queue_wait")
+        self.handler_latency = Histogram(f"{name}.handler")
+        self._lock = threading.Lock()
+        self.threads = [
+            threading.Thread(target=self._run, args=(q,), name=f"{name}-worker-{i}", daemon=True)
+            for i, q in enumerate(self.queues)
+        ]
+        for thread in self.threads:
+            thread.start()
+
+    def _worker_for(self, key):
+        # crc32 而不是 hash()，同一个键在不同进程中也落到同一个工作线程
+        return self.queues[zlib.crc32(str(key).encode("utf-8")) % len(self.queues)]
+
+    def submit(self, key, fn, *args):
+        """把 fn(*args) 放入 key 对应的工作线程队列，成功返回 True"""
+        worker_queue = self._worker_for(key)
+        try:
+            worker_queue.put_nowait((time.perf_counter_ns(), fn, args))
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+            return False
+        depth = worker_queue.qsize()
+        with self._lock:
+            self.submitted += 1
+            self.max_depth = max(self.max_depth, depth)
+        return True
+
+    def _run(self, worker_queue):
+        while True:
+            item = worker_queue.get()
+            if item is _STOP:
+                return
+            enqueued, fn, args = item
+            start = time.perf_counter_ns()
+            try:
+                fn(*args)
+            except Exception as e:
+                with self._lock:
+                    self.errors += 1
+                print(f"处理消息时出错: {e}")
+            end = time.perf_counter_ns()
+            self.queue_wait.record(start - enqueued)
+            self.handler_latency.record(end - start)
+            metrics.observe(f"{self.name}.queue_wait", (start - enqueued) / 1e9)
+            metrics.observe(f"{self.name}.handler", (end - start) / 1e9)
+            with self._lock:
+                self.completed += 1
+
+    def queue_depths(self):
+        return [q.qsize() for q in self.queues]
+
+    def close(self, timeout=5.0):
+        """处理完已入队的消息后停止工作线程"""
+        for worker_queue in self.queues:
+            worker_queue.put(_STOP)
+        for thread in self.threads:
+            thread.join(timeout)
+
+    def stats(self):
+        return {
+            "workers": len(self.queues),
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "dropped": self.dropped,
+            "errors": self.errors,
+            "queue_depth": sum(self.queue_depths()),
+            "max_queue_depth": self.max_depth,
+            "queue_wait_p99_ms": self.queue_wait.quantile(0.99) / 1e6,
+            "handler_p50_ms": self.handler_latency.quantile(0.5) / 1e6,
+            "handler_p99_ms": self.handler_latency.quantile(0.99) / 1e6,
+        }
+
+    def report(self):
+        s = self.stats()
+        return (f"消息分发: {s['workers']} 个工作线程, 已处理 {s['completed']}/{s['submitted']} 条, "
+                f"丢弃 {s['dropped']} 条, 出错 {s['errors']} 条, 当前队列深度 {s['queue_depth']} "
+                f"(最大 {s['max_queue_depth']}), 排队 p99 {s['queue_wait_p99_ms']:.2f}ms, "
+                f"处理 p50/p99 {s['handler_p50_ms']:.2f}/{s['handler_p99_ms']:.2f}ms")
@@ -0,0 +1,717 @@
+import ast
+import json
+import numbers
+import operator
+import os
+import threading
+import zlib
+from functools import reduce
+from types import SimpleNamespace
+
+import numpy as np
+
+from quantized_store import MODES as QUANTIZATION_MODES, ArrayStore, QuantizedVectorIndex, SCORE_BLOCK_ROWS
+
+# 可插拔的检索后端
+# 各脚本只使用 MilvusClient 的一个子集（建集合、插入/更新/删除、搜索、查询、索引），
+# 这里的 LocalVectorClient 在进程内用 NumPy 实现同一组方法和相同的命中结构，
+# 通过环境变量 VECTOR_BACKEND=local 即可替换 Milvus 服务器，省去网络往返
+
+MILVUS_URI = os.environ.get("MILVUS_URI", "http://localhost:19530")
+VECTOR_BACKEND = os.environ.get("VECTOR_BACKEND", "milvus")
+LOCAL_VECTOR_PATH = os.environ.get("LOCAL_VECTOR_PATH", "")
+# 本地后端的量化粗排（float16 / int8 / binary，默认关闭），只用于 COSINE 集合的无过滤检索；
+# 粗排在量化向量上进行，候选结果再用全精度向量（加载时为只读内存映射）重排
+LOCAL_QUANTIZATION = os.environ.get("LOCAL_QUANTIZATION", "")
+LOCAL_RERANK_FACTOR = int(os.environ.get("LOCAL_RERANK_FACTOR", "4"))
+
+INITIAL_CAPACITY = 1024
+# 与 Milvus 分区键的默认分区数一致
+DEFAULT_NUM_PARTITIONS = 16
+
+COMPARE_OPS = {
+    ast.Eq: operator.eq,
+    ast.NotEq: operator.ne,
+    ast.Lt: operator.lt,
+    ast.LtE: operator.le,
+    ast.Gt: operator.gt,
+    ast.GtE: operator.ge,
+}
+
+
+def parse_filter(expr):
+    return ast.parse(expr.replace("&&", " and ").replace("||", " or "), mode="eval").body
+
+
+def filter_fields(tree):
+    return {node.id for node in ast.walk(tree) if isinstance(node, ast.Name)}
+
+
+def _operand(node, columns):
+    if isinstance(node, ast.Name):
+        return columns[node.id]
+    return ast.literal_eval(node)
+
+
+def eval_filter_columns(node, columns):
+    """在列数据上向量化求值过滤表达式，返回布尔数组；不支持的语法抛出 ValueError"""
+    if isinstance(node, ast.BoolOp):
+        combine = np.logical_and if isinstance(node.op, ast.And) else np.logical_or
+        return reduce(combine, (eval_filter_columns(value, columns) for value in node.values))
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.Not):
+        return ~eval_filter_columns(node.operand, columns)
+    if isinstance(node, ast.Compare):
+        result = None
+        left = node.left
+        for op, right in zip(node.ops, node.comparators):
+            if isinstance(op, (ast.In, ast.NotIn)):
+                # 混合类型的取值列表保持为 object，避免被 NumPy 统一转成字符串
+                choices = list(ast.literal_eval(right))
+                part = np.isin(_operand(left, columns), np.array(choices, dtype=column_dtype(choices)))
+                if isinstance(op, ast.NotIn):
+                    part = ~part
+            elif type(op) in COMPARE_OPS:
+                part = COMPARE_OPS[type(op)](_operand(left, columns), _operand(right, columns))
+            else:
+                raise ValueError(f"不支持的比较运算: {ast.dump(op)}")
+            part = np.asarray(part, dtype=bool)
+            result = part if result is None else result & part
+            left = right
+        return result
+    raise ValueError(f"不支持的过滤表达式: {ast.dump(node)}")
+
+
+# 逐行求值时允许出现的语法节点，其余一律拒绝（不使用 eval）
+FILTER_NODES = (
+    ast.BoolOp, ast.And, ast.Or, ast.UnaryOp, ast.Not, ast.USub, ast.UAdd, ast.Compare,
+    ast.Eq, ast.NotEq, ast.Lt, ast.LtE, ast.Gt, ast.GtE, ast.In, ast.NotIn,
+    ast.Name, ast.Load, ast.Constant, ast.List, ast.Tuple, ast.Set,
+)
+
+
+def _row_operand(node, row):
+    if isinstance(node, ast.Name):
+        return row.get(node.id)
+    return ast.literal_eval(node)
+
+
+def eval_filter_row(node, row):
+    """在单行数据（字段名 -> 值）上求值过滤表达式，与 eval_filter_columns 的语义一致"""
+    if isinstance(node, ast.BoolOp):
+        values = (eval_filter_row(value, row) for value in node.values)
+        return all(values) if isinstance(node.op, ast.And) else any(values)
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.Not):
+        return not eval_filter_row(node.operand, row)
+    if isinstance(node, ast.Compare):
+        left = node.left
+        for op, right in zip(node.ops, node.comparators):
+            value = _row_operand(left, row)
+            try:
+                if isinstance(op, (ast.In, ast.NotIn)):
+                    part = (value in ast.literal_eval(right)) == isinstance(op, ast.In)
+                elif type(op) in COMPARE_OPS:
+                    part = COMPARE_OPS[type(op)](value, _row_operand(right, row))
+                else:
+                    raise ValueError(f"不支持的比较运算: {ast.dump(op)}")
+            except TypeError:
+                # 缺失字段（None）或类型不可比较时视为不满足
+                part = False
+            if not part:
+                return False
+            left = right
+        return True
+    raise ValueError(f"不支持的过滤表达式: {ast.dump(node)}")
+
+
+def compile_filter(expr):
+    """把 Milvus 的简单过滤表达式编译为逐行判断函数，如 "score > 50 and id in [1, 2]"；
+    只接受比较、in/not in、and/or/not、字段名和字面量，其他语法抛出 ValueError"""
+    if not expr:
+        return None
+    tree = parse_filter(expr)
+    for node in ast.walk(tree):
+        if not isinstance(node, FILTER_NODES):
+            raise ValueError(f"不支持的过滤表达式: {expr}")
+    return lambda row: eval_filter_row(tree, row)
+
+
+def partition_bucket(value, num_partitions):
+    """单个分区键取值所在的分区：整数（含整数值的浮点数）取模，其余按字符串的 CRC32"""
+    if isinstance(value, numbers.Real) and float(value).is_integer():
+        return int(value) % num_partitions
+    return zlib.crc32(str(value).encode("utf-8")) % num_partitions
+
+
+def column_dtype(values):
+    """整数列用 int64，浮点列用 float64，字符串和混合类型用 object"""
+    kind = np.asarray(values).dtype.kind
+    if kind in "iub":
+        return np.int64
+    if kind == "f":
+        return np.float64
+    return object
+
+
+class LocalCollection:
+    """单个集合：向量保存在连续的 float32 矩阵中，标量字段按行保存
+
+    建了标量索引的字段和分区键字段额外按列保存为 NumPy 数组，过滤时向量化求值；
+    过滤条件包含分区键取值时只在对应分区的行中过滤和计算相似度；
+    设置了 quantization 时，无过滤的 COSINE 检索先在量化向量上粗排再重排，
+    量化索引在写入后的首次检索时重建
+    """
+
+    def __init__(self, dim, primary_field="id", vector_field="embedding", metric_type="COSINE",
+                 partition_key=None, num_partitions=DEFAULT_NUM_PARTITIONS,
+                 quantization=LOCAL_QUANTIZATION, rerank_factor=LOCAL_RERANK_FACTOR):
+        if quantization and quantization not in QUANTIZATION_MODES:
+            raise ValueError(f"不支持的量化方式: {quantization}")
+        self.quantization = quantization
+        self.rerank_factor = rerank_factor
+        self.dim = dim
+        self.primary_field = primary_field
+        self.vector_field = vector_field
+        self.metric_type = metric_type
+        self.size = 0
+        self.ids = np.empty(INITIAL_CAPACITY, dtype=np.int64)
+        self.vectors = np.empty((INITIAL_CAPACITY, dim), dtype=np.float32)
+        self.sq_norms = np.empty(INITIAL_CAPACITY, dtype=np.float32)
+        self.payloads = []
+        self.id_to_row = {}
+        self.indexed = False
+        self.partition_key = partition_key
+        self.num_partitions = num_partitions
+        self.scalar_indexes = {}
+        # 按列保存的标量字段，长度与 ids 的容量一致；首次写入时才确定类型
+        self.columns = {}
+        self._partitions = None
+        self._quantized = None
+
+    def column_fields(self):
+        fields = set(self.scalar_indexes)
+        if self.partition_key:
+            fields.add(self.partition_key)
+        return fields
+
+    def _write_column(self, field, start, values):
+        values = np.asarray(values, dtype=column_dtype(values))
+        column = self.columns.get(field)
+        if column is None or (column.dtype != values.dtype and column.dtype != object):
+            # 首次写入或类型变宽（如整数列写入字符串）时重建整列
+            new = np.empty(len(self.ids), dtype=values.dtype if column is None else object)
+            if column is not None:
+                new[:start] = column[:start]
+            column = self.columns[field] = new
+        column[start:start + len(values)] = values
+
+    def add_scalar_index(self, field, index_type=""):
+        """为标量字段建立列索引，已有数据从行数据中补齐"""
+        self.scalar_indexes[field] = index_type or "AUTOINDEX"
+        if field not in self.columns and self.size:
+            self._write_column(field, 0, [payload.get(field) for payload in self.payloads])
+
+    def _reserve(self, extra):
+        needed = self.size + extra
+        capacity = len(self.ids)
+        if needed <= capacity and self.vectors.flags.writeable:
+            return
+        capacity = max(capacity, INITIAL_CAPACITY)
+        while capacity < needed:
+            capacity *= 2
+        # 扩容时整体拷贝，同时把只读的内存映射数据转为可写数组
+        for name in ("ids", "vectors", "sq_norms"):
+            old = getattr(self, name)
+            new = np.empty((capacity,) + old.shape[1:], dtype=old.dtype)
+            new[:self.size] = old[:self.size]
+            setattr(self, name, new)
+        for field, old in self.columns.items():
+            new = np.empty(capacity, dtype=old.dtype)
+            new[:self.size] = old[:self.size]
+            self.columns[field] = new
+
+    def _check_new_ids(self, ids):
+        """批内重复或集合中已存在的主键抛出 ValueError，避免同一主键出现多行"""
+        seen = set()
+        for id_ in ids:
+            if id_ in seen or id_ in self.id_to_row:
+                raise ValueError(f"主键重复: {id_}")
+            seen.add(id_)
+
+    def insert(self, rows):
+        """行式插入；主键重复时抛出 ValueError，已有主键请用 upsert"""
+        if not rows:
+            return
+        self._check_new_ids([row[self.primary_field] for row in rows])
+        self._reserve(len(rows))
+        start = self.size
+        end = start + len(rows)
+        vectors = np.asarray([row[self.vector_field] for row in rows], dtype=np.float32)
+        self.vectors[start:end] = vectors
+        self.sq_norms[start:end] = np.einsum("ij,ij->i", vectors, vectors)
+        for offset, row in enumerate(rows):
+            id_ = row[self.primary_field]
+            self.ids[start + offset] = id_
+            self.id_to_row[id_] = start + offset
+            self.payloads.append({
+                k: v for k, v in row.items() if k not in (self.primary_field, self.vector_field)
+            })
+        for field in self.column_fields():
+            self._write_column(field, start, [row.get(field) for row in rows])
+        self._partitions = None
+        self._quantized = None
+        self.size = end
+
+    def insert_columns(self, columns):
+        """列式插入：columns 为 {字段名: 数组}，向量整块拷贝，标量按列转换；主键重复时抛出 ValueError"""
+        ids = np.asarray(columns[self.primary_field], dtype=np.int64)
+        if not len(ids):
+            return
+        id_list = ids.tolist()
+        self._check_new_ids(id_list)
+        self._reserve(len(ids))
+        start = self.size
+        end = start + len(ids)
+        vectors = np.asarray(columns[self.vector_field], dtype=np.float32)
+        self.vectors[start:end] = vectors
+        self.sq_norms[start:end] = np.einsum("ij,ij->i", vectors, vectors)
+        self.ids[start:end] = ids
+        self.id_to_row.update(zip(id_list, range(start, end)))
+        names = [k for k in columns if k not in (self.primary_field, self.vector_field)]
+        values = [np.asarray(columns[k]).tolist() for k in names]
+        self.payloads.extend(dict(zip(names, row)) for row in zip(*values))
+        for field in self.column_fields():
+            self._write_column(field, start, columns[field] if field in columns else [None] * len(ids))
+        self._partitions = None
+        self._quantized = None
+        self.size = end
+
+    def upsert(self, rows):
+        """按主键覆盖写入，批内同一主键出现多次时保留最后一行"""
+        latest = {row[self.primary_field]: row for row in rows}
+        self.delete(list(latest))
+        self.insert(list(latest.values()))
+
+    def delete(self, ids):
+        """删除时用最后一行填补空位，保持矩阵连续"""
+        deleted = 0
+        for id_ in ids:
+            row = self.id_to_row.pop(id_, None)
+            if row is None:
+                continue
+            last = self.size - 1
+            if row != last:
+                self._reserve(0)
+                self.ids[row] = self.ids[last]
+                self.vectors[row] = self.vectors[last]
+                self.sq_norms[row] = self.sq_norms[last]
+                self.payloads[row] = self.payloads[last]
+                for column in self.columns.values():
+                    column[row] = column[last]
+                self.id_to_row[int(self.ids[row])] = row
+            self.payloads.pop()
+            self.size -= 1
+            deleted += 1
+        if deleted:
+            self._partitions = None
+            self._quantized = None
+        return deleted
+
+    def row_dict(self, row, output_fields=None):
+        payload = self.payloads[row]
+        entity = {self.primary_field: int(self.ids[row]), **payload}
+        if output_fields:
+            entity = {k: entity[k] for k in output_fields if k in entity}
+            if self.vector_field in output_fields:
+                entity[self.vector_field] = self.vectors[row].tolist()
+        return entity
+
+    def _partition_of(self, values):
+        """各取值的分区号；整数列向量化取模，与 partition_bucket 的结果一致，
+        写入和过滤时取值的类型不同（如 42 与 42.0、object 列中的整数）也落在同一分区"""
+        values = np.asarray(values)
+        if values.dtype.kind in "iub":
+            return values.astype(np.int64) % self.num_partitions
+        return np.array([partition_bucket(v, self.num_partitions) for v in values.tolist()], dtype=np.int64)
+
+    def _partition_rows(self):
+        """每个分区的行号（升序），数据变化后首次使用时重建"""
+        if self._partitions is None:
+            buckets = self._partition_of(self.columns[self.partition_key][:self.size])
+            order = np.argsort(buckets, kind="stable")
+            bounds = np.searchsorted(buckets[order], np.arange(self.num_partitions + 1))
+            self._partitions = [order[bounds[i]:bounds[i + 1]] for i in range(self.num_partitions)]
+        return self._partitions
+
+    def _partition_keys(self, node):
+        """从过滤表达式中提取分区键的取值，无法确定时返回 None（需要扫描所有分区）"""
+        try:
+            if isinstance(node, ast.Compare) and len(node.ops) == 1 \
+                    and isinstance(node.left, ast.Name) and node.left.id == self.partition_key:
+                if isinstance(node.ops[0], ast.Eq):
+                    return {ast.literal_eval(node.comparators[0])}
+                if isinstance(node.ops[0], ast.In):
+                    return set(ast.literal_eval(node.comparators[0]))
+        except ValueError:
+            return None
+        if isinstance(node, ast.BoolOp):
+            parts = [self._partition_keys(value) for value in node.values]
+            if isinstance(node.op, ast.And):
+                known = [part for part in parts if part is not None]
+                return set.intersection(*known) if known else None
+            if all(part is not None for part in parts):
+                return set.union(*parts)
+        return None
+
+    def select_rows(self, expr):
+        """返回满足过滤条件的行号（升序），没有过滤条件时返回 None"""
+        if not expr:
+            return None
+        tree = parse_filter(expr)
+        rows = None
+        if self.partition_key and self.size:
+            keys = self._partition_keys(tree)
+            if keys is not None:
+                partitions = self._partition_rows()
+                buckets = {partition_bucket(key, self.num_partitions) for key in keys}
+                selected = [partitions[b] for b in sorted(buckets)]
+                rows = np.sort(np.concatenate(selected)) if selected else np.empty(0, dtype=np.int64)
+        full = rows is None
+        if full:
+            rows = np.arange(self.size)
+
+        fields = filter_fields(tree)
+        if fields <= set(self.columns):
+            try:
+                columns = {
+                    field: self.columns[field][:self.size] if full else self.columns[field][rows]
+                    for field in fields
+                }
+                return rows[eval_filter_columns(tree, columns)]
+            except (ValueError, TypeError):
+                # object 列中有缺失值或混合类型时无法整列比较，改为逐行求值（缺失视为不满足）
+                pass
+        # 未建索引的字段逐行求值
+        predicate = compile_filter(expr)
+        return rows[np.fromiter(
+            (bool(predicate(self.row_dict(row))) for row in rows),
+            dtype=bool,
+            count=len(rows)
+        )]
+
+    def quantized_index(self):
+        """按当前数据构建量化索引，返回结果中的 id 为行号"""
+        if self._quantized is None:
+            vectors = self.vectors[:self.size]
+            index = QuantizedVectorIndex(self.dim, self.quantization, rerank_factor=self.rerank_factor,
+                                         store=ArrayStore(vectors))
+            # 分块编码，不在内存中复制出整个归一化矩阵
+            for start in range(0, self.size, SCORE_BLOCK_ROWS):
+                end = min(start + SCORE_BLOCK_ROWS, self.size)
+                index.add(np.arange(start, end), vectors[start:end])
+            self._quantized = index
+        return self._quantized
+
+    def scores(self, queries, rows=None):
+        """返回 (nq, n) 的分数矩阵，分数越大越相似；rows 指定时只计算这些行"""
+        if rows is None:
+            vectors = self.vectors[:self.size]
+            sq_norms = self.sq_norms[:self.size]
+        else:
+            vectors = self.vectors[rows]
+            sq_norms = self.sq_norms[rows]
+        dots = queries @ vectors.T
+        if self.metric_type == "L2":
+            q_norms = np.einsum("ij,ij->i", queries, queries)
+            return -(q_norms[:, None] - 2 * dots + sq_norms[None, :])
+        if self.metric_type == "COSINE":
+            q_norms = np.sqrt(np.einsum("ij,ij->i", queries, queries))
+            denom = q_norms[:, None] * np.sqrt(sq_norms)[None, :]
+            return dots / np.maximum(denom, 1e-12)
+        return dots
+
+    def search(self, queries, limit, output_fields=None, filter=""):
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        if self.size == 0:
+            return [[] for _ in range(len(queries))]
+
+        rows = self.select_rows(filter)
+        candidates = self.size if rows is None else len(rows)
+        k = min(limit, candidates)
+        if k == 0:
+            return [[] for _ in range(len(queries))]
+
+        if rows is None and self.quantization and self.metric_type == "COSINE":
+            top, top_scores = self.quantized_index().search(queries, k)
+            return self._hits(top, top_scores, output_fields)
+
+        if rows is not None and candidates <= self.size // 2:
+            # 候选行较少时只对候选行计算相似度
+            scores = self.scores(queries, rows)
+        else:
+            scores = self.scores(queries)
+            if rows is not None:
+                mask = np.ones(self.size, dtype=bool)
+                mask[rows] = False
+                scores[:, mask] = -np.inf
+            rows = None
+
+        # argpartition 取前 k 个，再只对这 k 个排序
+        if k < scores.shape[1]:
+            top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        else:
+            top = np.tile(np.arange(scores.shape[1]), (len(queries), 1))
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        order = np.argsort(-top_scores, axis=1)
+        top = np.take_along_axis(top, order, axis=1)
+        top_scores = np.take_along_axis(top_scores, order, axis=1)
+        if rows is not None:
+            top = rows[top]
+        return self._hits(top, top_scores, output_fields)
+
+    def _hits(self, top, top_scores, output_fields):
+        results = []
+        for rows, row_scores in zip(top, top_scores):
+            hits = []
+            for row, score in zip(rows, row_scores):
+                # 与 Milvus 一致：L2 返回平方距离，COSINE/IP 返回相似度
+                distance = -score if self.metric_type == "L2" else score
+                hits.append({
+                    "id": int(self.ids[row]),
+                    "distance": float(distance),
+                    "entity": self.row_dict(row, output_fields or [])
+                })
+            results.append(hits)
+        return results
+
+    def query(self, filter="", output_fields=None, limit=None, ids=None):
+        if ids is not None:
+            rows = [self.id_to_row[i] for i in ids if i in self.id_to_row]
+        else:
+            rows = self.select_rows(filter)
+            if rows is None:
+                rows = range(self.size)
+        if limit is not None:
+            rows = list(rows)[:limit]
+        return [self.row_dict(row, output_fields) for row in rows]
+
+    def save(self, path):
+        os.makedirs(path, exist_ok=True)
+        # 先写临时文件再替换，避免覆盖正被内存映射的旧文件
+        for name, array in (("vectors", self.vectors), ("ids", self.ids)):
+            tmp_path = os.path.join(path, f"{name}.tmp.npy")
+            np.save(tmp_path, array[:self.size])
+            os.replace(tmp_path, os.path.join(path, f"{name}.npy"))
+        meta = {
+            "dim": self.dim,
+            "primary_field": self.primary_field,
+            "vector_field": self.vector_field,
+            "metric_type": self.metric_type,
+            "indexed": self.indexed,
+            "partition_key": self.partition_key,
+            "num_partitions": self.num_partitions,
+            "scalar_indexes": self.scalar_indexes,
+        }
+        with open(os.path.join(path, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        with open(os.path.join(path, "payloads.jsonl"), "w", encoding="utf-8") as f:
+            for payload in self.payloads:
+                f.write(json.dumps(payload, ensure_ascii=False) + "\n")
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        """加载集合；mmap=True 时向量矩阵以只读内存映射打开，首次写入时才复制到内存"""
+        with open(os.path.join(path, "meta.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+        collection = cls(meta["dim"], meta["primary_field"], meta["vector_field"], meta["metric_type"],
+                         meta.get("partition_key"), meta.get("num_partitions", DEFAULT_NUM_PARTITIONS))
+        collection.vectors = np.load(os.path.join(path, "vectors.npy"), mmap_mode="r" if mmap else None)
+        collection.ids = np.load(os.path.join(path, "ids.npy"))
+        collection.size = len(collection.ids)
+        collection.sq_norms = np.einsum("ij,ij->i", collection.vectors, collection.vectors).astype(np.float32)
+        with open(os.path.join(path, "payloads.jsonl"), encoding="utf-8") as f:
+            collection.payloads = [json.loads(line) for line in f]
+        collection.id_to_row = {int(id_): row for row, id_ in enumerate(collection.ids)}
+        collection.indexed = meta.get("indexed", False)
+        collection.scalar_indexes = meta.get("scalar_indexes", {})
+        for field in collection.column_fields():
+            if collection.size:
+                collection._write_column(field, 0, [payload.get(field) for payload in collection.payloads])
+        return collection
+
+
+class LocalIndexParams(list):
+    """MilvusClient.prepare_index_params 返回值的进程内版本"""
+
+    def add_index(self, field_name, index_type="", index_name="", metric_type=None, params=None, **kwargs):
+        self.append(SimpleNamespace(
+            field_name=field_name,
+            index_type=index_type,
+            index_name=index_name or field_name,
+            metric_type=metric_type,
+            params=params or {}
+        ))
+
+
+class LocalQueryIterator:
+    def __init__(self, rows, batch_size):
+        self.rows = rows
+        self.batch_size = batch_size
+        self.offset = 0
+
+    def next(self):
+        batch = self.rows[self.offset:self.offset + self.batch_size]
+        self.offset += len(batch)
+        return batch
+
+    def close(self):
+        pass
+
+
+class LocalVectorClient:
+    """进程内的 MilvusClient 替代品，path 不为空时集合持久化到该目录"""
+
+    def __init__(self, path="", mmap=True):
+        self.path = path
+        self.mmap = mmap
+        self.collections = {}
+        self.lock = threading.RLock()
+
+    def _collection_path(self, collection_name):
+        return os.path.join(self.path, collection_name)
+
+    def _get(self, collection_name):
+        with self.lock:
+            collection = self.collections.get(collection_name)
+            if collection is None and self.path and os.path.exists(
+                    os.path.join(self._collection_path(collection_name), "meta.json")):
+                collection = LocalCollection.load(self._collection_path(collection_name), self.mmap)
+                self.collections[collection_name] = collection
+            if collection is None:
+                raise KeyError(f"集合 {collection_name} 不存在")
+            return collection
+
+    def has_collection(self, collection_name, **kwargs):
+        try:
+            self._get(collection_name)
+            return True
+        except KeyError:
+            return False
+
+    def get_collection_stats(self, collection_name, **kwargs):
+        with self.lock:
+            return {"row_count": self._get(collection_name).size}
+
+    def list_collections(self, **kwargs):
+        names = set(self.collections)
+        if self.path and os.path.isdir(self.path):
+            names.update(name for name in os.listdir(self.path)
+                         if os.path.exists(os.path.join(self._collection_path(name), "meta.json")))
+        return sorted(names)
+
+    def create_collection(self, collection_name, dimension, primary_field_name="id",
+                          vector_field_name="embedding", metric_type="COSINE",
+                          partition_key_field=None, num_partitions=DEFAULT_NUM_PARTITIONS, **kwargs):
+        with self.lock:
+            self.collections[collection_name] = LocalCollection(
+                dimension, primary_field_name, vector_field_name, metric_type,
+                partition_key_field, num_partitions
+            )
+
+    def drop_collection(self, collection_name, **kwargs):
+        with self.lock:
+            self.collections.pop(collection_name, None)
+            path = self._collection_path(collection_name)
+            if self.path and os.path.isdir(path):
+                for name in os.listdir(path):
+                    os.remove(os.path.join(path, name))
+                os.rmdir(path)
+
+    def insert(self, collection_name, data, **kwargs):
+        with self.lock:
+            self._get(collection_name).insert(list(data))
+        return {"insert_count": len(data)}
+
+    def insert_columns(self, collection_name, columns):
+        with self.lock:
+            self._get(collection_name).insert_columns(columns)
+        return {"insert_count": len(columns[self._get(collection_name).primary_field])}
+
+    def upsert(self, collection_name, data, **kwargs):
+        with self.lock:
+            self._get(collection_name).upsert(list(data))
+        return {"upsert_count": len(data)}
+
+    def delete(self, collection_name, ids=None, filter="", **kwargs):
+        with self.lock:
+            collection = self._get(collection_name)
+            if ids is None:
+                ids = [row[collection.primary_field] for row in collection.query(filter)]
+            return {"delete_count": collection.delete(ids)}
+
+    def search(self, collection_name, data, limit=10, output_fields=None, filter="", **kwargs):
+        with self.lock:
+            return self._get(collection_name).search(data, limit, output_fields, filter)
+
+    def query(self, collection_name, filter="", output_fields=None, limit=None, ids=None, **kwargs):
+        with self.lock:
+            return self._get(collection_name).query(filter, output_fields, limit, ids)
+
+    def query_iterator(self, collection_name, batch_size=1000, filter="", output_fields=None, **kwargs):
+        return LocalQueryIterator(self.query(collection_name, filter, output_fields), batch_size)
+
+    def prepare_index_params(self, **kwargs):
+        return LocalIndexParams()
+
+    def create_index(self, collection_name, index_params=None, metric_type=None,
+                     field_name=None, index_type="", **kwargs):
+        with self.lock:
+            collection = self._get(collection_name)
+            indexes = list(index_params) if index_params is not None else [SimpleNamespace(
+                field_name=field_name or collection.vector_field,
+                index_type=index_type,
+                metric_type=metric_type
+            )]
+            for index in indexes:
+                field = getattr(index, "field_name", None) or collection.vector_field
+                if field != collection.vector_field:
+                    # 标量字段转为列存储，过滤时向量化求值
+                    collection.add_scalar_index(field, getattr(index, "index_type", ""))
+                    continue
+                # 暴力检索无需建向量索引，只记录度量方式
+                collection.metric_type = getattr(index, "metric_type", None) or metric_type or collection.metric_type
+                collection.indexed = True
+
+    def list_indexes(self, collection_name, **kwargs):
+        collection = self._get(collection_name)
+        names = [collection.vector_field] if collection.indexed else []
+        return names + sorted(collection.scalar_indexes)
+
+    def load_collection(self, collection_name, **kwargs):
+        self._get(collection_name)
+
+    def release_collection(self, collection_name, **kwargs):
+        pass
+
+    def flush(self, collection_name=None, **kwargs):
+        """把集合写入磁盘（仅在指定了 path 时生效）"""
+        if not self.path:
+            return
+        with self.lock:
+            names = [collection_name] if collection_name else list(self.collections)
+            for name in names:
+                self.collections[name].save(self._collection_path(name))
+
+    def close(self):
+        self.flush()
+
+
+def create_client(backend=None, uri=None, path=None):
+    """按配置创建检索后端：milvus（默认）或 local"""
+    backend = backend or VECTOR_BACKEND
+    if backend == "local":
+        return LocalVectorClient(path if path is not None else LOCAL_VECTOR_PATH)
+    if backend == "milvus":
+        # 经连接池访问 Milvus，带超时、重试和健康检查
+        from connection_manager import ConnectionManager
+        return ConnectionManager(uri or MILVUS_URI).client()
+    raise ValueError(f"未知的检索后端: {backend}")